@@ -1,77 +1,63 @@
 # backend/app.py
 from flask import Flask
 from flask_cors import CORS
-from routes.transit_routes import transit_bp
+from routes.transit_routes import init_app as init_transit
 import os
 import threading
-import time
-from services.mta_service import MTAService
-from config.config import REFRESH_INTERVAL
+from services.metrics import instrument_app, metrics_response, track_snapshots
+from services.refresher import refresh_forever
+from services.shared_snapshot import SharedSnapshotReader
+from services.transit_store import transit_data
+from config.config import REFRESH_MODE, SNAPSHOT_PATH, SNAPSHOT_POLL_INTERVAL
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+_refresh_thread = None
 
-# Global variable to store the latest transit data
-latest_subway_data = None
-latest_subway_geojson = None
-latest_alerts = {}
+def start_background_refresh(mta_service):
+    """Start the refresh thread once per process so read endpoints have snapshots to serve"""
+    global _refresh_thread
+    if _refresh_thread is None:
+        _refresh_thread = threading.Thread(target=refresh_forever, args=(mta_service, transit_data.publish),
+                                           daemon=True)
+        _refresh_thread.start()
 
-# Create service instance
-mta_service = MTAService()
+def create_app(refresh_mode=REFRESH_MODE):
+    """Build the Flask app and start feeding its snapshot store.
 
-# Register blueprints
-app.register_blueprint(transit_bp)
+    ``refresh_mode`` is 'inline' (poll the MTA from a thread in this
+    process), 'shared' (follow the snapshots of fetcher.py, as under
+    gunicorn.conf.py) or 'off' (serve whatever gets published).
+    """
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return {'status': 'healthy'}
+    # Register blueprints
+    transit = init_transit(app)
 
-def background_data_refresh():
-    """Background thread to periodically refresh transit data"""
-    global latest_subway_data, latest_subway_geojson, latest_alerts
-    
-    while True:
-        try:
-            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Refreshing transit data...")
-            
-            # Fetch subway data
-            try:
-                latest_subway_data = mta_service.fetch_all_subway_data()
-                latest_subway_geojson = mta_service.to_geojson(latest_subway_data)
-                
-                # Count vehicles by line
-                line_counts = {}
-                for entity in latest_subway_data.get('entities', []):
-                    if entity.get('type') == 'vehicle' and entity.get('route_id'):
-                        route_id = entity.get('route_id')
-                        line_counts[route_id] = line_counts.get(route_id, 0) + 1
-                
-                total_vehicles = sum(line_counts.values())
-                print(f"Updated subway data: {total_vehicles} vehicles across {len(line_counts)} lines")
-                for line, count in sorted(line_counts.items()):
-                    print(f"  Line {line}: {count} vehicles")
-            except Exception as e:
-                print(f"Error refreshing subway data: {str(e)}")
-            
-            # Fetch service alerts
-            try:
-                latest_alerts['subway'] = mta_service.fetch_service_alerts('subway')
-                alert_count = len(latest_alerts['subway'].get('alerts', []))
-                print(f"Updated subway alerts: {alert_count} active alerts")
-            except Exception as e:
-                print(f"Error refreshing alerts: {str(e)}")
-            
-            # Sleep until next refresh
-            time.sleep(REFRESH_INTERVAL)
-        except Exception as e:
-            print(f"Error in background refresh thread: {str(e)}")
-            time.sleep(30)  # Shorter interval on error
+    # Prometheus request timing and snapshot freshness
+    instrument_app(app)
+    track_snapshots(transit_data)
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        """Health check endpoint"""
+        return {'status': 'healthy'}
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus metrics"""
+        return metrics_response()
+
+    # Build and compress the static map layers before serving requests
+    transit.static_layers.warm()
+
+    if refresh_mode == 'shared':
+        # One fetcher process polls the MTA for every worker; workers only
+        # map the snapshots it publishes
+        SharedSnapshotReader(SNAPSHOT_PATH).follow(transit_data, SNAPSHOT_POLL_INTERVAL)
+    elif refresh_mode == 'inline':
+        start_background_refresh(transit.mta_service)
+    return app
 
 if __name__ == '__main__':
-    # Start background refresh thread
-    refresh_thread = threading.Thread(target=background_data_refresh, daemon=True)
-    refresh_thread.start()
-    
     port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,270 @@
+# backend/benchmarks/fixtures.py
+"""Feed fixtures for the benchmarks and the stub MTA server.
+
+    python -m benchmarks.fixtures record      # save the live MTA feeds
+    python -m benchmarks.fixtures synthetic   # generate feeds from the static GTFS
+
+Both write one file per upstream URL into benchmarks/fixtures/, named after
+the feed path (e.g. 'nyct-gtfs-ace', 'camsys-subway-alerts.json'), which is
+how the stub server looks them up.
+
+Synthetic feeds are built from the GTFS in GTFS_DIR and depend only on it,
+the seed and the feed timestamp. Both are recorded in manifest.json (and in
+the benchmark output), and ``synthetic --seed S --now T`` regenerates the
+same bytes.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from urllib.parse import unquote
+from xml.sax.saxutils import escape
+import numpy as np
+import requests
+from google.transit import gtfs_realtime_pb2
+from config.config import API_BASE_URL, SUBWAY_FEEDS, SERVICE_ALERTS, ELEVATOR_FEEDS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Routes carried by each subway feed
+FEED_ROUTES = {
+    'ace': ['A', 'C', 'E', 'H', 'FS'],
+    'g': ['G'],
+    'nqrw': ['N', 'Q', 'R', 'W'],
+    'bdfm': ['B', 'D', 'F', 'M'],
+    'jz': ['J', 'Z'],
+    'l': ['L'],
+    'si': ['SI'],
+    '123456s': ['1', '2', '3', '4', '5', '6', '6X', '7', '7X', 'GS']
+}
+
+STOP_MATCH_M = 80  # how close a platform must be to a shape to count as served by it
+
+
+def fixture_name(feed_path):
+    """File name for an upstream feed path, e.g. 'nyct%2Fgtfs-ace' -> 'nyct-gtfs-ace'"""
+    return unquote(feed_path).strip('/').replace('/', '-')
+
+
+def upstream_paths():
+    """Every feed path the refresher requests, including the JSON/XML variants"""
+    paths = list(SUBWAY_FEEDS.values())
+    paths += [SERVICE_ALERTS['subway'], f"{SERVICE_ALERTS['subway']}.json"]
+    paths += [f"{ELEVATOR_FEEDS['current']}.json", f"{ELEVATOR_FEEDS['current']}.xml"]
+    return paths
+
+
+def record(fixture_dir=FIXTURE_DIR):
+    """Download the current upstream feeds; paths the MTA does not serve are skipped"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    session = requests.Session()
+    saved = {}
+    for path in upstream_paths():
+        response = session.get(f"{API_BASE_URL}{path}", timeout=(3.05, 30))
+        if response.status_code != 200:
+            print(f"Skipping {path}: HTTP {response.status_code}")
+            continue
+        name = fixture_name(path)
+        with open(os.path.join(fixture_dir, name), 'wb') as f:
+            f.write(response.content)
+        saved[name] = len(response.content)
+    write_manifest(fixture_dir, 'recorded', saved)
+    return saved
+
+
+def write_manifest(fixture_dir, source, saved, **params):
+    """manifest.json: where the fixtures came from, what generated them and their sizes"""
+    with open(os.path.join(fixture_dir, 'manifest.json'), 'w') as f:
+        json.dump({'source': source, 'created': int(time.time()), **params, 'files': saved}, f, indent=2)
+
+
+def _route_shapes(gtfs):
+    """(route_id, direction) -> shape_id of the longest shape, from the registry's trips and shapes"""
+    shapes = dict(gtfs.iter_shapes())
+    trips = gtfs.table('trips')
+    if trips is None:
+        return {}, shapes
+    pairs = np.unique(np.column_stack((trips.codes('route_id'), trips.codes('shape_id'))), axis=0)
+    best = {}
+    for route_code, shape_code in pairs.tolist():
+        route_id, shape_id = trips.string('route_id', route_code), trips.string('shape_id', shape_code)
+        direction = shape_id.partition('..')[2][:1]
+        key = (route_id, direction)
+        length = len(shapes.get(shape_id, ()))
+        if key not in best or length > best[key][1]:
+            best[key] = (shape_id, length)
+    return {key: shape_id for key, (shape_id, _) in best.items()}, shapes
+
+
+def _stop_sequence(route_id, direction, shape, platforms):
+    """Platforms along a shape in travel order; falls back to the route's stop-id prefix"""
+    ids, lats, lons = platforms
+    suffix = np.char.endswith(ids, direction) if direction else np.ones(len(ids), dtype=bool)
+    if shape:
+        coords = np.asarray(shape, dtype=np.float64)
+        margin = 0.002
+        near = (suffix &
+                (lons >= coords[:, 0].min() - margin) & (lons <= coords[:, 0].max() + margin) &
+                (lats >= coords[:, 1].min() - margin) & (lats <= coords[:, 1].max() + margin))
+        candidates = np.flatnonzero(near)
+        if len(candidates):
+            dx = (lons[candidates, None] - coords[None, :, 0]) * 84300.0  # meters per degree at NYC
+            dy = (lats[candidates, None] - coords[None, :, 1]) * 111320.0
+            distances = np.hypot(dx, dy)
+            nearest = distances.argmin(axis=1)
+            served = distances[np.arange(len(candidates)), nearest] <= STOP_MATCH_M
+            order = np.argsort(nearest[served], kind='stable')
+            sequence = ids[candidates[served][order]].tolist()
+            if len(sequence) >= 2:
+                return sequence
+    prefix = np.char.startswith(ids, route_id[:1]) & suffix
+    return sorted(ids[prefix].tolist()) or ids[:20].tolist()
+
+
+def synthetic_subway_feed(routes, route_shapes, shapes, platforms, trips_per_route, now, rnd):
+    """A GTFS-RT FeedMessage with a trip update and vehicle position per trip"""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = '1.0'
+    feed.header.timestamp = now
+    for route_id in routes:
+        for direction in ('N', 'S'):
+            shape_id = route_shapes.get((route_id, direction), f"{route_id}..{direction}01R")
+            stops = _stop_sequence(route_id, direction, shapes.get(shape_id), platforms)
+            for i in range(trips_per_route // 2):
+                origin = rnd.randrange(0, 144000)
+                trip_id = f"{origin:06d}_{shape_id}"
+                position = rnd.randrange(len(stops))
+
+                entity = feed.entity.add()
+                entity.id = f"{trip_id}-tu"
+                trip_update = entity.trip_update
+                trip_update.trip.trip_id = trip_id
+                trip_update.trip.route_id = route_id
+                trip_update.trip.start_date = time.strftime('%Y%m%d', time.gmtime(now))
+                arrival = now + rnd.randint(0, 90)
+                for stop_id in stops[position:]:
+                    update = trip_update.stop_time_update.add()
+                    update.stop_id = stop_id
+                    update.arrival.time = arrival
+                    update.departure.time = arrival + 30
+                    arrival += rnd.randint(90, 150)
+
+                entity = feed.entity.add()
+                entity.id = f"{trip_id}-vp"
+                vehicle = entity.vehicle
+                vehicle.trip.trip_id = trip_id
+                vehicle.trip.route_id = route_id
+                vehicle.trip.start_date = trip_update.trip.start_date
+                vehicle.current_stop_sequence = position + 1
+                vehicle.current_status = rnd.choice((0, 1, 2))
+                vehicle.timestamp = now - rnd.randint(0, 30)
+                vehicle.stop_id = stops[position]
+    return feed
+
+
+def synthetic_alerts(routes, platforms, count, now, rnd):
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = '1.0'
+    feed.header.timestamp = now
+    for i in range(count):
+        entity = feed.entity.add()
+        entity.id = f"lmm:planned_work:{10000 + i}"
+        alert = entity.alert
+        period = alert.active_period.add()
+        period.start = now - rnd.randint(0, 86400)
+        period.end = now + rnd.randint(3600, 7 * 86400)
+        for route_id in rnd.sample(routes, rnd.randint(1, 3)):
+            alert.informed_entity.add().route_id = route_id
+        for stop_id in rnd.sample(platforms[0].tolist(), rnd.randint(0, 4)):
+            alert.informed_entity.add().stop_id = stop_id
+        alert.effect = rnd.choice((1, 2, 3, 4, 8))
+        alert.header_text.translation.add(language='en', text=f"Trains are delayed ({i})")
+        alert.description_text.translation.add(
+            language='en', text="Trains are running with delays while we address a signal problem. " * 3)
+    return feed
+
+
+def synthetic_elevators(stations, count, rnd):
+    outages = []
+    for i, station in enumerate(rnd.sample(stations, min(count, len(stations)))):
+        outages.append(
+            '<outage>'
+            f'<station>{escape(station)}</station><borough>MN</borough><trainno>A/C/E</trainno>'
+            f'<equipment>EL{100 + i}</equipment><equipmenttype>{rnd.choice(("EL", "ES"))}</equipmenttype>'
+            '<serving>Street to mezzanine</serving><ADA>Y</ADA>'
+            '<outagedate>10/18/2026 08:00:00 AM</outagedate>'
+            '<estimatedreturntoservice>10/19/2026 11:00:00 PM</estimatedreturntoservice>'
+            '<reason>Repair</reason><isupcomingoutage>N</isupcomingoutage><ismaintenanceoutage>N</ismaintenanceoutage>'
+            '</outage>'
+        )
+    return f'<?xml version="1.0" encoding="utf-8"?><NYCOutages>{"".join(outages)}</NYCOutages>'.encode('utf-8')
+
+
+def synthetic(fixture_dir=FIXTURE_DIR, trips_per_route=40, alerts=60, elevators=120, seed=1, now=None):
+    """Generate realistic-size feeds from the static GTFS (shapes give real stop orders).
+
+    ``now`` is the feed timestamp, the current time by default.
+    """
+    from data.gtfs_registry import gtfs
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    rnd = random.Random(seed)
+    now = int(time.time()) if now is None else now
+
+    stops = gtfs.stops
+    if stops is None:
+        raise RuntimeError(f"No stops.txt in {gtfs.directory}")
+    rows = np.flatnonzero(stops.valid & (stops.parents >= 0))
+    platforms = (np.array([stops.stop_id(row) for row in rows.tolist()]), stops.lats[rows], stops.lons[rows])
+    stations = sorted({stops.name(row) for row in np.flatnonzero(stops.parents < 0).tolist()})
+    route_shapes, shapes = _route_shapes(gtfs)
+
+    saved = {}
+
+    def save(path, content):
+        name = fixture_name(path)
+        with open(os.path.join(fixture_dir, name), 'wb') as f:
+            f.write(content)
+        saved[name] = len(content)
+
+    for line, path in SUBWAY_FEEDS.items():
+        feed = synthetic_subway_feed(FEED_ROUTES[line], route_shapes, shapes, platforms,
+                                     trips_per_route, now, rnd)
+        save(path, feed.SerializeToString())
+    all_routes = [route for routes in FEED_ROUTES.values() for route in routes]
+    save(SERVICE_ALERTS['subway'], synthetic_alerts(all_routes, platforms, alerts, now, rnd).SerializeToString())
+    save(f"{ELEVATOR_FEEDS['current']}.xml", synthetic_elevators(stations, elevators, rnd))
+    write_manifest(fixture_dir, 'synthetic', saved, gtfs_dir=gtfs.directory, seed=seed, now=now,
+                   trips_per_route=trips_per_route, alerts=alerts, elevators=elevators)
+    return saved
+
+
+def ensure_fixtures(fixture_dir=FIXTURE_DIR):
+    """Generate synthetic fixtures unless some are already there"""
+    if not os.path.exists(os.path.join(fixture_dir, 'manifest.json')):
+        synthetic(fixture_dir)
+    return fixture_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mode', choices=['record', 'synthetic'])
+    parser.add_argument('--dir', default=FIXTURE_DIR)
+    parser.add_argument('--trips-per-route', type=int, default=40)
+    parser.add_argument('--alerts', type=int, default=60)
+    parser.add_argument('--elevators', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--now', type=int, help='feed timestamp (default: the current time)')
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        saved = record(args.dir)
+    else:
+        saved = synthetic(args.dir, args.trips_per_route, args.alerts, args.elevators, args.seed, args.now)
+    for name, size in saved.items():
+        print(f"{name}: {size} bytes")
+
+
+if __name__ == '__main__':
+    main()
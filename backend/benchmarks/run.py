@@ -0,0 +1,475 @@
+# backend/benchmarks/run.py
+"""Benchmarks for the fetch, parse and serve paths, with JSON output.
+
+Run from backend/ (the GTFS paths are relative to it):
+
+    python -m benchmarks.run > results.json
+    python -m benchmarks.run --only parse,endpoints --latency 100 --output results.json
+    python -m benchmarks.run --baseline results.json      # exits 1 on regressions
+
+Upstream feeds come from the stub server replaying benchmarks/fixtures/, so
+nothing here touches the live MTA API. Timings are medians over --repeat
+runs; keys ending in _ms/_mb are lower-is-better, _per_s higher-is-better.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+
+BENCHMARKS = ['parse', 'static', 'snapshot', 'memory', 'endpoints', 'workers']
+
+ENDPOINTS = [
+    '/api/subway/all',
+    '/api/subway/geojson',
+    '/api/subway/geojson?bbox=-74.02,40.70,-73.95,40.78',
+    '/api/status',
+    '/api/subway/lines?zoom=12',
+    '/api/subway/stops',
+    '/api/stops/nearby?lat=40.7580&lon=-73.9855',
+    '/api/stops/127/arrivals',
+    '/tiles/13/2412/3078.mvt'
+]
+
+
+def measure(fn, repeat, warmup=1):
+    """Median/min/max wall time of ``fn()`` in milliseconds; returns (stats, last result)"""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': float(np.median(times)), 'min_ms': min(times), 'max_ms': max(times), 'runs': repeat}, result
+
+
+def bench_parse(args):
+    """Protobuf decode + entity parse + arrivals index per subway feed, plus alerts/elevator parsing"""
+    from google.transit import gtfs_realtime_pb2
+    from config.config import SUBWAY_FEEDS, SERVICE_ALERTS, ELEVATOR_FEEDS
+    from data.gtfs_registry import gtfs
+    from services.arrivals import ArrivalIndex
+    from services.mta_service import MTAService
+    from benchmarks.fixtures import fixture_name
+
+    service = MTAService(max_workers=1)
+
+    def parse(content):
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.ParseFromString(content)
+        rows = []
+        parsed = service._parse_subway_feed(feed, rows)
+        ArrivalIndex.build(rows, gtfs.parent_station)
+        return parsed
+
+    results, total_bytes, total_entities, total_ms = {}, 0, 0, 0.0
+    for line, path in SUBWAY_FEEDS.items():
+        content = read_fixture(args, fixture_name(path))
+        if content is None:
+            continue
+        stats, parsed = measure(lambda: parse(content), args.repeat)
+        entities = len(parsed['entities'])
+        results[line] = {**stats, 'bytes': len(content), 'entities': entities,
+                         'entities_per_s': entities / stats['median_ms'] * 1000}
+        total_bytes += len(content)
+        total_entities += entities
+        total_ms += stats['median_ms']
+    results['all_subway'] = {'median_ms': total_ms, 'bytes': total_bytes, 'entities': total_entities,
+                             'entities_per_s': total_entities / total_ms * 1000 if total_ms else None,
+                             'mb_per_s': total_bytes / 1e6 / total_ms * 1000 if total_ms else None}
+
+    # One route's vehicles out of the largest feed, filtered while parsing
+    content = read_fixture(args, fixture_name(SUBWAY_FEEDS['123456s']))
+    if content is not None:
+        def parse_route():
+            feed = gtfs_realtime_pb2.FeedMessage()
+            feed.ParseFromString(content)
+            return service._parse_subway_feed(feed, routes={'1'}, types={'vehicle'})
+        results['route_filtered'], _ = measure(parse_route, args.repeat)
+
+    content = read_fixture(args, fixture_name(SERVICE_ALERTS['subway']))
+    if content is not None:
+        def parse_alerts():
+            feed = gtfs_realtime_pb2.FeedMessage()
+            feed.ParseFromString(content)
+            return service._parse_service_alerts(feed)
+        results['alerts'], _ = measure(parse_alerts, args.repeat)
+    content = read_fixture(args, fixture_name(f"{ELEVATOR_FEEDS['current']}.xml"))
+    if content is not None:
+        results['elevator_xml'], _ = measure(lambda: service._parse_elevator_xml(content),
+                                             args.repeat)
+    return results
+
+
+def bench_static(args):
+    """Cold and cached builds of the static map layers"""
+    from data.gtfs_subway_map import generate_lines_geojson, generate_stops_geojson
+    from data.gtfs_registry import gtfs
+    from services.response_cache import serialize_json
+
+    builders = {
+        'lines': generate_lines_geojson,
+        'lines_simplified_8m': lambda: generate_lines_geojson(8),
+        'stops': generate_stops_geojson,
+        'shapes': gtfs.shapes_geojson
+    }
+    results = {}
+    for name, build in builders.items():
+        try:
+            stats, data = measure(build, args.repeat)
+        except Exception as e:
+            results[name] = {'error': str(e)}
+            continue
+        results[name] = {**stats, 'bytes': len(serialize_json(data))}
+    return results
+
+
+def refresh(service, store, states):
+    """One refresher cycle with every feed due at once, timed per stage.
+
+    Feeds are polled and folded in as services/refresher.py does it;
+    ``states`` carries the subway FeedStates between cycles, so a cycle
+    over unchanged feeds only moves the trains along their shapes.
+    """
+    from services.refresher import build_scheduler, collect_update
+
+    scheduler = build_scheduler(['subway'], ['current'], time.time())
+    started = time.perf_counter()
+    futures = {feed_key: service.executor.submit(service.poll_feed, feed_key)
+               for feed_key in scheduler.pop_due(float('inf'))}
+    wait(futures.values())
+    fetched = time.perf_counter()
+    update = collect_update(service, scheduler, futures, states, time.time())
+    if 'subway_geojson' not in update:
+        update['subway_geojson'] = service.to_geojson(store.get_snapshot().subway_data)
+    update['feed_status'] = service.feed_status()
+    built = time.perf_counter()
+    store.publish(**update)
+    published = time.perf_counter()
+    return {'fetch_ms': (fetched - started) * 1000, 'update_ms': (built - fetched) * 1000,
+            'publish_ms': (published - built) * 1000, 'total_ms': (published - started) * 1000}
+
+
+def bench_snapshot(args):
+    """Poll-to-publish time with every feed changed (cold) and with unchanged feeds (warm)"""
+    from services.mta_service import MTAService
+    from services.transit_store import new_store
+
+    estimator = MTAService(max_workers=1).position_estimator()
+
+    def cold():
+        service = MTAService()
+        service._position_estimator = estimator
+        return refresh(service, new_store(), {})
+
+    warm_service = MTAService()
+    warm_service._position_estimator = estimator
+    warm_store, warm_states = new_store(), {}
+
+    results = {}
+    for name, run in (('cold', cold), ('warm', lambda: refresh(warm_service, warm_store, warm_states))):
+        run()
+        stages = [run() for _ in range(args.repeat)]
+        results[name] = {key: float(np.median([stage[key] for stage in stages])) for key in stages[0]}
+    return results
+
+
+def bench_memory(args):
+    """Python heap held by one published snapshot, and the peak while building it"""
+    from services.mta_service import MTAService
+    from services.transit_store import new_store
+
+    estimator = MTAService(max_workers=1).position_estimator()
+    store = new_store()
+
+    def cold_refresh():
+        service = MTAService()
+        service._position_estimator = estimator
+        refresh(service, store, {})
+
+    cold_refresh()  # warm interned strings and lazy imports out of the measurement
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        cold_refresh()
+        after_first, peak = tracemalloc.get_traced_memory()
+        cold_refresh()
+        after_second, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'refresh_peak_mb': (peak - before) / 1e6,
+        'retained_after_refresh_mb': (after_first - before) / 1e6,
+        'growth_next_refresh_mb': (after_second - after_first) / 1e6
+    }
+
+
+def bench_endpoints(args):
+    """Latency and throughput of the read endpoints under concurrent clients"""
+    import requests
+    from werkzeug.serving import make_server
+    from app import create_app
+    from services.transit_store import transit_data
+
+    app = create_app('inline')
+    deadline = time.time() + 60
+    while transit_data.get_version() == 0:
+        if time.time() > deadline:
+            raise RuntimeError('No snapshot published within 60s')
+        time.sleep(0.1)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    local = threading.local()
+
+    def fetch(path):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        response = session.get(base_url + path, headers={'Accept-Encoding': 'gzip, br'})
+        return (time.perf_counter() - started) * 1000, response.status_code, len(response.content)
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for path in ENDPOINTS:
+                list(pool.map(fetch, [path] * args.concurrency))  # warm caches and connections
+                started = time.perf_counter()
+                samples = list(pool.map(fetch, [path] * args.requests))
+                elapsed = time.perf_counter() - started
+                latencies = np.array([sample[0] for sample in samples])
+                results[path] = {
+                    'p50_ms': float(np.percentile(latencies, 50)),
+                    'p95_ms': float(np.percentile(latencies, 95)),
+                    'p99_ms': float(np.percentile(latencies, 99)),
+                    'requests_per_s': len(samples) / elapsed,
+                    'errors': sum(1 for sample in samples if sample[1] >= 400),
+                    'bytes': samples[-1][2]
+                }
+    finally:
+        server.shutdown()
+    return results
+
+
+def child_pids(pid):
+    """Direct children of ``pid``, from /proc"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # pid (comm) state ppid ...; comm may contain spaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def process_memory(pid):
+    """Resident (rss) and proportional (pss: shared pages split between their users) memory in MB"""
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+    return {'rss_mb': int(fields['Rss'].split()[0]) / 1024, 'pss_mb': int(fields['Pss'].split()[0]) / 1024}
+
+
+def bench_workers(args):
+    """Memory of the fetcher and of each worker in a gunicorn deployment (gunicorn.conf.py).
+
+    The workers share the rendered response bodies through the mapped snapshot
+    files but each holds its own parsed copy of the snapshot, so this is what
+    every extra worker costs. Linux only (reads /proc).
+    """
+    import requests
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        return {'error': 'needs /proc/<pid>/smaps_rollup'}
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = {**os.environ, 'PORT': str(port), 'WEB_CONCURRENCY': str(args.workers)}
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while True:
+            if time.time() > deadline or master.poll() is not None:
+                raise RuntimeError('gunicorn did not serve a snapshot within 120s')
+            try:
+                if requests.get(f"{base_url}/api/status", timeout=5).status_code == 200:
+                    break
+            except requests.RequestException:  # not listening yet, or busy starting up
+                pass
+            time.sleep(0.5)
+
+        # Let every worker pick up snapshots and serve each endpoint a few times
+        time.sleep(args.settle)
+        with requests.Session() as session:
+            for path in ENDPOINTS:
+                for _ in range(args.workers * 4):
+                    session.get(base_url + path, headers={'Accept-Encoding': 'gzip, br'}, timeout=30)
+
+        fetcher, workers = None, []
+        for pid in child_pids(master.pid):
+            with open(f"/proc/{pid}/cmdline", 'rb') as f:
+                if b'fetcher.py' in f.read():
+                    fetcher = process_memory(pid)
+                else:
+                    workers.append(process_memory(pid))
+        return {
+            'workers': len(workers),
+            'fetcher': fetcher,
+            'worker_rss_mb': float(np.median([worker['rss_mb'] for worker in workers])),
+            'worker_pss_mb': float(np.median([worker['pss_mb'] for worker in workers])),
+            'per_worker': workers
+        }
+    finally:
+        master.terminate()
+        try:
+            master.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+
+def read_fixture(args, name):
+    path = os.path.join(args.fixtures, name)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read() * (1 if name.endswith(('.json', '.xml')) else args.size)
+
+
+def flatten(results, prefix=''):
+    """Nested result dict -> {'a.b.c': number}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """Metrics that got worse than ``baseline`` by more than ``tolerance`` (a fraction)"""
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old or value is None:
+            continue
+        if name.endswith(('_ms', '_mb')):
+            change = (value - old) / old
+        elif name.endswith('_per_s'):
+            change = (old - value) / old
+        else:
+            continue
+        if change > tolerance:
+            regressions.append({'metric': name, 'baseline': old, 'current': value, 'worse_by': change})
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', help=f"comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fixtures', default=None, help='fixture directory (default benchmarks/fixtures)')
+    parser.add_argument('--size', type=int, default=1, help='scale protobuf feeds by this factor')
+    parser.add_argument('--latency', type=float, default=0, help='stub server latency per request (ms)')
+    parser.add_argument('--jitter', type=float, default=0, help='stub server latency jitter (ms)')
+    parser.add_argument('--stub-port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for the workers benchmark')
+    parser.add_argument('--settle', type=float, default=20, help='seconds the workers run before measuring')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before failing')
+    args = parser.parse_args()
+
+    # The feed URL is read when config is first imported, so point it at the
+    # stub before importing anything from the app
+    os.environ['MTA_API_BASE_URL'] = f"http://127.0.0.1:{args.stub_port}/"
+    # Likewise keep the archive segments and shared snapshots the app writes
+    # out of the deployment's data/ directories
+    scratch = tempfile.TemporaryDirectory(prefix='transit-bench-')
+    os.environ['ARCHIVE_DIR'] = os.path.join(scratch.name, 'archive')
+    os.environ['SNAPSHOT_PATH'] = os.path.join(scratch.name, 'shared', 'snapshot')
+    from benchmarks.fixtures import FIXTURE_DIR, ensure_fixtures
+    from benchmarks.stub_server import StubMTAServer
+
+    args.fixtures = ensure_fixtures(args.fixtures or FIXTURE_DIR)
+    stub = StubMTAServer(('127.0.0.1', args.stub_port), args.fixtures, args.latency, args.jitter,
+                         args.size).start()
+
+    selected = args.only.split(',') if args.only else BENCHMARKS
+    with open(os.path.join(args.fixtures, 'manifest.json')) as f:
+        manifest = json.load(f)
+    output = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'fixtures': {key: value for key, value in manifest.items() if key != 'files'},
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+        },
+        'results': {}
+    }
+    for name in selected:
+        print(f"Running {name}...", file=sys.stderr)
+        output['results'][name] = globals()[f"bench_{name}"](args)
+    output['meta']['stub_requests'] = stub.requests
+    stub.shutdown()
+    scratch.cleanup()
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(output['results'], json.load(f)['results'], args.tolerance)
+        output['regressions'] = regressions
+        for regression in regressions:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']:.3f} -> "
+                  f"{regression['current']:.3f} ({regression['worse_by']:+.0%})", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
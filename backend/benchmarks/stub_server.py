@@ -0,0 +1,120 @@
+# backend/benchmarks/stub_server.py
+"""Local stand-in for the MTA feed API that replays recorded fixtures.
+
+    python -m benchmarks.stub_server --port 8765 --latency 150 --jitter 50 --repeat 2
+    MTA_API_BASE_URL=http://127.0.0.1:8765/ gunicorn ...
+
+Paths without a fixture return 404, like the real API for formats it does
+not serve. ``repeat`` scales protobuf feeds by concatenating the message
+with itself, which repeats its entity list.
+"""
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.fixtures import FIXTURE_DIR, ensure_fixtures, fixture_name
+
+TEXT_TYPES = {'.json': 'application/json', '.xml': 'application/xml'}
+
+
+class StubMTAServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixture_dir=FIXTURE_DIR, latency_ms=0, jitter_ms=0,
+                 repeat=1, etags=False, fail=()):
+        super().__init__(address, StubHandler)
+        self.fixture_dir = fixture_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.repeat = repeat
+        self.etags = etags
+        self.fail = set(fail)  # fixture names that answer 500
+        self.requests = 0
+        self._bodies = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def body(self, name):
+        """Fixture bytes (scaled by ``repeat``), or None if there is no such fixture"""
+        if name not in self._bodies:
+            path = os.path.join(self.fixture_dir, name)
+            if not os.path.isfile(path) or name == 'manifest.json':
+                self._bodies[name] = None
+            else:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                if os.path.splitext(name)[1] not in TEXT_TYPES:
+                    content *= self.repeat
+                self._bodies[name] = content
+        return self._bodies[name]
+
+    def start(self):
+        """Serve from a daemon thread; returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        delay = server.latency_ms + random.uniform(-server.jitter_ms, server.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        name = fixture_name(self.path.split('?', 1)[0])
+        body = server.body(name)
+        if name in server.fail:
+            return self._send(500, b'')
+        if body is None:
+            return self._send(404, b'')
+
+        headers = {'Content-Type': TEXT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')}
+        if server.etags:
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                return self._send(304, b'', headers)
+        self._send(200, body, headers)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--dir', default=FIXTURE_DIR)
+    parser.add_argument('--latency', type=float, default=0, help='added latency per request (ms)')
+    parser.add_argument('--jitter', type=float, default=0, help='+/- random latency (ms)')
+    parser.add_argument('--repeat', type=int, default=1, help='scale protobuf feed size by this factor')
+    parser.add_argument('--etags', action='store_true', help='send ETags and answer 304 when unchanged')
+    parser.add_argument('--fail', action='append', default=[], help='fixture name to answer with 500')
+    args = parser.parse_args()
+
+    ensure_fixtures(args.dir)
+    server = StubMTAServer((args.host, args.port), args.dir, args.latency, args.jitter,
+                           args.repeat, args.etags, args.fail)
+    print(f"Serving {args.dir} at {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
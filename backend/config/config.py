@@ -5,8 +5,107 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # No API key needed - MTA APIs are public
-API_BASE_URL = 'https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/'
-REFRESH_INTERVAL = 60  # seconds
+API_BASE_URL = os.getenv('MTA_API_BASE_URL', 'https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/')
+POSITION_UPDATE_INTERVAL = 5  # seconds between re-estimating train positions
+
+# 'inline': each web process polls the MTA itself (python app.py, one gunicorn
+# worker). 'shared': fetcher.py polls once and publishes snapshots to
+# SNAPSHOT_PATH, which the workers map (set by gunicorn.conf.py). 'off': no
+# polling; the app serves whatever is published to its store
+REFRESH_MODE = os.getenv('REFRESH_MODE', 'inline')
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', 'data/shared/snapshot')
+SNAPSHOT_POLL_INTERVAL = 0.5  # seconds between workers' checks for a new snapshot
+# Set by gunicorn.conf.py: the fetcher exits once this process (the master) is gone
+FETCHER_PARENT_PID = int(os.getenv('FETCHER_PARENT_PID', 0))
+
+# Static GTFS feed (see data/gtfs_registry.py) and the memory-mappable binary
+# cache of its tables (see data/gtfs_cache.py)
+GTFS_DIR = os.getenv('GTFS_DIR', 'data/gtfs_subway')
+GTFS_CACHE_DIR = os.getenv('GTFS_CACHE_DIR', 'data/gtfs_cache')
+
+# Number of vehicle GeoJSON deltas kept for /api/subway/geojson?since=<version>;
+# clients further behind than this get a full snapshot instead
+GEOJSON_DELTA_HISTORY = 30
+
+# Cache lifetime for the static map layers (lines, stops, shapes); they only
+# change with a new GTFS release and are revalidated by ETag after that
+STATIC_LAYER_MAX_AGE = 3600  # seconds
+
+# Douglas-Peucker tolerances (meters) precomputed for /api/subway/lines?zoom=;
+# a request gets the coarsest level that stays under one pixel at its zoom
+LINE_SIMPLIFY_TOLERANCES = [0, 2, 8, 30, 120]
+
+# Vector tiles (/tiles/<z>/<x>/<y>)
+TILE_MAX_ZOOM = 18
+TILE_STOPS_MIN_ZOOM = 12  # stops are only drawn from this zoom in
+TILE_VEHICLES_MIN_ZOOM = 10
+STATIC_TILE_CACHE_SIZE = 4096  # encoded static-layer tiles kept in memory
+TILE_CACHE_SIZE = 1024  # finished tiles for recent snapshot versions
+
+# Vehicle history archive (/api/history/vehicles)
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'data/archive')
+ARCHIVE_INTERVAL = 30  # seconds between archived frames
+ARCHIVE_SEGMENT_SECONDS = 3600  # one compressed segment file per hour
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', 28))
+HISTORY_MAX_RANGE = 1800  # seconds covered by one ?from=&to= request
+
+# Stop search (/api/stops/nearby)
+NEARBY_DEFAULT_RADIUS = 500  # meters
+NEARBY_MAX_RADIUS = 5000  # meters
+NEARBY_DEFAULT_LIMIT = 10
+NEARBY_MAX_LIMIT = 100
+
+# Arrival boards (/api/stops/<stop_id>/arrivals)
+ARRIVALS_DEFAULT_LIMIT = 10
+ARRIVALS_MAX_LIMIT = 50
+
+# Server-Sent Events stream (/api/stream)
+STREAM_QUEUE_SIZE = 16  # pending events per client before it is resynced
+STREAM_KEEPALIVE = 15  # seconds between keepalive comments
+# Each stream client holds one of a gunicorn worker's GUNICORN_THREADS threads
+# while it is connected. Past this many per worker, new clients get a 503 with
+# Retry-After so the remaining threads stay free for ordinary requests
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', max(1, int(os.getenv('GUNICORN_THREADS', 16)) * 3 // 4)))
+STREAM_RETRY_AFTER = 30  # seconds a refused stream client is told to wait
+
+# Upstream fetching: feeds are fetched in parallel over one pooled session
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 12))
+FEED_CONNECT_TIMEOUT = float(os.getenv('FEED_CONNECT_TIMEOUT', 3.05))  # seconds
+FEED_READ_TIMEOUT = float(os.getenv('FEED_READ_TIMEOUT', 10))  # seconds
+
+# Per-feed (connect, read) timeout overrides, keyed like SUBWAY_FEEDS
+FEED_TIMEOUTS = {
+    '123456s': (FEED_CONNECT_TIMEOUT, FEED_READ_TIMEOUT * 1.5),  # largest feed
+}
+
+# Per-feed circuit breaker: after this many consecutive failures a feed is
+# skipped for an exponentially growing backoff, and its last good data is served
+FEED_FAILURE_THRESHOLD = 3
+FEED_BACKOFF_BASE = 30  # seconds
+FEED_BACKOFF_MAX = 600  # seconds
+
+# On-demand upstream reads (/api/subway/<line>, alerts and elevator feeds the
+# refresher does not cover) are cached per resource for this many seconds;
+# concurrent misses share one fetch
+FETCH_CACHE_TTLS = {
+    'subway': 15,
+    'alerts': 60,
+    'elevator': 300
+}
+FETCH_CACHE_SIZE = 64  # entries, least recently used evicted first
+FILTERED_FETCH_CACHE_SIZE = 16  # route/type-filtered subway parses, cached apart from the feeds
+
+# Per-feed polling (services/scheduler.py): each feed is polled just after its
+# next expected update, learned from its header timestamps.
+# (initial interval, min interval, max interval) in seconds per resource
+FEED_SCHEDULES = {
+    'subway': (30, 5, 120),
+    'alerts': (120, 30, 600),
+    'elevator': (300, 120, 1800)  # no header timestamp; polled at the initial interval
+}
+SCHEDULE_DELAY = 2  # seconds after the expected update before polling
+SCHEDULE_JITTER = 3  # up to this many seconds added to each poll time
+PUBLISH_SETTLE = 0.5  # seconds to wait for feeds finishing together, to publish them as one snapshot
 
 # Define subway line feed mappings
 SUBWAY_FEEDS = {
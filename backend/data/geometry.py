@@ -0,0 +1,78 @@
+# backend/data/geometry.py
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Web Mercator ground resolution at the equator, zoom 0
+METERS_PER_PIXEL_Z0 = 156543.03
+
+
+def meters_per_pixel(zoom, lat=40.7):
+    """Ground resolution of a Web Mercator map at ``zoom`` (NYC latitude by default)"""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def _to_meters(coords):
+    """Project [lon, lat] pairs to a local equirectangular plane in meters"""
+    lons, lats = coords[:, 0], coords[:, 1]
+    scale = math.cos(math.radians(float(lats.mean())))
+    return np.column_stack((np.radians(lons) * scale, np.radians(lats))) * EARTH_RADIUS_M
+
+
+def simplify_line(coords, tolerance_m):
+    """Douglas-Peucker simplification of a [lon, lat] line with a tolerance in meters"""
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if tolerance_m <= 0 or len(points) < 3:
+        return points.tolist()
+
+    xy = _to_meters(points)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = xy[start], xy[end]
+        segment = b - a
+        length_sq = float(segment @ segment)
+        between = xy[start + 1:end] - a
+        # Distance to the segment, not the infinite line through it, so points
+        # past either end (hairpins, tails of loops) are not dropped
+        t = np.clip(between @ segment / length_sq, 0, 1) if length_sq else np.zeros(len(between))
+        offsets = between - t[:, None] * segment
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep].tolist()
+
+
+def dedupe_route_shapes(shapes, shape_to_route, precision=5):
+    """Drop shapes whose vertices are all already covered by other shapes of the same route.
+
+    Opposite directions and short-turn variants of a route mostly retrace the
+    same track, so only the shapes that add new geometry are kept, longest
+    first. Returns ``{route_id: [shape_id, ...]}``.
+    """
+    by_route = {}
+    for shape_id, coords in shapes.items():
+        route_id = shape_to_route.get(shape_id)
+        if route_id:
+            by_route.setdefault(route_id, []).append(shape_id)
+
+    kept = {}
+    for route_id, shape_ids in by_route.items():
+        covered = set()
+        kept[route_id] = []
+        for shape_id in sorted(shape_ids, key=lambda shape_id: (-len(shapes[shape_id]), shape_id)):
+            vertices = {(round(lon, precision), round(lat, precision)) for lon, lat in shapes[shape_id]}
+            if vertices <= covered:
+                continue
+            covered |= vertices
+            kept[route_id].append(shape_id)
+    return kept
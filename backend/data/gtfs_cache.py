@@ -0,0 +1,243 @@
+# backend/data/gtfs_cache.py
+"""Columnar binary cache of the static GTFS text tables.
+
+Each table is converted once into NumPy arrays: numeric columns are stored as
+float/int arrays and text columns as int32 codes into a per-column table of
+unique strings (a UTF-8 blob plus offsets), numbered in sorted order. Id
+columns also keep their unique values as a sorted fixed-width array, so a
+value is found by binary search without decoding the column. Arrays are
+opened with ``mmap_mode='r'`` so gunicorn workers share the same pages
+instead of each holding its own parsed copy.
+
+A cache directory is keyed by the hash of its source file, so editing or
+replacing a GTFS file triggers a rebuild on next load. Run
+``python -m data.gtfs_cache`` from ``backend/`` to build ahead of time.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from config.config import GTFS_DIR, GTFS_CACHE_DIR
+
+CACHE_FORMAT = 2
+
+# Columns stored as numbers; everything else is an interned string column
+NUMERIC_COLUMNS = {
+    'stop_lat': 'f8',
+    'stop_lon': 'f8',
+    'shape_pt_lat': 'f8',
+    'shape_pt_lon': 'f8',
+    'shape_pt_sequence': 'i4',
+    'shape_dist_traveled': 'f8'
+}
+
+# Text columns looked up by value (see GTFSTable.lookup)
+KEY_COLUMNS = {'stop_id', 'parent_station', 'route_id', 'shape_id', 'trip_id'}
+
+# Tables whose rows are stored pre-sorted, so grouped reads need no sort
+SORT_KEYS = {
+    'shapes': ('shape_id', 'shape_pt_sequence')
+}
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def file_hash(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GTFSTable:
+    """Read-only, memory-mapped view of one cached GTFS table"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.rows = manifest['rows']
+        self.columns = manifest['columns']
+        self._arrays = {}
+        self._strings = {}
+
+    def __len__(self):
+        return self.rows
+
+    def has_column(self, column):
+        return column in self.columns
+
+    def _load(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            array = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r')
+            self._arrays[name] = array
+        return array
+
+    def numeric(self, column):
+        """Numeric column as a memory-mapped array (NaN/-1 where unparseable)"""
+        return self._load(column)
+
+    def codes(self, column):
+        """Per-row int32 codes into ``strings(column)``"""
+        return self._load(f"{column}.codes")
+
+    def strings(self, column):
+        """Unique values of a text column, indexed by code"""
+        strings = self._strings.get(column)
+        if strings is None:
+            blob = self._load(f"{column}.blob").tobytes()
+            offsets = self._load(f"{column}.offsets").tolist()
+            strings = [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+            self._strings[column] = strings
+        return strings
+
+    def values(self, column):
+        """Per-row values of a text column as an object array"""
+        return np.array(self.strings(column), dtype=object)[self.codes(column)]
+
+    def string(self, column, code):
+        """One value of a text column, decoded on its own"""
+        offsets = self._load(f"{column}.offsets")
+        return self._load(f"{column}.blob")[offsets[code]:offsets[code + 1]].tobytes().decode('utf-8')
+
+    def keys(self, column):
+        """Unique values of a key column as a sorted bytes array; a value's position is its code"""
+        return self._load(f"{column}.keys")
+
+    def lookup(self, column, values):
+        """Codes of ``values`` (strings or a bytes array) in a key column, -1 where absent"""
+        keys = self.keys(column)
+        if not isinstance(values, np.ndarray):
+            values = np.array([value.encode('utf-8') for value in values], dtype=bytes)
+        if not len(keys) or not len(values):
+            return np.full(len(values), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+        return np.where(keys[positions] == values, positions, -1)
+
+
+def _parse_numeric(values, dtype):
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        missing = np.nan if dtype.startswith('f') else -1
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(float(value) if dtype.startswith('f') else int(value))
+            except ValueError:
+                parsed.append(missing)
+        return np.array(parsed, dtype=dtype)
+
+
+def build_table(source, directory, table_name):
+    """Convert a GTFS text file into a cache directory of .npy files"""
+    with open(source, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row + [''] * (len(header) - len(row)) for row in reader]
+
+    columns = dict(zip(header, zip(*rows))) if rows else {name: () for name in header}
+    arrays = {}
+    kinds = {}
+    for name, values in columns.items():
+        dtype = NUMERIC_COLUMNS.get(name)
+        if dtype:
+            arrays[name] = _parse_numeric(values, dtype)
+            kinds[name] = dtype
+        else:
+            # Codes follow sorted order (UTF-8 bytes sort like code points)
+            uniques = sorted(set(values))
+            code_of = {value: code for code, value in enumerate(uniques)}
+            arrays[f"{name}.codes"] = np.fromiter((code_of[value] for value in values),
+                                                  dtype=np.int32, count=len(values))
+            encoded = [value.encode('utf-8') for value in uniques]
+            arrays[f"{name}.offsets"] = np.concatenate(
+                ([0], np.cumsum([len(value) for value in encoded], dtype=np.int64)))
+            arrays[f"{name}.blob"] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            if name in KEY_COLUMNS:
+                arrays[f"{name}.keys"] = np.array(encoded, dtype=bytes)
+            kinds[name] = 'str'
+
+    sort_key = SORT_KEYS.get(table_name)
+    if sort_key and rows:
+        # lexsort sorts by the last key first; text columns sort by code,
+        # which keeps rows of one value together
+        keys = [arrays[k] if k in arrays else arrays[f"{k}.codes"] for k in reversed(sort_key)]
+        order = np.lexsort(keys)
+        arrays = {name: (array[order] if not name.endswith(('.offsets', '.blob', '.keys')) else array)
+                  for name, array in arrays.items()}
+
+    os.makedirs(directory)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'format': CACHE_FORMAT, 'source': source, 'rows': len(rows), 'columns': kinds}, f)
+
+
+def load_table(source, cache_dir=GTFS_CACHE_DIR):
+    """Open the cached form of a GTFS file, (re)building it if the source changed"""
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"{source} not found")
+
+    table_name = os.path.splitext(os.path.basename(source))[0]
+    directory = os.path.join(cache_dir, f"{table_name}-{CACHE_FORMAT}-{file_hash(source)[:16]}")
+
+    with _lock:
+        table = _tables.get(directory)
+        if table is not None:
+            return table
+
+        if not os.path.exists(os.path.join(directory, 'manifest.json')):
+            # Build beside the final location and rename into place, so
+            # concurrent workers never see a half-written cache
+            tmp_directory = f"{directory}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            build_table(source, tmp_directory, table_name)
+            try:
+                os.rename(tmp_directory, directory)
+                print(f"Built GTFS cache for {source} in {directory}")
+            except OSError:
+                shutil.rmtree(tmp_directory, ignore_errors=True)  # another process won
+            _remove_stale(cache_dir, table_name, directory)
+
+        table = GTFSTable(directory)
+        _tables[directory] = table
+        return table
+
+
+def _remove_stale(cache_dir, table_name, keep):
+    """Best-effort cleanup of caches built from older versions of a source file"""
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if entry.startswith(f"{table_name}-") and '.tmp-' not in entry and path != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def grouped_points(source, cache_dir=GTFS_CACHE_DIR):
+    """Shape points grouped by shape_id and ordered by sequence.
+
+    Returns ``(shape_ids, bounds, lons, lats)``: the points of ``shape_ids[i]``
+    are ``lons[bounds[i]:bounds[i + 1]]`` / ``lats[...]``.
+    """
+    table = load_table(source, cache_dir)
+    codes = table.codes('shape_id')
+    if len(codes) == 0:
+        return [], np.zeros(1, dtype=np.int64), np.empty(0), np.empty(0)
+
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1, [len(codes)]))
+    strings = table.strings('shape_id')
+    shape_ids = [strings[code] for code in codes[bounds[:-1]].tolist()]
+    return shape_ids, bounds, table.numeric('shape_pt_lon'), table.numeric('shape_pt_lat')
+
+
+if __name__ == '__main__':
+    for name in sorted(os.listdir(GTFS_DIR)):
+        if name.endswith('.txt'):
+            table = load_table(os.path.join(GTFS_DIR, name), GTFS_CACHE_DIR)
+            print(f"{name}: {len(table)} rows, {len(table.columns)} columns")
@@ -0,0 +1,202 @@
+# backend/data/gtfs_registry.py
+"""One shared, lazily built view of the static GTFS feed.
+
+Every table is opened through the memory-mapped cache in data/gtfs_cache.py
+the first time something asks for it and is kept for the life of the
+process. Stops and shapes stay as the mapped NumPy columns: ids are found
+by binary search on the cached keys and values are only decoded into Python
+objects where a response is built. Only the small derived maps (route
+colors and names, shape-to-route) are plain dicts. Importing this module
+reads nothing; routes and services all go through the ``gtfs`` instance
+instead of loading their own copies.
+"""
+import functools
+import os
+import threading
+import numpy as np
+from data.gtfs_cache import load_table, grouped_points
+from config.config import GTFS_DIR
+
+# Fallback for stops missing from the GTFS data
+HARDCODED_STOPS = {
+    "101N": [40.7132, -74.0079],  # South Ferry
+}
+
+# For stops not in our mapping
+DEFAULT_COORDINATES = [40.7128, -74.0060]  # Lower Manhattan
+
+
+def built_once(method):
+    """Property computed by ``method`` on first access and then reused"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def getter(self):
+        try:
+            return self._built[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._built:
+                self._built[name] = method(self)
+            return self._built[name]
+    return property(getter)
+
+
+class StopTable:
+    """stops.txt as mapped columns, addressed by row.
+
+    ``lats``/``lons`` are the cached arrays (NaN where a stop has no valid
+    coordinates) and ``parents`` holds each stop's parent station row, or -1
+    for stations.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.lats = table.numeric('stop_lat')
+        self.lons = table.numeric('stop_lon')
+        self.valid = np.isfinite(self.lats) & np.isfinite(self.lons)
+        codes = table.codes('stop_id')
+        self._row_of_code = np.full(len(table.keys('stop_id')), -1, dtype=np.int64)
+        self._row_of_code[codes] = np.arange(len(codes))
+        if table.has_column('parent_station'):
+            parent_rows = self.rows(table.keys('parent_station'))
+            self.parents = parent_rows[table.codes('parent_station')]
+        else:
+            self.parents = np.full(len(codes), -1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.table)
+
+    def rows(self, stop_ids):
+        """Rows of ``stop_ids`` (strings or a bytes array), -1 where unknown"""
+        codes = self.table.lookup('stop_id', stop_ids)
+        return np.where(codes >= 0, self._row_of_code[codes], -1)
+
+    def row(self, stop_id):
+        return int(self.rows([stop_id])[0])
+
+    def stop_id(self, row):
+        return self.table.string('stop_id', self.table.codes('stop_id')[row])
+
+    def name(self, row):
+        if not self.table.has_column('stop_name'):
+            return ''
+        return self.table.string('stop_name', self.table.codes('stop_name')[row])
+
+    def location(self, row):
+        """[lat, lon] of a row, or None without valid coordinates"""
+        if row < 0 or not self.valid[row]:
+            return None
+        return [float(self.lats[row]), float(self.lons[row])]
+
+
+class GTFSRegistry:
+    """Static GTFS tables of one feed directory and the indexes derived from them"""
+
+    def __init__(self, directory=GTFS_DIR):
+        self.directory = directory
+        self._built = {}
+        self._lock = threading.RLock()  # builders use other builders
+
+    def table(self, name):
+        """Cached table for ``<name>.txt``, or None (with a warning) if the file is missing"""
+        path = os.path.join(self.directory, f"{name}.txt")
+        if not os.path.exists(path):
+            print(f"Warning: {path} not found.")
+            return None
+        return load_table(path)
+
+    def _text_columns(self, table, names):
+        return [table.values(name).tolist() if table.has_column(name) else [''] * len(table) for name in names]
+
+    @built_once
+    def stops(self):
+        """StopTable over stops.txt, or None if it is missing"""
+        table = self.table('stops')
+        if table is None:
+            return None
+        stops = StopTable(table)
+        if not stops.valid.all():
+            print(f"Skipped {int((~stops.valid).sum())} stops without valid coordinates")
+        print(f"Loaded {int(stops.valid.sum())} stop locations from GTFS data")
+        return stops
+
+    @built_once
+    def route_colors(self):
+        """route_id -> '#rrggbb' for routes that define a color"""
+        table = self.table('routes')
+        if table is None:
+            return {}
+        route_ids, colors = self._text_columns(table, ('route_id', 'route_color'))
+        route_colors = {route_id: f"#{color}" for route_id, color in zip(route_ids, colors) if color}
+        print(f"Loaded {len(route_colors)} route colors from GTFS data")
+        return route_colors
+
+    @built_once
+    def route_names(self):
+        """route_id -> route_short_name"""
+        table = self.table('routes')
+        if table is None:
+            return {}
+        return dict(zip(*self._text_columns(table, ('route_id', 'route_short_name'))))
+
+    @built_once
+    def shape_to_route(self):
+        """shape_id -> route_id of the last trip in trips.txt that uses the shape"""
+        table = self.table('trips')
+        if table is None:
+            return {}
+        shape_codes = table.codes('shape_id')
+        shapes, from_end = np.unique(shape_codes[::-1], return_index=True)
+        routes = table.codes('route_id')[len(shape_codes) - 1 - from_end]
+        return {table.string('shape_id', shape): table.string('route_id', route)
+                for shape, route in zip(shapes.tolist(), routes.tolist())}
+
+    @built_once
+    def shape_points(self):
+        """``(shape_ids, bounds, lons, lats)`` over the mapped shapes.txt, see grouped_points"""
+        path = os.path.join(self.directory, 'shapes.txt')
+        if not os.path.exists(path):
+            print(f"Warning: {path} not found.")
+            return [], np.zeros(1, dtype=np.int64), np.empty(0), np.empty(0)
+        return grouped_points(path)
+
+    def iter_shapes(self):
+        """(shape_id, ordered [lon, lat] coordinates) per shape, built as they are consumed"""
+        shape_ids, bounds, lons, lats = self.shape_points
+        for shape_id, start, end in zip(shape_ids, bounds[:-1].tolist(), bounds[1:].tolist()):
+            shape_lons, shape_lats = lons[start:end], lats[start:end]
+            valid = np.isfinite(shape_lons) & np.isfinite(shape_lats)
+            yield shape_id, np.column_stack((shape_lons[valid], shape_lats[valid])).tolist()
+
+    def shapes_geojson(self):
+        """Every shape as a LineString FeatureCollection"""
+        return {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'LineString', 'coordinates': coords},
+                'properties': {'shape_id': shape_id}
+            } for shape_id, coords in self.iter_shapes()]
+        }
+
+    def stop_coordinates(self, stop_id):
+        """[lat, lon] of a stop, or DEFAULT_COORDINATES if it is unknown"""
+        location = self.stops.location(self.stops.row(stop_id)) if self.stops is not None else None
+        return location or HARDCODED_STOPS.get(stop_id, DEFAULT_COORDINATES)
+
+    def stop_name(self, stop_id):
+        """Name of a stop, or None if it is unknown"""
+        row = self.stops.row(stop_id) if self.stops is not None else -1
+        return self.stops.name(row) if row >= 0 else None
+
+    def parent_station(self, stop_id):
+        """Parent station of a platform stop, or None for stations and unknown stops"""
+        row = self.stops.row(stop_id) if self.stops is not None else -1
+        if row < 0 or self.stops.parents[row] < 0:
+            return None
+        return self.stops.stop_id(self.stops.parents[row])
+
+
+gtfs = GTFSRegistry()
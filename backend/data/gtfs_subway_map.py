@@ -1,53 +1,26 @@
 # 📁 File: backend/data/gtfs_subway_map.py
-import csv
-import os
-from collections import defaultdict
-
-def load_routes(file_path='data/gtfs_subway/routes.txt'):
-    route_colors = {}
-    route_names = {}
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            route_id = row['route_id']
-            color = row.get('route_color', '888888')
-            short_name = row.get('route_short_name', '')
-            route_colors[route_id] = f"#{color}"
-            route_names[route_id] = short_name
-
-    return route_colors, route_names
-
-def map_shape_to_route(trips_file='data/gtfs_subway/trips.txt'):
-    shape_to_route = {}
-    with open(trips_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            shape_id = row['shape_id']
-            route_id = row['route_id']
-            shape_to_route[shape_id] = route_id
-    return shape_to_route
-
-def load_shapes(shape_file='data/gtfs_subway/shapes.txt'):
-    shapes = defaultdict(list)
-    with open(shape_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            shape_id = row['shape_id']
-            lat = float(row['shape_pt_lat'])
-            lon = float(row['shape_pt_lon'])
-            seq = int(row['shape_pt_sequence'])
-            shapes[shape_id].append((seq, lon, lat))
-    return shapes
-
-def generate_lines_geojson():
-    shape_to_route = map_shape_to_route()
-    route_colors, route_names = load_routes()
-    shapes = load_shapes()
+import numpy as np
+from data.gtfs_registry import gtfs
+from data.geometry import simplify_line, dedupe_route_shapes
+
+def generate_lines_geojson(tolerance_m=None):
+    """Route lines as GeoJSON.
+
+    With ``tolerance_m`` set, redundant shapes of each route are dropped and
+    the rest are simplified with Douglas-Peucker at that tolerance (meters);
+    without it every raw shape is returned.
+    """
+    shape_to_route = gtfs.shape_to_route
+    route_colors, route_names = gtfs.route_colors, gtfs.route_names
+    shapes = dict(gtfs.iter_shapes())
+
+    if tolerance_m is not None:
+        kept = dedupe_route_shapes(shapes, shape_to_route)
+        shapes = {shape_id: simplify_line(shapes[shape_id], tolerance_m)
+                  for shape_ids in kept.values() for shape_id in shape_ids}
 
     features = []
-    for shape_id, points in shapes.items():
-        coords = [coord[1:] for coord in sorted(points)]
+    for shape_id, coords in shapes.items():
         route_id = shape_to_route.get(shape_id)
         if not route_id:
             continue
@@ -68,28 +41,23 @@ def generate_lines_geojson():
 
     return {"type": "FeatureCollection", "features": features}
 
-def generate_stops_geojson(stop_file='data/gtfs_subway/stops.txt'):
+def generate_stops_geojson():
+    stops = gtfs.stops
     features = []
-    with open(stop_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                stop_id = row['stop_id']
-                lat = float(row['stop_lat'])
-                lon = float(row['stop_lon'])
-                name = row['stop_name']
-                features.append({
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [lon, lat]
-                    },
-                    "properties": {
-                        "stop_id": stop_id,
-                        "stop_name": name
-                    }
-                })
-            except Exception as e:
-                print(f"Error parsing stop: {e}")
+    if stops is None:
+        return {"type": "FeatureCollection", "features": features}
+    rows = np.flatnonzero(stops.valid)
+    for row, lat, lon in zip(rows.tolist(), stops.lats[rows].tolist(), stops.lons[rows].tolist()):
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [lon, lat]
+            },
+            "properties": {
+                "stop_id": stops.stop_id(row),
+                "stop_name": stops.name(row)
+            }
+        })
 
     return {"type": "FeatureCollection", "features": features}
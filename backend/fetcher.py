@@ -0,0 +1,44 @@
+# backend/fetcher.py
+"""Fetcher process: polls the MTA once on behalf of every gunicorn worker.
+
+    python fetcher.py
+
+Started by gunicorn.conf.py; it publishes each snapshot to SNAPSHOT_PATH
+(see services/shared_snapshot.py) and the workers follow it. Indexes and
+response bodies are built here once rather than in every worker. Its feed
+fetch and parse metrics are recorded to PROMETHEUS_MULTIPROC_DIR and served
+by the workers' /metrics (see services/metrics.py).
+"""
+import os
+import threading
+import time
+from services.mta_service import MTAService
+from services.refresher import refresh_forever
+from services.shared_snapshot import SharedSnapshotWriter
+from services.transit_store import new_store
+from config.config import SNAPSHOT_PATH, FETCHER_PARENT_PID
+
+
+def exit_with_parent(parent_pid, interval=1.0):
+    """Exit once ``parent_pid`` is no longer our parent, e.g. a gunicorn master killed with SIGKILL"""
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(interval)
+        print(f"Parent process {parent_pid} is gone; exiting")
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True, name='parent-watch').start()
+
+
+def main():
+    if FETCHER_PARENT_PID:
+        exit_with_parent(FETCHER_PARENT_PID)
+    writer = SharedSnapshotWriter(SNAPSHOT_PATH)
+    store = new_store(writer.version)
+    store.add_listener(writer.on_publish)
+    print(f"Publishing snapshots to {SNAPSHOT_PATH}")
+    refresh_forever(MTAService(), store.publish)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# backend/gunicorn.conf.py
+"""gunicorn settings: one fetcher process polls the MTA, the workers only serve.
+
+    gunicorn -c gunicorn.conf.py 'app:create_app()'      (from backend/)
+
+The master starts fetcher.py before forking the workers and sets
+REFRESH_MODE=shared so each worker follows the fetcher's snapshots instead
+of polling upstream itself; adding workers adds no MTA requests.
+
+It also points PROMETHEUS_MULTIPROC_DIR (a fresh temporary directory unless
+set) at a directory all of them record metrics into, so /metrics on any
+worker includes the fetcher's feed metrics and every worker's requests.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+# /api/stream holds a connection open per client, so workers serve
+# requests from a thread pool rather than one at a time. Streams may take at
+# most STREAM_MAX_CLIENTS of these threads (config/config.py); the rest are
+# kept for ordinary requests
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+_fetcher = None
+_stopping = threading.Event()
+_own_metrics_dir = None  # removed on exit if this run created it
+
+
+def _supervise_fetcher():
+    """Run fetcher.py, restarting it if it exits while gunicorn is still up.
+
+    The fetcher runs in its own session, so a signal to the whole process
+    group (Ctrl-C, ``timeout``) reaches only the master, whose on_exit then
+    stops it. The fetcher exits by itself if the master dies without that.
+    """
+    global _fetcher
+    env = {**os.environ, 'FETCHER_PARENT_PID': str(os.getpid())}
+    while not _stopping.is_set():
+        _fetcher = subprocess.Popen([sys.executable, 'fetcher.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    env=env, start_new_session=True)
+        code = _fetcher.wait()
+        # Give a shutdown that is already under way the chance to say so
+        # before reporting a crash
+        if _stopping.wait(5):
+            break
+        print(f"Fetcher exited with status {code}; restarting")
+
+
+def _metrics_dir():
+    """An empty PROMETHEUS_MULTIPROC_DIR; files left by an earlier run would be merged in"""
+    global _own_metrics_dir
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        path = _own_metrics_dir = tempfile.mkdtemp(prefix='transit-metrics-')
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith('.db'):
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def on_starting(server):
+    os.environ['REFRESH_MODE'] = 'shared'
+    # Before the workers and the fetcher first import prometheus_client
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _metrics_dir()
+    threading.Thread(target=_supervise_fetcher, daemon=True, name='fetcher-supervisor').start()
+
+
+def on_exit(server):
+    _stopping.set()
+    if _fetcher is not None:
+        _fetcher.terminate()
+        _fetcher.wait(timeout=10)
+    if _own_metrics_dir:
+        shutil.rmtree(_own_metrics_dir, ignore_errors=True)
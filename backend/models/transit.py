@@ -1,71 +1,416 @@
 # backend/models/transit.py
-from datetime import datetime
+import heapq
+import sys
+import threading
+import time
+from collections import deque
+from config.config import GEOJSON_DELTA_HISTORY
+
+
+class TripUpdate:
+    """Parsed GTFS-RT trip update.
+
+    Entities use ``__slots__`` and intern their repeated ids so a refresh
+    cycle does not allocate a dict per entity and per stop time; JSON dicts
+    are only built at the serialization edge by ``to_dict``.
+    ``stop_time_updates`` is a tuple of ``(stop_id, arrival, departure)``.
+    """
+
+    __slots__ = ('id', 'trip_id', 'route_id', 'start_time', 'start_date', 'stop_time_updates')
+    type = 'trip_update'
+
+    def __init__(self, id, trip_id, route_id, start_time, start_date, stop_time_updates):
+        self.id = id
+        self.trip_id = trip_id
+        self.route_id = sys.intern(route_id)
+        self.start_time = start_time
+        self.start_date = sys.intern(start_date)
+        self.stop_time_updates = stop_time_updates
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'trip_id': self.trip_id,
+            'route_id': self.route_id,
+            'start_time': self.start_time,
+            'start_date': self.start_date,
+            'stop_time_updates': [
+                {'stop_id': stop_id, 'arrival': arrival, 'departure': departure}
+                for stop_id, arrival, departure in self.stop_time_updates
+            ]
+        }
+
+
+class VehiclePosition:
+    """Parsed GTFS-RT vehicle position (see TripUpdate)"""
+
+    __slots__ = ('id', 'trip_id', 'route_id', 'start_time', 'start_date',
+                 'current_status', 'timestamp', 'stop_id')
+    type = 'vehicle'
+
+    def __init__(self, id, trip_id, route_id, start_time, start_date,
+                 current_status, timestamp, stop_id):
+        self.id = id
+        self.trip_id = trip_id
+        self.route_id = sys.intern(route_id)
+        self.start_time = start_time
+        self.start_date = sys.intern(start_date)
+        self.current_status = sys.intern(current_status)
+        self.timestamp = timestamp
+        self.stop_id = sys.intern(stop_id) if stop_id is not None else None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'trip_id': self.trip_id,
+            'route_id': self.route_id,
+            'start_time': self.start_time,
+            'start_date': self.start_date,
+            'current_status': self.current_status,
+            'timestamp': self.timestamp,
+            'stop_id': self.stop_id
+        }
+
+
+ENTITY_TYPES = ('vehicle', 'trip_update')
+
+
+def filter_entities(entities, routes=None, types=None):
+    """Entities whose route is in ``routes`` and type in ``types`` (None matches all)"""
+    return [entity for entity in entities
+            if (routes is None or entity.route_id in routes) and (types is None or entity.type in types)]
+
+
+def index_entities_by_route(entities):
+    """(route_id, entity type) -> positions in ``entities``, ascending"""
+    index = {}
+    for position, entity in enumerate(entities):
+        index.setdefault((entity.route_id, entity.type), []).append(position)
+    return index
+
+
+def subway_data_to_json(subway_data):
+    """JSON-ready form of parsed subway data holding entity objects"""
+    return {
+        'header': subway_data['header'],
+        'entities': [entity.to_dict() for entity in subway_data['entities']],
+        'feeds': subway_data.get('feeds', {})
+    }
+
+
+def index_features(geojson):
+    """Map feature id -> feature for a vehicle FeatureCollection"""
+    return {feature['properties']['id']: feature for feature in geojson.get('features', [])}
+
+
+def diff_features(previous, current):
+    """Compare two id -> feature maps, returning (added, changed, removed ids)"""
+    added = [feature for feature_id, feature in current.items() if feature_id not in previous]
+    changed = [feature for feature_id, feature in current.items()
+               if feature_id in previous and previous[feature_id] != feature]
+    removed = [feature_id for feature_id in previous if feature_id not in current]
+    return added, changed, removed
+
+
+class GeoJSONDelta:
+    """Vehicle changes introduced by the snapshot with the given version"""
+
+    def __init__(self, version, added, changed, removed):
+        self.version = version
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+
+class DeltaLog:
+    """Bounded history of vehicle deltas, composable from any retained version.
+
+    Only versions this store actually published can be brought up to date:
+    a worker mirroring the fetcher may skip some of the fetcher's versions,
+    and its deltas say nothing about the vehicles at those.
+    """
+
+    def __init__(self, maxlen=GEOJSON_DELTA_HISTORY):
+        self.deltas = deque(maxlen=maxlen)
+        self.base_version = None  # oldest version the log can bring up to date
+        # Published versions from base_version on, at most the newest maxlen + 1
+        self.versions = set()
+        self._recent = deque()
+
+    def _remember(self, version):
+        if len(self._recent) > self.deltas.maxlen:
+            self.versions.discard(self._recent.popleft())
+        self._recent.append(version)
+        self.versions.add(version)
+
+    def append(self, delta):
+        self._remember(delta.version)
+        if self.base_version is None:
+            self.base_version = delta.version
+            return
+        if len(self.deltas) == self.deltas.maxlen:
+            self.base_version = self.deltas[0].version
+            while self._recent[0] < self.base_version:
+                self.versions.discard(self._recent.popleft())
+        self.deltas.append(delta)
+
+    def mark(self, version):
+        """Record a published version that brought no vehicle changes"""
+        if self.base_version is not None:
+            self._remember(version)
+
+    def since(self, version):
+        """Compose the deltas after ``version``, or None if it was evicted or never published here"""
+        if version not in self.versions:
+            return None
+
+        # Track each touched id relative to its state at ``version``
+        state = {}
+        for delta in self.deltas:
+            if delta.version <= version:
+                continue
+            for feature in delta.added:
+                feature_id = feature['properties']['id']
+                previous = state.get(feature_id)
+                state[feature_id] = ('changed' if previous and previous[0] == 'removed' else 'added', feature)
+            for feature in delta.changed:
+                feature_id = feature['properties']['id']
+                previous = state.get(feature_id)
+                state[feature_id] = ('added' if previous and previous[0] == 'added' else 'changed', feature)
+            for feature_id in delta.removed:
+                previous = state.get(feature_id)
+                if previous and previous[0] == 'added':
+                    del state[feature_id]
+                else:
+                    state[feature_id] = ('removed', None)
+
+        return {
+            'added': [feature for kind, feature in state.values() if kind == 'added'],
+            'changed': [feature for kind, feature in state.values() if kind == 'changed'],
+            'removed': [feature_id for feature_id, (kind, _) in state.items() if kind == 'removed']
+        }
+
+
+class SnapshotIndexing:
+    """The builders a TransitData applies to the data it publishes.
+
+    The models only hold what these return; the implementations live in
+    services/ and are wired up in services/transit_store.py.
+
+    - ``vehicles(vehicle_features)``: spatial index over the vehicles
+    - ``alerts(data)``: index over one system's alert feed
+    - ``elevators(data, arrivals)``: index over one elevator status feed
+    - ``arrivals()``: an empty arrivals index
+    - ``payload(data)``: serialized response body (a CachedPayload)
+    """
+
+    def __init__(self, vehicles, alerts, elevators, arrivals, payload):
+        self.vehicles = vehicles
+        self.alerts = alerts
+        self.elevators = elevators
+        self.arrivals = arrivals
+        self.payload = payload
+
+
+class TransitSnapshot:
+    """Immutable view of the realtime data produced by one refresh cycle.
+
+    Request handlers grab a reference to the current snapshot and read from
+    it; they never see a half-updated mix of two refreshes.
+    """
+
+    def __init__(self, indexing, version=0, timestamp=None, subway_data=None,
+                 subway_geojson=None, service_alerts=None, elevator_data=None,
+                 vehicle_features=None, arrivals=None, feed_status=None, alert_indexes=None,
+                 elevator_indexes=None, route_index=None, payloads=None):
+        self.indexing = indexing
+        self.version = version
+        self.timestamp = timestamp
+        self.subway_data = subway_data
+        self.subway_geojson = subway_geojson
+        self.vehicle_features = vehicle_features or {}
+        self.arrivals = arrivals or indexing.arrivals()
+        self.service_alerts = service_alerts or {}
+        self.alert_indexes = alert_indexes or {}  # system -> index over service_alerts
+        self.elevator_data = elevator_data or {}
+        self.elevator_indexes = elevator_indexes or {}  # status type -> index over elevator_data
+        self.route_index = route_index or {}  # see index_entities_by_route
+        self.feed_status = feed_status or {}
+        self._vehicle_index = None
+        self._payloads = dict(payloads or {})  # key -> CachedPayload, possibly rendered by the fetcher
+        self._lock = threading.Lock()
+
+    def is_empty(self):
+        return self.subway_data is None
+
+    def payload_builders(self):
+        """Builders of the unfiltered response bodies this snapshot serves, by payload key"""
+        builders = {}
+        if self.subway_data is not None:
+            builders['all'] = lambda: subway_data_to_json(self.subway_data)
+        if self.subway_geojson is not None:
+            builders['geojson'] = lambda: {**self.subway_geojson, 'version': self.version}
+        for system, index in self.alert_indexes.items():
+            builders[('alerts', system)] = lambda index=index: index.alert_data
+        for status_type, index in self.elevator_indexes.items():
+            builders[('elevator', status_type)] = lambda index=index: index.data
+        return builders
+
+    def get_payload(self, key, build=None):
+        """Response body for ``key``, serialized at most once per snapshot.
+
+        ``build`` returns the JSON-ready data and defaults to the builder in
+        payload_builders(); every request for this version then shares the
+        same bytes and compressed variants.
+        """
+        payload = self._payloads.get(key)
+        if payload is None:
+            with self._lock:
+                payload = self._payloads.get(key)
+                if payload is None:
+                    payload = self.indexing.payload((build or self.payload_builders()[key])())
+                    self._payloads[key] = payload
+        return payload
+
+    def filter_entities(self, routes=None, types=None):
+        """Subway entities of the given routes and types, in feed order, from the route index"""
+        entities = self.subway_data['entities']
+        positions = [positions for (route_id, entity_type), positions in self.route_index.items()
+                     if (routes is None or route_id in routes) and (types is None or entity_type in types)]
+        return [entities[position] for position in heapq.merge(*positions)]
+
+    def vehicle_ids_for_routes(self, routes):
+        """Ids of the vehicle features on any of ``routes``"""
+        return {feature_id for feature_id, feature in self.vehicle_features.items()
+                if feature['properties'].get('route_id') in routes}
+
+    def get_vehicle_index(self):
+        """Spatial index over this snapshot's vehicles, built on first use"""
+        if self._vehicle_index is None:
+            self._vehicle_index = self.indexing.vehicles(self.vehicle_features)
+        return self._vehicle_index
+
 
 class TransitData:
-    def __init__(self):
-        self.last_update = None
-        self.subway_data = {}
-        self.service_alerts = {}
-        self.elevator_data = {}
-    
-    def update_subway_data(self, line, data):
-        self.subway_data[line] = data
-        self.last_update = datetime.now()
-    
-    def update_service_alerts(self, system, data):
-        self.service_alerts[system] = data
-        
-    def update_elevator_data(self, status_type, data):
-        self.elevator_data[status_type] = data
-    
-    def get_subway_data(self, line=None):
-        if line:
-            return self.subway_data.get(line)
-        return self.subway_data
-    
+    """Thread-safe, versioned store for the latest realtime data.
+
+    The background refresher builds a new snapshot and publishes it with a
+    single reference swap, so readers never block on the MTA or on each other.
+    ``indexing`` is the SnapshotIndexing applied to each publish.
+    """
+
+    def __init__(self, indexing, version=0):
+        self.indexing = indexing
+        self._lock = threading.Lock()
+        self._snapshot = TransitSnapshot(indexing, version=version)
+        self._vehicle_deltas = DeltaLog()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call ``callback(previous, snapshot, vehicle_delta)`` after every publish.
+
+        ``vehicle_delta`` is the GeoJSONDelta introduced by the new snapshot,
+        or None if it did not carry new vehicle data.
+        """
+        self._listeners.append(callback)
+
+    def publish(self, subway_data=None, subway_geojson=None,
+                service_alerts=None, elevator_data=None, arrivals=None, feed_status=None,
+                version=None, timestamp=None, payloads=None):
+        """Publish a new snapshot, carrying over any part not supplied.
+
+        ``version`` and ``timestamp`` default to the next version and now;
+        workers mirroring the fetcher process pass the fetcher's own, along
+        with the response ``payloads`` it already rendered for this version.
+        """
+        indexing = self.indexing
+        alert_indexes = {system: indexing.alerts(data) for system, data in (service_alerts or {}).items()}
+        route_index = index_entities_by_route(subway_data['entities']) if subway_data is not None else None
+        station_arrivals = arrivals if arrivals is not None else self._snapshot.arrivals
+        elevator_indexes = {status_type: indexing.elevators(data, station_arrivals)
+                            for status_type, data in (elevator_data or {}).items()}
+        with self._lock:
+            current = self._snapshot
+            version = version if version is not None else current.version + 1
+
+            vehicle_features = current.vehicle_features
+            vehicle_delta = None
+            if subway_geojson is not None:
+                vehicle_features = index_features(subway_geojson)
+                added, changed, removed = diff_features(current.vehicle_features, vehicle_features)
+                vehicle_delta = GeoJSONDelta(version, added, changed, removed)
+                self._vehicle_deltas.append(vehicle_delta)
+            else:
+                self._vehicle_deltas.mark(version)
+
+            snapshot = TransitSnapshot(
+                indexing,
+                version=version,
+                timestamp=timestamp if timestamp is not None else time.time(),
+                subway_data=subway_data if subway_data is not None else current.subway_data,
+                subway_geojson=subway_geojson if subway_geojson is not None else current.subway_geojson,
+                service_alerts={**current.service_alerts, **(service_alerts or {})},
+                elevator_data={**current.elevator_data, **(elevator_data or {})},
+                vehicle_features=vehicle_features,
+                arrivals=arrivals if arrivals is not None else current.arrivals,
+                feed_status=feed_status if feed_status is not None else current.feed_status,
+                alert_indexes={**current.alert_indexes, **alert_indexes},
+                elevator_indexes={**current.elevator_indexes, **elevator_indexes},
+                route_index=route_index if route_index is not None else current.route_index,
+                payloads=payloads
+            )
+            self._snapshot = snapshot
+
+        for callback in self._listeners:
+            try:
+                callback(current, snapshot, vehicle_delta)
+            except Exception as e:
+                print(f"Error in snapshot listener: {str(e)}")
+        return snapshot
+
+    def get_snapshot(self):
+        return self._snapshot
+
+    def get_version(self):
+        return self._snapshot.version
+
+    def get_subway_data(self):
+        return self._snapshot.subway_data
+
+    def get_subway_geojson(self):
+        return self._snapshot.subway_geojson
+
+    def get_geojson_delta(self, since):
+        """Vehicle changes from version ``since`` to the current snapshot.
+
+        Returns None when ``since`` is older than the retained history, in
+        which case the client needs the full FeatureCollection.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if since > snapshot.version:
+                return None
+            delta = self._vehicle_deltas.since(since)
+        if delta is None:
+            return None
+        return {
+            'type': 'FeatureCollectionDelta',
+            'version': snapshot.version,
+            'since': since,
+            **delta
+        }
+
     def get_service_alerts(self, system=None):
         if system:
-            return self.service_alerts.get(system)
-        return self.service_alerts
-    
+            return self._snapshot.service_alerts.get(system)
+        return self._snapshot.service_alerts
+
     def get_elevator_data(self, status_type=None):
         if status_type:
-            return self.elevator_data.get(status_type)
-        return self.elevator_data
-    
+            return self._snapshot.elevator_data.get(status_type)
+        return self._snapshot.elevator_data
+
     def get_last_update(self):
-        return self.last_update
-    
-    def to_geojson(self):
-        """Convert subway positions to GeoJSON for map display"""
-        features = []
-        
-        for line, data in self.subway_data.items():
-            if 'entities' not in data:
-                continue
-                
-            for entity in data['entities']:
-                if entity['type'] == 'vehicle' and entity.get('position'):
-                    feature = {
-                        'type': 'Feature',
-                        'geometry': {
-                            'type': 'Point',
-                            'coordinates': [
-                                entity['position']['longitude'],
-                                entity['position']['latitude']
-                            ]
-                        },
-                        'properties': {
-                            'id': entity['id'],
-                            'route_id': entity['route_id'],
-                            'trip_id': entity['trip_id'],
-                            'status': entity['current_status'],
-                            'timestamp': entity['timestamp']
-                        }
-                    }
-                    features.append(feature)
-        
-        return {
-            'type': 'FeatureCollection',
-            'features': features
-        }
\ No newline at end of file
+        return self._snapshot.timestamp
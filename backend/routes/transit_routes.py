@@ -1,92 +1,314 @@
 # backend/routes/transit_routes.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from services.mta_service import MTAService
-from data.gtfs_parser import load_shapes
+from services.stream import SnapshotBroadcaster
+from services.static_layers import StaticLayerCache
+from services.response_cache import cached_response
+from services.spatial_index import StopIndex, parse_bbox
+from services.vector_tiles import VectorTileService
+from services.archive import SnapshotArchive, decode_record, parse_timestamp
+from services.feed_health import aged_status
+from services.transit_store import transit_data
+from models.transit import subway_data_to_json, ENTITY_TYPES
+from data.geometry import meters_per_pixel
+from data.gtfs_registry import gtfs
+from data.gtfs_subway_map import generate_lines_geojson, generate_stops_geojson
 
+from config.config import (
+    STATIC_LAYER_MAX_AGE, LINE_SIMPLIFY_TOLERANCES, NEARBY_DEFAULT_RADIUS, NEARBY_MAX_RADIUS,
+    NEARBY_DEFAULT_LIMIT, NEARBY_MAX_LIMIT, ARRIVALS_DEFAULT_LIMIT, ARRIVALS_MAX_LIMIT,
+    TILE_MAX_ZOOM, TILE_STOPS_MIN_ZOOM, TILE_VEHICLES_MIN_ZOOM, STATIC_TILE_CACHE_SIZE, TILE_CACHE_SIZE,
+    ARCHIVE_DIR, ARCHIVE_INTERVAL, ARCHIVE_SEGMENT_SECONDS, ARCHIVE_RETENTION_DAYS, HISTORY_MAX_RANGE,
+    STREAM_RETRY_AFTER
+)
+from functools import lru_cache, partial
+import math
 import time
 
 transit_bp = Blueprint('transit', __name__)
-mta_service = MTAService()
 
 
+def line_tolerance(zoom=None, tolerance=None):
+    """Pick the precomputed simplification level for a zoom or a requested tolerance"""
+    if tolerance is None:
+        tolerance = meters_per_pixel(zoom)
+    levels = [level for level in LINE_SIMPLIFY_TOLERANCES if level <= tolerance]
+    return max(levels) if levels else min(LINE_SIMPLIFY_TOLERANCES)
 
-from data.gtfs_subway_map import generate_lines_geojson, generate_stops_geojson
 
+class TransitServices:
+    """Everything the transit routes use besides the snapshot store, created by init_app"""
+
+    def __init__(self):
+        self.mta_service = MTAService()
+        self.snapshot_stream = SnapshotBroadcaster(transit_data)
+
+        # Vehicle positions are archived to disk for /api/history/vehicles
+        self.vehicle_archive = SnapshotArchive(ARCHIVE_DIR, ARCHIVE_INTERVAL, ARCHIVE_SEGMENT_SECONDS,
+                                               ARCHIVE_RETENTION_DAYS * 86400)
+        transit_data.add_listener(self.vehicle_archive.on_publish)
+
+        # Static map layers are built once and served as pre-compressed bytes
+        self.static_layers = StaticLayerCache({
+            'lines': generate_lines_geojson,
+            'stops': generate_stops_geojson,
+            'shapes': gtfs.shapes_geojson,
+            **{f"lines@{tolerance}": partial(generate_lines_geojson, tolerance)
+               for tolerance in LINE_SIMPLIFY_TOLERANCES}
+        })
+
+        # Vector tiles: lines are simplified per zoom, stops are static, vehicles
+        # come from the current snapshot
+        self.vector_tiles = VectorTileService(
+            transit_data,
+            {
+                'lines': (generate_lines_geojson, 0),
+                'stops': (lambda level: generate_stops_geojson(), TILE_STOPS_MIN_ZOOM)
+            },
+            level_for_zoom=lambda zoom: line_tolerance(zoom=zoom),
+            min_zoom=TILE_VEHICLES_MIN_ZOOM,
+            static_cache_size=STATIC_TILE_CACHE_SIZE,
+            tile_cache_size=TILE_CACHE_SIZE
+        )
+
+
+def init_app(app):
+    """Register the transit routes on ``app`` along with the services behind them.
+
+    Importing this module creates nothing; the MTA session, the archive
+    directory and the static layer cache only come into being here.
+    """
+    transit = app.extensions['transit'] = TransitServices()
+    app.register_blueprint(transit_bp)
+    return transit
+
+
+def services():
+    """The TransitServices of the app handling the current request"""
+    return current_app.extensions['transit']
+
+
+@lru_cache(maxsize=1)
+def get_stop_index():
+    """Spatial index over all GTFS stops, built on first use"""
+    return StopIndex(gtfs.stops)
+
+
+def no_data_response():
+    """Response for read endpoints hit before the first snapshot is published"""
+    return jsonify({'error': 'No data available yet'}), 503
+
+def parse_entity_filters():
+    """?routes=A,C and ?types=vehicle,trip_update as sets, None when absent; raises ValueError"""
+    routes = {route for route in request.args.get('routes', '').split(',') if route} or None
+    types = {entity_type for entity_type in request.args.get('types', '').split(',') if entity_type} or None
+    if types and not types <= set(ENTITY_TYPES):
+        raise ValueError(f"Invalid types: {request.args['types']} (expected {', '.join(ENTITY_TYPES)})")
+    return routes, types
 
+def filter_vehicle_delta(delta, inside):
+    """Restrict a vehicle delta to a viewport; vehicles that left it count as removed"""
+    changed = [feature for feature in delta['changed'] if feature['properties']['id'] in inside]
+    left = [feature['properties']['id'] for feature in delta['changed']
+            if feature['properties']['id'] not in inside]
+    return {
+        **delta,
+        'added': [feature for feature in delta['added'] if feature['properties']['id'] in inside],
+        'changed': changed,
+        'removed': delta['removed'] + left
+    }
+
+@lru_cache(maxsize=1)
+def snapshot_summary(snapshot):
+    """The part of /api/status that only changes with the snapshot"""
+    # Count active subway lines
+    active_lines = set()
+    for entity in snapshot.subway_data.get('entities', []):
+        if entity.route_id:
+            active_lines.add(entity.route_id)
+    
+    return {
+        'last_update': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(snapshot.timestamp)),
+        'version': snapshot.version,
+        'lines_available': sorted(list(active_lines)),
+        'alerts_available': sorted(snapshot.service_alerts),
+        'elevator_data_available': sorted(snapshot.elevator_data),
+        'total_vehicles': len([e for e in snapshot.subway_data.get('entities', []) if e.type == 'vehicle'])
+    }
 
 @transit_bp.route('/api/subway/all', methods=['GET'])
 def get_all_subway_data():
-    """Get data from all subway feeds"""
+    """Get data from all subway feeds.
+    
+    ?routes=A,C and ?types=vehicle|trip_update narrow the entities using the
+    snapshot's route index.
+    """
     try:
-        data = mta_service.fetch_all_subway_data()
-        return jsonify(data)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        routes, types = parse_entity_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    snapshot = transit_data.get_snapshot()
+    if snapshot.is_empty():
+        return no_data_response()
+    if routes or types:
+        return jsonify(subway_data_to_json({**snapshot.subway_data,
+                                            'entities': snapshot.filter_entities(routes, types)}))
+    return cached_response(snapshot.get_payload('all'))
 
 @transit_bp.route('/api/subway/geojson', methods=['GET'])
 def get_subway_geojson():
-    """Get subway data in GeoJSON format for map display"""
-    try:
-        data = mta_service.fetch_all_subway_geojson()
-        return jsonify(data)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    """Get subway data in GeoJSON format for map display.
+    
+    With ?since=<version> only the vehicles added, changed or removed after
+    that snapshot version are returned, falling back to the full
+    FeatureCollection when the client is too far behind. With
+    ?bbox=min_lon,min_lat,max_lon,max_lat only vehicles in that viewport
+    are returned, and with ?routes=A,C only vehicles on those routes.
+    """
+    snapshot = transit_data.get_snapshot()
+    if snapshot.is_empty():
+        return no_data_response()
+    
+    inside = None
+    if request.args.get('bbox'):
+        try:
+            bbox = parse_bbox(request.args['bbox'])
+        except ValueError:
+            return jsonify({'error': f"Invalid bbox: {request.args['bbox']}"}), 400
+        vehicle_index = snapshot.get_vehicle_index()
+        inside = {vehicle_index.ids[i] for i in vehicle_index.within_bbox(*bbox)}
+    routes = {route for route in request.args.get('routes', '').split(',') if route}
+    if routes:
+        on_routes = snapshot.vehicle_ids_for_routes(routes)
+        inside = on_routes if inside is None else inside & on_routes
+    
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({'error': f"Invalid version: {since}"}), 400
+        
+        delta = transit_data.get_geojson_delta(since)
+        if delta is not None:
+            if inside is not None:
+                return jsonify(filter_vehicle_delta(delta, inside))
+            if delta['version'] != snapshot.version:  # a newer snapshot was published meanwhile
+                return jsonify(delta)
+            return cached_response(snapshot.get_payload(('delta', since), lambda: delta))
+    
+    if inside is not None:
+        features = [snapshot.vehicle_features[feature_id] for feature_id in inside]
+        return jsonify({'type': 'FeatureCollection', 'features': features, 'version': snapshot.version})
+    return cached_response(snapshot.get_payload('geojson'))
+
+@transit_bp.route('/api/stream', methods=['GET'])
+def stream_updates():
+    """Server-Sent Events stream of vehicle and alert changes per published snapshot"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    broadcaster = services().snapshot_stream
+    client = broadcaster.connect()
+    if client is None:
+        response = jsonify({'error': 'Too many stream clients, retry later'})
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response, 503
+
+    response = Response(
+        broadcaster.stream(client, last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Also frees the slot if the response is closed before the stream starts
+    response.call_on_close(lambda: broadcaster.disconnect(client))
+    return response
 
 @transit_bp.route('/api/alerts/<system>', methods=['GET'])
 def get_service_alerts(system):
-    """Get service alerts for a specific system"""
+    """Get service alerts for a specific system.
+    
+    ?route= and ?stop= (comma-separated; a station id also matches its
+    platforms) and ?active_at=<time|now> narrow the list using the alert
+    indexes built when the alerts were fetched.
+    """
+    routes = [route for route in request.args.get('route', '').split(',') if route]
+    stops = [stop for stop in request.args.get('stop', '').split(',') if stop]
+    active_at = request.args.get('active_at')
+    if active_at:
+        try:
+            active_at = time.time() if active_at == 'now' else parse_timestamp(active_at)
+        except ValueError:
+            return jsonify({'error': f"Invalid active_at: {active_at}"}), 400
+    
     try:
-        data = mta_service.fetch_service_alerts(system)
-        return jsonify(data)
+        snapshot = transit_data.get_snapshot()
+        index = snapshot.alert_indexes.get(system)
+        unfiltered = not (routes or stops or active_at)
+        if index is None:
+            # Systems the refresher does not fetch are requested on demand;
+            # the index and body are built once per fetched document
+            mta_service = services().mta_service
+            index = mta_service.service_alert_index(system)
+            if unfiltered:
+                return cached_response(mta_service.payload_for(('alerts', system), index, lambda: index.alert_data))
+        elif unfiltered:
+            return cached_response(snapshot.get_payload(('alerts', system)))
+        return jsonify(index.filtered(routes, stops, active_at or None))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @transit_bp.route('/api/elevator/<status_type>', methods=['GET'])
 def get_elevator_status(status_type):
-    """Get elevator and escalator status"""
+    """Get elevator and escalator status.
+    
+    ?station= (a GTFS station or platform id, or a station name) narrows
+    the outages to one station using the index built when the feed was
+    fetched.
+    """
+    station = request.args.get('station')
     try:
-        data = mta_service.fetch_elevator_escalator_status(status_type)
-        return jsonify(data)
+        snapshot = transit_data.get_snapshot()
+        index = snapshot.elevator_indexes.get(status_type)
+        if index is None:
+            # Feeds the refresher does not fetch are requested on demand; the
+            # index and body are built once per fetched document
+            mta_service = services().mta_service
+            index = mta_service.elevator_index(status_type, snapshot.arrivals)
+            if not station:
+                return cached_response(mta_service.payload_for(('elevator', status_type), index,
+                                                               lambda: index.data))
+        elif not station:
+            return cached_response(snapshot.get_payload(('elevator', status_type)))
+        return jsonify(index.filtered(station))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @transit_bp.route('/api/status', methods=['GET'])
 def get_data_status():
     """Get the current status of all data sources"""
-    try:
-        # Try to fetch data to ensure we have active connections
-        subway_data = mta_service.fetch_all_subway_data()
-        
-        # Count active subway lines
-        active_lines = set()
-        for entity in subway_data.get('entities', []):
-            if entity.get('route_id'):
-                active_lines.add(entity.get('route_id'))
-        
-        # Try to fetch alerts
-        alerts_data = mta_service.fetch_service_alerts('subway')
-        alerts_available = ['subway']
-        
-        # Get elevator data
-        elevator_data = mta_service.fetch_elevator_escalator_status('current')
-        elevator_available = ['current']
-        
-        return jsonify({
-            'last_update': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
-            'lines_available': sorted(list(active_lines)),
-            'alerts_available': alerts_available,
-            'elevator_data_available': elevator_available,
-            'total_vehicles': len([e for e in subway_data.get('entities', []) if e.get('type') == 'vehicle'])
-        })
-    except Exception as e:
-        print(f"Error getting data status: {str(e)}")
-        return jsonify({'error': 'No data available yet'})
+    snapshot = transit_data.get_snapshot()
+    if snapshot.is_empty():
+        return no_data_response()
+    # Feed ages were taken when the snapshot was published; bring them up to now
+    elapsed = max(0.0, time.time() - snapshot.timestamp)
+    return jsonify({
+        **snapshot_summary(snapshot),
+        'feeds': {feed_key: aged_status(status, elapsed) for feed_key, status in snapshot.feed_status.items()}
+    })
     
 @transit_bp.route('/api/subway/lines', methods=['GET'])
 def get_subway_lines():
-    """Return subway route lines as GeoJSON"""
+    """Return subway route lines as GeoJSON.
+    
+    ?zoom= or ?tolerance= (meters) returns deduplicated shapes simplified
+    to the matching precomputed level instead of every raw shape.
+    """
     try:
-        return jsonify(generate_lines_geojson())
+        zoom = request.args.get('zoom', type=float)
+        tolerance = request.args.get('tolerance', type=float)
+        if zoom is not None or tolerance is not None:
+            level = line_tolerance(zoom, tolerance)
+            return cached_response(services().static_layers.get(f"lines@{level}"), STATIC_LAYER_MAX_AGE)
+        return cached_response(services().static_layers.get('lines'), STATIC_LAYER_MAX_AGE)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -94,7 +316,7 @@ def get_subway_lines():
 def get_subway_stops():
     """Return subway station locations as GeoJSON"""
     try:
-        return jsonify(generate_stops_geojson())
+        return cached_response(services().static_layers.get('stops'), STATIC_LAYER_MAX_AGE)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -102,15 +324,144 @@ def get_subway_stops():
 def get_subway_shapes():
     """Return GeoJSON subway route lines"""
     try:
-        return jsonify(load_shapes())
+        return cached_response(services().static_layers.get('shapes'), STATIC_LAYER_MAX_AGE)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@transit_bp.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@transit_bp.route('/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+@transit_bp.route('/tiles/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def get_vector_tile(z, x, y):
+    """Mapbox Vector Tile with 'lines', 'stops' and 'vehicles' layers"""
+    if z > TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({'error': f"Invalid tile: {z}/{x}/{y}"}), 404
+    try:
+        return cached_response(services().vector_tiles.tile(z, x, y))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@transit_bp.route('/api/history/vehicles', methods=['GET'])
+def get_vehicle_history():
+    """Archived vehicle positions.
+    
+    ?at=<time> returns the vehicles as of that moment; ?from=<time>&to=<time>
+    returns the vehicles at ``from`` plus every archived change up to ``to``.
+    Times are Unix seconds or ISO 8601.
+    """
+    try:
+        if request.args.get('at'):
+            at = parse_timestamp(request.args['at'])
+        else:
+            start = parse_timestamp(request.args['from'])
+            end = parse_timestamp(request.args['to'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Pass ?at=<time> or ?from=<time>&to=<time> (Unix seconds or ISO 8601)'}), 400
+    
+    vehicle_archive = services().vehicle_archive
+    if request.args.get('at'):
+        state = vehicle_archive.state_at(at)
+        if state is None:
+            return jsonify({'error': 'No archived data at that time', 'available': vehicle_archive.bounds()}), 404
+        timestamp, version, records = state
+        return jsonify({
+            'type': 'FeatureCollection',
+            'timestamp': timestamp,
+            'version': version,
+            'features': [decode_record(record) for record in records.values()]
+        })
+    
+    if end < start or end - start > HISTORY_MAX_RANGE:
+        return jsonify({'error': f"Range must be ordered and at most {HISTORY_MAX_RANGE} seconds"}), 400
+    initial, changes = vehicle_archive.changes(start, end)
+    if initial is None and not changes:
+        return jsonify({'error': 'No archived data in that range', 'available': vehicle_archive.bounds()}), 404
+    return jsonify({
+        'type': 'VehicleHistory',
+        'from': start,
+        'to': end,
+        'initial': {
+            'timestamp': initial[0],
+            'version': initial[1],
+            'features': [decode_record(record) for record in initial[2].values()]
+        } if initial else None,
+        'changes': [
+            {'timestamp': timestamp, 'version': version,
+             'changed': [decode_record(record) for record in changed], 'removed': removed}
+            for timestamp, version, changed, removed in changes
+        ]
+    })
+
+@transit_bp.route('/api/stops/nearby', methods=['GET'])
+def get_nearby_stops():
+    """Stations within ?radius= meters of ?lat=&lon=, nearest first"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = min(float(request.args.get('radius', NEARBY_DEFAULT_RADIUS)), NEARBY_MAX_RADIUS)
+        limit = min(int(request.args.get('limit', NEARBY_DEFAULT_LIMIT)), NEARBY_MAX_LIMIT)
+        if not all(math.isfinite(value) for value in (lat, lon, radius)) or radius <= 0 or limit < 1:
+            raise ValueError
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon are required; radius must be a positive number '
+                                 'and limit a positive integer'}), 400
+    
+    stations_only = request.args.get('platforms', 'false').lower() != 'true'
+    stops = get_stop_index().nearby(lat, lon, radius, limit, stations_only=stations_only)
+    return jsonify({'stops': stops})
+
+@transit_bp.route('/api/stops', methods=['GET'])
+def get_stops_in_bbox():
+    """Stops inside ?bbox=min_lon,min_lat,max_lon,max_lat as GeoJSON"""
+    if not request.args.get('bbox'):
+        return cached_response(services().static_layers.get('stops'), STATIC_LAYER_MAX_AGE)
+    try:
+        bbox = parse_bbox(request.args['bbox'])
+    except ValueError:
+        return jsonify({'error': f"Invalid bbox: {request.args['bbox']}"}), 400
+    
+    stop_index = get_stop_index()
+    stations_only = request.args.get('stations', 'false').lower() == 'true'
+    features = [stop_index.feature(i) for i in stop_index.within_bbox(*bbox, stations_only=stations_only)]
+    return jsonify({'type': 'FeatureCollection', 'features': features})
+
+@transit_bp.route('/api/stops/<stop_id>/arrivals', methods=['GET'])
+def get_stop_arrivals(stop_id):
+    """Next trains at a platform or parent station, soonest first"""
+    snapshot = transit_data.get_snapshot()
+    if snapshot.is_empty():
+        return no_data_response()
+    try:
+        limit = min(int(request.args.get('limit', ARRIVALS_DEFAULT_LIMIT)), ARRIVALS_MAX_LIMIT)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    
+    now = int(time.time())
+    arrivals = [{
+        'route_id': route_id,
+        'trip_id': trip_id,
+        'stop_id': platform_id,
+        'arrival': arrival,
+        'minutes_away': max(0, (arrival - now) // 60)
+    } for arrival, route_id, trip_id, platform_id in snapshot.arrivals.upcoming(stop_id, now, limit)]
+    
+    return jsonify({
+        'stop_id': stop_id,
+        'stop_name': gtfs.stop_name(stop_id),
+        'version': snapshot.version,
+        'arrivals': arrivals
+    })
+
 @transit_bp.route('/api/subway/<line>', methods=['GET'])
 def get_subway_data(line):
-    """Get subway data for a specific line"""
+    """Get subway data for a specific line, optionally narrowed by ?routes= and ?types="""
+    try:
+        routes, types = parse_entity_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
-        data = mta_service.fetch_subway_feed(line)
-        return jsonify(data)
+        data = services().mta_service.fetch_subway_feed(line, routes, types)
+        return jsonify(subway_data_to_json(data))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
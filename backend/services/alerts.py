@@ -0,0 +1,106 @@
+# backend/services/alerts.py
+from bisect import bisect_right
+from data.gtfs_registry import gtfs
+
+
+def _informed_entities(alert):
+    """Informed entities of an alert in either format (JSON entities nest under 'alert')"""
+    body = alert.get('alert', alert)
+    return body.get('informed_entity') or []
+
+
+def _active_periods(alert):
+    body = alert.get('alert', alert)
+    return body.get('active_period') or []
+
+
+def _period_bound(value):
+    """Active-period start/end as a number; 0, '' and None mean unbounded"""
+    try:
+        return int(value) or None
+    except (TypeError, ValueError):
+        return None
+
+
+class AlertIndex:
+    """Service alerts of one system indexed by route, stop and active period.
+
+    Every alert is a bit position; the route and stop indexes and each
+    elementary time interval between active-period boundaries hold an int
+    bitmask of the alerts they match, so a filtered query is a few ANDs.
+    Alerts are returned in feed order and in the shape the feed had.
+    """
+
+    def __init__(self, alert_data):
+        self.alert_data = alert_data or {}
+        self.key = 'entity' if 'entity' in self.alert_data and 'alerts' not in self.alert_data else 'alerts'
+        self.alerts = list(self.alert_data.get(self.key) or [])
+        self.all = (1 << len(self.alerts)) - 1
+
+        self.by_route = {}
+        self.by_stop = {}
+        periods = []
+        for i, alert in enumerate(self.alerts):
+            bit = 1 << i
+            for entity in _informed_entities(alert):
+                route_id = entity.get('route_id') or (entity.get('trip') or {}).get('route_id')
+                if route_id:
+                    self.by_route[route_id] = self.by_route.get(route_id, 0) | bit
+                stop_id = entity.get('stop_id')
+                if stop_id:
+                    for key in {stop_id, gtfs.parent_station(stop_id) or stop_id}:
+                        self.by_stop[key] = self.by_stop.get(key, 0) | bit
+            alert_periods = [(_period_bound(period.get('start')), _period_bound(period.get('end')))
+                             for period in _active_periods(alert)]
+            periods.extend((start, end, bit) for start, end in (alert_periods or [(None, None)]))
+
+        # Sweep the period boundaries in order; masks[i] holds the alerts
+        # active for boundaries[i - 1] <= t < boundaries[i]
+        events = {}
+        for start, end, bit in periods:
+            if start is not None and end is not None and end <= start:
+                continue
+            events.setdefault(start, []).append((bit, 1))
+            if end is not None:
+                events.setdefault(end, []).append((bit, -1))
+        self.boundaries = sorted(bound for bound in events if bound is not None)
+        self.masks = []
+        counts, mask = {}, 0
+        for bound in [None] + self.boundaries:
+            for bit, delta in events.get(bound, ()):
+                count = counts[bit] = counts.get(bit, 0) + delta
+                mask = mask | bit if count > 0 else mask & ~bit
+            self.masks.append(mask)
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def active_mask(self, timestamp):
+        return self.masks[bisect_right(self.boundaries, timestamp)]
+
+    def query(self, routes=None, stops=None, active_at=None):
+        """Alerts affecting any of ``routes``, any of ``stops`` and active at ``active_at``"""
+        mask = self.all
+        if routes:
+            mask &= self._union(self.by_route, routes)
+        if stops:
+            mask &= self._union(self.by_stop, stops)
+        if active_at is not None:
+            mask &= self.active_mask(active_at)
+        matches = []
+        while mask:
+            lowest = mask & -mask
+            matches.append(self.alerts[lowest.bit_length() - 1])
+            mask ^= lowest
+        return matches
+
+    @staticmethod
+    def _union(index, keys):
+        mask = 0
+        for key in keys:
+            mask |= index.get(key, 0)
+        return mask
+
+    def filtered(self, routes=None, stops=None, active_at=None):
+        """The alert data with only the matching alerts, in the feed's own format"""
+        return {**self.alert_data, self.key: self.query(routes, stops, active_at)}
@@ -0,0 +1,296 @@
+# backend/services/archive.py
+"""Append-only, segmented archive of vehicle positions for time-travel queries.
+
+Every ``interval`` seconds the current vehicles are appended to the open
+segment as one JSON line: a keyframe with every vehicle when a segment
+starts, afterwards only the vehicles that changed and the ids that
+disappeared, each stored as its coordinate offsets plus only the fields
+that changed. After ``segment_seconds`` the segment is sealed (gzip) and
+renamed to carry its time range, so the directory listing is the time
+index and a query only decodes the segments it overlaps.
+
+    vehicles-<start>.jsonl                open segment, appended to
+    vehicles-<start>-<end>.jsonl.gz       sealed segment
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from services.response_cache import serialize_json
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows); assume a single writer
+    fcntl = None
+
+SEGMENT_PATTERN = re.compile(r'^vehicles-(\d+)(?:-(\d+))?\.jsonl(\.gz)?$')
+
+# Vehicle feature properties stored per record, after the id
+FIELDS = ('route_id', 'trip_id', 'status', 'stop_id', 'timestamp', 'estimated', 'stale')
+COORDINATE_SCALE = 100000  # coordinates are stored as integer 1e-5 degrees (~1 m)
+RECORD_LENGTH = len(FIELDS) + 3
+
+
+def encode_feature(feature):
+    """Compact record for a vehicle feature: [id, *FIELDS, lon, lat]"""
+    properties = feature['properties']
+    lon, lat = feature['geometry']['coordinates']
+    return ([properties['id']] + [properties.get(field) for field in FIELDS] +
+            [round(lon * COORDINATE_SCALE), round(lat * COORDINATE_SCALE)])
+
+
+def decode_record(record):
+    """Vehicle GeoJSON feature for an archived record"""
+    properties = {'id': record[0]}
+    properties.update(zip(FIELDS, record[1:-2]))
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [record[-2] / COORDINATE_SCALE,
+                                                      record[-1] / COORDINATE_SCALE]},
+        'properties': properties
+    }
+
+
+def diff_records(previous, records):
+    """(changed or new records, removed ids) between two id -> record maps"""
+    changed = [record for vehicle_id, record in records.items() if previous.get(vehicle_id) != record]
+    removed = [vehicle_id for vehicle_id in previous if vehicle_id not in records]
+    return changed, removed
+
+
+def encode_change(previous, record):
+    """Sparse form of a changed record: [id, dlon, dlat, field index, value, ...]"""
+    change = [record[0], record[-2] - previous[-2], record[-1] - previous[-1]]
+    for index in range(1, RECORD_LENGTH - 2):
+        if record[index] != previous[index]:
+            change += [index, record[index]]
+    return change
+
+
+def apply_frame(state, frame):
+    """Apply one frame to ``state`` (mutated in place unless it is a keyframe).
+
+    Returns (new state, changed records, removed ids) with every changed
+    record expanded back to its full form.
+    """
+    if frame.get('k'):
+        records = {record[0]: record for record in frame['s']}
+        changed, removed = diff_records(state, records)
+        return records, changed, removed
+
+    changed = []
+    for record in frame['s']:
+        if len(record) != RECORD_LENGTH:  # sparse change, see encode_change
+            change, record = record, list(state[record[0]])
+            record[-2] += change[1]
+            record[-1] += change[2]
+            for index, value in zip(change[3::2], change[4::2]):
+                record[index] = value
+        state[record[0]] = record
+        changed.append(record)
+    removed = frame.get('d', [])
+    for vehicle_id in removed:
+        state.pop(vehicle_id, None)
+    return state, changed, removed
+
+
+def parse_timestamp(value):
+    """Unix seconds or an ISO 8601 time (UTC unless it has an offset), raising ValueError"""
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+
+class SnapshotArchive:
+    """Vehicle history on disk, written by one process and readable by all"""
+
+    def __init__(self, directory, interval, segment_seconds, retention_seconds, cache_size=8):
+        self.directory = directory
+        self.interval = interval
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._decoded = OrderedDict()  # sealed segment path -> frames
+        self._cache_size = cache_size
+        self._open = None  # (start, path, file) of the segment being appended to
+        self._state = {}  # vehicle id -> record as of the last frame written
+        self._last_time = 0.0
+
+        # Only one process appends; the others (e.g. other gunicorn workers)
+        # just read the segments
+        self._writer_lock = open(os.path.join(directory, '.writer.lock'), 'w')
+        self.writable = True
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._writer_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.writable = False
+        if self.writable:
+            for start, end, path in self.segments():
+                if end is None:  # left open by a previous run
+                    self._seal(start, path)
+
+    def segments(self):
+        """(start, end or None if open, path) for every segment, oldest first"""
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                start, end, _ = match.groups()
+                found.append((int(start), int(end) if end else None, os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def on_publish(self, previous, snapshot, vehicle_delta):
+        """Snapshot listener: archive the vehicles at most once per ``interval``"""
+        if not self.writable or snapshot.timestamp - self._last_time < self.interval:
+            return
+        self.append(snapshot.timestamp, snapshot.version, snapshot.vehicle_features.values())
+
+    def append(self, timestamp, version, features):
+        """Write one frame with the vehicles at ``timestamp``"""
+        records = {}
+        for feature in features:
+            record = encode_feature(feature)
+            records[record[0]] = record
+
+        with self._lock:
+            if self._open and timestamp >= self._open[0] + self.segment_seconds:
+                start, path, file = self._open
+                file.close()
+                self._seal(start, path)
+                self._open = None
+            if self._open is None:
+                start = int(timestamp)
+                path = os.path.join(self.directory, f"vehicles-{start}.jsonl")
+                self._open = (start, path, open(path, 'ab'))
+                frame = {'t': timestamp, 'v': version, 'k': 1, 's': list(records.values())}
+            else:
+                changed, removed = diff_records(self._state, records)
+                encoded = [encode_change(self._state[record[0]], record) if record[0] in self._state else record
+                           for record in changed]
+                frame = {'t': timestamp, 'v': version, 's': encoded, 'd': removed}
+
+            file = self._open[2]
+            file.write(serialize_json(frame) + b'\n')
+            file.flush()
+            self._state = records
+            self._last_time = timestamp
+
+    def _seal(self, start, path):
+        """Compress a finished segment under its time range and apply retention"""
+        frames = self._read_frames(path)
+        if frames:
+            end = int(frames[-1]['t']) + 1
+            sealed = os.path.join(self.directory, f"vehicles-{start}-{end}.jsonl.gz")
+            with open(path, 'rb') as f, gzip.open(f"{sealed}.tmp", 'wb', compresslevel=9) as out:
+                out.write(f.read())
+            os.replace(f"{sealed}.tmp", sealed)
+        os.remove(path)
+
+        cutoff = time.time() - self.retention_seconds
+        for _, end, old in self.segments():
+            if end is not None and end < cutoff:
+                os.remove(old)
+
+    @staticmethod
+    def _read_frames(path):
+        opener = gzip.open if path.endswith('.gz') else open
+        frames = []
+        with opener(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):  # a frame still being written
+                    break
+                frames.append(json.loads(line))
+        return frames
+
+    def _frames(self, path, sealed):
+        """Decoded frames of a segment; sealed segments are immutable and cached"""
+        if not sealed:
+            return self._read_frames(path)
+        frames = self._decoded.get(path)
+        if frames is None:
+            frames = self._read_frames(path)
+            with self._lock:
+                self._decoded[path] = frames
+                while len(self._decoded) > self._cache_size:
+                    self._decoded.popitem(last=False)
+        else:
+            with self._lock:
+                if path in self._decoded:
+                    self._decoded.move_to_end(path)
+        return frames
+
+    def _segment_frames(self, start, end, path):
+        try:
+            return self._frames(path, end is not None)
+        except FileNotFoundError:  # sealed or expired while we were listing
+            return []
+
+    def bounds(self):
+        """(first, last) archived timestamps, or None when the archive is empty"""
+        segments = self.segments()
+        if not segments:
+            return None
+        first = self._segment_frames(*segments[0])
+        last = self._segment_frames(*segments[-1])
+        if not first or not last:
+            return None
+        return first[0]['t'], last[-1]['t']
+
+    def state_at(self, timestamp):
+        """Vehicles as of the last frame at or before ``timestamp``.
+
+        Returns (frame time, version, {vehicle id: record}) or None.
+        """
+        candidates = [segment for segment in self.segments() if segment[0] <= timestamp]
+        for segment in reversed(candidates):
+            result = self._replay(self._segment_frames(*segment), timestamp)
+            if result is not None:
+                return result
+        return None
+
+    @staticmethod
+    def _replay(frames, timestamp, state=None):
+        """Apply frames up to ``timestamp``; returns (time, version, state) or None"""
+        result = None
+        for frame in frames:
+            if frame['t'] > timestamp:
+                break
+            if state is None and not frame.get('k'):
+                continue  # a delta with nothing to apply it to
+            state, _, _ = apply_frame(state or {}, frame)
+            result = (frame['t'], frame['v'], state)
+        return result
+
+    def changes(self, start, end):
+        """Vehicle state at ``start`` and every change up to ``end``.
+
+        Returns (initial state as from ``state_at`` or None, [(time, version,
+        changed records, removed ids), ...]). Keyframes of later segments are
+        turned back into deltas, so the caller only ever applies changes.
+        """
+        initial = self.state_at(start)
+        state = dict(initial[2]) if initial else {}
+        changes = []
+        for segment in self.segments():
+            segment_start, segment_end, _ = segment
+            if segment_start > end or (segment_end is not None and segment_end < start):
+                continue
+            for frame in self._segment_frames(*segment):
+                if frame['t'] <= start:
+                    continue
+                if frame['t'] > end:
+                    break
+                state, changed, removed = apply_frame(state, frame)
+                changes.append((frame['t'], frame['v'], changed, removed))
+        return initial, changes
@@ -0,0 +1,60 @@
+# backend/services/arrivals.py
+import heapq
+from bisect import bisect_left
+
+
+class ArrivalIndex:
+    """Upcoming arrivals per stop, kept sorted by time.
+
+    Each entry is a ``(time, route_id, trip_id, stop_id)`` tuple; ``stop_id``
+    is the platform the train actually calls at, which differs from the key
+    when the key is a parent station. Lookups bisect on the parallel list of
+    times, so "next trains at X" is O(log n) instead of a scan over every
+    trip update.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+        self.times = {stop_id: [entry[0] for entry in stop_entries]
+                      for stop_id, stop_entries in self.entries.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, rows, parent_of):
+        """Index ``(time, route_id, trip_id, stop_id)`` rows under their stop and parent station"""
+        entries = {}
+        parents = {}  # parent_of is called once per distinct stop
+        for row in rows:
+            stop_id = row[3]
+            entries.setdefault(stop_id, []).append(row)
+            if stop_id not in parents:
+                parents[stop_id] = parent_of(stop_id)
+            parent = parents[stop_id]
+            if parent and parent != stop_id:
+                entries.setdefault(parent, []).append(row)
+        for stop_entries in entries.values():
+            stop_entries.sort()
+        return cls(entries)
+
+    @classmethod
+    def merge(cls, indexes):
+        """Combine per-feed indexes; stops served by a single feed reuse its list"""
+        indexes = [index for index in indexes if index is not None]
+        per_stop = {}
+        for index in indexes:
+            for stop_id, stop_entries in index.entries.items():
+                per_stop.setdefault(stop_id, []).append(stop_entries)
+
+        entries = {stop_id: lists[0] if len(lists) == 1 else list(heapq.merge(*lists))
+                   for stop_id, lists in per_stop.items()}
+        return cls(entries)
+
+    def upcoming(self, stop_id, now, limit=10):
+        """The next ``limit`` arrivals at ``stop_id`` at or after ``now``"""
+        times = self.times.get(stop_id)
+        if not times:
+            return []
+        start = bisect_left(times, now)
+        return self.entries[stop_id][start:start + limit]
@@ -0,0 +1,94 @@
+# backend/services/elevators.py
+import re
+from functools import lru_cache
+import numpy as np
+from data.gtfs_registry import gtfs
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_station_name(name):
+    """Lowercase a station name and collapse punctuation, e.g. 'Times Sq-42 St' -> 'times sq 42 st'"""
+    return _NON_WORD.sub(' ', (name or '').lower()).strip()
+
+
+@lru_cache(maxsize=1)
+def stations_by_name():
+    """Normalized station name -> GTFS parent station ids sharing it"""
+    stations = {}
+    stops = gtfs.stops
+    if stops is None:
+        return stations
+    for row in np.flatnonzero(stops.parents < 0).tolist():
+        stations.setdefault(normalize_station_name(stops.name(row)), []).append(stops.stop_id(row))
+    return stations
+
+
+def _outages(data):
+    """Outage records of an elevator feed in either format (JSON list or {'equipments': [...]})"""
+    if isinstance(data, list):
+        return data
+    return (data or {}).get('equipments') or []
+
+
+class ElevatorIndex:
+    """Elevator and escalator outages of one feed joined to GTFS stations.
+
+    Each outage's station name is matched against the GTFS station names;
+    names shared by several stations (e.g. '14 St') are narrowed to those
+    whose current arrivals include a route in the outage's ``trainno``.
+    Matched outages carry the station ids as ``stop_ids``.
+    """
+
+    def __init__(self, elevator_data, arrivals=None):
+        self.outages = []
+        self.by_station = {}
+        self.by_name = {}
+        for outage in _outages(elevator_data):
+            stop_ids = self._match(outage, arrivals)
+            outage = {**outage, 'stop_ids': stop_ids}
+            position = len(self.outages)
+            self.outages.append(outage)
+            for stop_id in stop_ids:
+                self.by_station.setdefault(stop_id, []).append(position)
+            self.by_name.setdefault(normalize_station_name(outage.get('station')), []).append(position)
+
+        if isinstance(elevator_data, list):
+            self.data = self.outages
+        else:
+            self.data = {**(elevator_data or {}), 'equipments': self.outages}
+
+    def __len__(self):
+        return len(self.outages)
+
+    @staticmethod
+    def _match(outage, arrivals):
+        name = normalize_station_name(outage.get('station'))
+        stations = stations_by_name()
+        candidates = stations.get(name)
+        if candidates is None:
+            # Complexes are sometimes listed as 'A / B'; take any part that matches
+            candidates = [stop_id for part in (outage.get('station') or '').split('/')
+                          for stop_id in stations.get(normalize_station_name(part), ())]
+        if len(candidates) > 1 and arrivals is not None:
+            routes = {route for route in re.split(r'[/,\s]+', outage.get('trainno') or '') if route}
+            served = [stop_id for stop_id in candidates
+                      if routes & {entry[1] for entry in arrivals.entries.get(stop_id, ())}]
+            candidates = served or candidates
+        return list(candidates)
+
+    def query(self, station):
+        """Outages at ``station``: a GTFS station or platform id, or a station name"""
+        positions = self.by_station.get(station)
+        if positions is None:
+            positions = self.by_station.get(gtfs.parent_station(station))
+        if positions is None:
+            positions = self.by_name.get(normalize_station_name(station), [])
+        return [self.outages[position] for position in positions]
+
+    def filtered(self, station):
+        """The elevator data with only the outages at ``station``, in the feed's own shape"""
+        outages = self.query(station)
+        if isinstance(self.data, list):
+            return outages
+        return {**self.data, 'equipments': outages}
@@ -0,0 +1,100 @@
+# backend/services/feed_health.py
+import threading
+import time
+from config.config import FEED_FAILURE_THRESHOLD, FEED_BACKOFF_BASE, FEED_BACKOFF_MAX
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of fetching a feed whose circuit breaker is open"""
+
+    def __init__(self, feed_key, retry_in):
+        super().__init__(f"Circuit open for {feed_key}, retrying in {retry_in:.0f}s")
+        self.feed_key = feed_key
+        self.retry_in = retry_in
+
+
+class FeedHealth:
+    """Success/failure history of one upstream feed, with a circuit breaker.
+
+    After ``threshold`` consecutive failures the circuit opens and the feed
+    is not requested again until the backoff has passed; each further
+    failure doubles the backoff up to ``max_backoff``. One success closes it.
+    """
+
+    def __init__(self, feed_key, threshold=FEED_FAILURE_THRESHOLD,
+                 base_backoff=FEED_BACKOFF_BASE, max_backoff=FEED_BACKOFF_MAX):
+        self.feed_key = feed_key
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.last_success = None
+        self.last_error = None
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, now=None):
+        """Raise CircuitOpenError if the feed should not be requested yet"""
+        now = now or time.time()
+        if now < self.open_until:
+            raise CircuitOpenError(self.feed_key, self.open_until - now)
+
+    def record_success(self, now=None):
+        with self._lock:
+            self.failures = 0
+            self.last_error = None
+            self.open_until = 0.0
+            self.last_success = now or time.time()
+
+    def record_failure(self, error, now=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.failures >= self.threshold:
+                backoff = min(self.base_backoff * 2 ** (self.failures - self.threshold), self.max_backoff)
+                self.open_until = (now or time.time()) + backoff
+
+    def status(self, now=None):
+        """Freshness summary; ``stale`` means clients are getting the last good data"""
+        now = now or time.time()
+        if now < self.open_until:
+            state = 'open'
+        elif self.failures:
+            state = 'failing'
+        else:
+            state = 'ok'
+        return {
+            'state': state,
+            'stale': self.failures > 0,
+            'last_success': (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.last_success))
+                             if self.last_success else None),
+            'age': round(now - self.last_success, 1) if self.last_success else None,
+            'consecutive_failures': self.failures,
+            'retry_in': round(self.open_until - now, 1) if state == 'open' else None,
+            'last_error': self.last_error
+        }
+
+    def guard(self, fetch, *args):
+        """Call ``fetch(*args)`` through the breaker, recording the outcome"""
+        self.check()
+        try:
+            result = fetch(*args)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+
+def aged_status(status, elapsed):
+    """A FeedHealth.status() summary as it reads ``elapsed`` seconds later, with no poll in between"""
+    status = dict(status)
+    if status['age'] is not None:
+        status['age'] = round(status['age'] + elapsed, 1)
+    if status['state'] == 'open':
+        retry_in = status['retry_in'] - elapsed
+        if retry_in > 0:
+            status['retry_in'] = round(retry_in, 1)
+        else:
+            status.update(state='failing', retry_in=None)
+    return status
@@ -0,0 +1,85 @@
+# backend/services/metrics.py
+"""Prometheus metrics for the fetch, parse and serve paths, exposed at /metrics.
+
+Under gunicorn every worker and the fetcher process record into
+PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py before any of them import
+prometheus_client), and /metrics merges all of their files, so any worker
+reports the fetcher's feed metrics and the request counts of all workers.
+Gauges set by one process keep its most recent value.
+"""
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+BYTE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+# Upstream feeds, labelled with the same keys as the circuit breakers:
+# subway lines ('ace', ...), 'alerts/<system>' and 'elevator/<type>'
+FEED_FETCH_SECONDS = Histogram('mta_feed_fetch_seconds', 'Upstream feed request latency', ['feed'])
+FEED_RESPONSE_BYTES = Histogram('mta_feed_response_bytes', 'Upstream feed response size', ['feed'],
+                                buckets=BYTE_BUCKETS)
+FEED_RESPONSES = Counter('mta_feed_responses_total', 'Upstream feed responses by HTTP status', ['feed', 'status'])
+FEED_PARSE_SECONDS = Histogram('mta_feed_parse_seconds', 'Protobuf decode and entity parse time', ['feed'])
+FEED_ENTITIES = Gauge('mta_feed_entities', 'Entities in the latest data for a feed', ['feed', 'type'],
+                      multiprocess_mode='mostrecent')
+FETCH_CACHE_REQUESTS = Counter('mta_fetch_cache_requests_total',
+                               'On-demand upstream reads by cache result (hit, miss, coalesced)',
+                               ['resource', 'result'])
+FEED_CIRCUIT_OPEN = Gauge('mta_feed_circuit_open', '1 while a feed is skipped by its circuit breaker', ['feed'],
+                          multiprocess_mode='mostrecent')
+
+FEED_POLL_INTERVAL = Gauge('mta_feed_poll_interval_seconds', 'Update cadence learned for a feed', ['feed'],
+                           multiprocess_mode='mostrecent')
+
+REFRESH_SECONDS = Histogram('transit_refresh_seconds', 'Time to combine polled feeds and publish a snapshot')
+GEOJSON_BUILD_SECONDS = Histogram('transit_geojson_build_seconds', 'Time to build the vehicle GeoJSON')
+VEHICLES = Gauge('transit_vehicles', 'Vehicles in the latest refresh', ['route'], multiprocess_mode='mostrecent')
+SNAPSHOT_AGE = Gauge('transit_snapshot_age_seconds', 'Seconds since the current snapshot was published',
+                     multiprocess_mode='mostrecent')
+SNAPSHOT_VERSION = Gauge('transit_snapshot_version', 'Version of the current snapshot',
+                         multiprocess_mode='mostrecent')
+
+REQUEST_SECONDS = Histogram('http_request_seconds', 'Request latency per route', ['route', 'method'])
+REQUESTS = Counter('http_requests_total', 'Requests per route and status', ['route', 'method', 'status'])
+
+
+_tracked_store = None
+
+
+def track_snapshots(store):
+    """Report the age and version of ``store``'s current snapshot at scrape time"""
+    global _tracked_store
+    _tracked_store = store
+
+
+def instrument_app(app):
+    """Time every request by its URL rule (not the raw path, to bound label cardinality)"""
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_SECONDS.labels(route, request.method).observe(time.perf_counter() - started)
+            REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        return response
+
+
+def metrics_response():
+    if _tracked_store is not None:
+        # Set here rather than with set_function, which multiprocess mode ignores
+        snapshot = _tracked_store.get_snapshot()
+        SNAPSHOT_AGE.set(time.time() - snapshot.timestamp if snapshot.timestamp else float('nan'))
+        SNAPSHOT_VERSION.set(snapshot.version)
+
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -1,67 +1,315 @@
 # backend/services/mta_service.py
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from google.transit import gtfs_realtime_pb2
+import hashlib
+import io
 import json
 import time
 import xml.etree.ElementTree as ET
-from config.config import API_BASE_URL, SUBWAY_FEEDS, SERVICE_ALERTS, ELEVATOR_FEEDS
-from data.stop_locations import get_stop_coordinates
+from config.config import (
+    API_BASE_URL, SUBWAY_FEEDS, SERVICE_ALERTS, ELEVATOR_FEEDS,
+    FETCH_CONCURRENCY, FEED_CONNECT_TIMEOUT, FEED_READ_TIMEOUT, FEED_TIMEOUTS,
+    FETCH_CACHE_TTLS, FETCH_CACHE_SIZE, FILTERED_FETCH_CACHE_SIZE
+)
+from data.gtfs_registry import gtfs
+from services.positions import ShapeNetwork, PositionEstimator
+from services.arrivals import ArrivalIndex
+from services.alerts import AlertIndex
+from services.elevators import ElevatorIndex
+from services.feed_health import FeedHealth
+from services.response_cache import CachedPayload
+from services.ttl_cache import TTLCache
+from services.metrics import (
+    FEED_FETCH_SECONDS, FEED_RESPONSE_BYTES, FEED_RESPONSES, FEED_PARSE_SECONDS,
+    FEED_ENTITIES, FEED_CIRCUIT_OPEN, FETCH_CACHE_REQUESTS, GEOJSON_BUILD_SECONDS
+)
+from models.transit import TripUpdate, VehiclePosition, filter_entities
+import sys
+import threading
+
+class FeedState:
+    """What we last saw from one feed, used to skip re-parsing unchanged data"""
+    
+    def __init__(self, etag=None, last_modified=None, content_hash=None,
+                 header_timestamp=None, parsed=None, arrivals=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.header_timestamp = header_timestamp
+        self.parsed = parsed
+        self.arrivals = arrivals
+    
+    def conditional_headers(self):
+        """Validators to send so the server can answer 304 Not Modified"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
 
 class MTAService:
-    def __init__(self):
+    def __init__(self, max_workers=FETCH_CONCURRENCY):
         self.base_url = API_BASE_URL
         self.headers = {}  # No API key needed
+        
+        # One keep-alive session shared by all fetch threads; the pool is
+        # sized so every concurrent fetch gets its own connection
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mta-fetch')
+        
+        # Last response seen per subway feed, for change detection
+        self.feed_states = {}
+        
+        # Format suffix that last worked per alert/elevator feed ('.json', '.xml', '')
+        self.feed_formats = {}
+        
+        # On-demand reads keyed (resource, name), e.g. ('alerts', 'bus'); the
+        # refresher primes it with what it fetched
+        self.cache = TTLCache(FETCH_CACHE_SIZE,
+                              record=lambda key, result: FETCH_CACHE_REQUESTS.labels(key[0], result).inc())
+        
+        # Route/type-filtered parses get their own small cache, so many
+        # distinct filters cannot evict the whole feeds above
+        self.filtered_cache = TTLCache(FILTERED_FETCH_CACHE_SIZE,
+                                       record=lambda key, result: FETCH_CACHE_REQUESTS.labels(
+                                           'subway_filtered', result).inc())
+        
+        # Indexes and serialized bodies of on-demand reads: key -> (source
+        # objects, value), rebuilt only when the cache hands out a new document
+        self._derived = {}
+        
+        # Circuit breaker per upstream feed (subway lines, 'alerts/<system>',
+        # 'elevator/<status_type>')
+        self.health = {}
+        self._health_lock = threading.Lock()
+        
+        self._position_estimator = None
+        self._position_lock = threading.Lock()
     
-    def fetch_subway_feed(self, line):
-        """Fetch subway real-time feed for a specific line"""
+    def _get(self, url, feed_key=None, headers=None):
+        """GET from the MTA over the pooled session with per-feed timeouts"""
+        timeout = FEED_TIMEOUTS.get(feed_key, (FEED_CONNECT_TIMEOUT, FEED_READ_TIMEOUT))
+        label = feed_key or 'other'
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, headers={**self.headers, **(headers or {})}, timeout=timeout)
+        except requests.RequestException:
+            FEED_RESPONSES.labels(label, 'error').inc()
+            raise
+        finally:
+            FEED_FETCH_SECONDS.labels(label).observe(time.perf_counter() - started)
+        FEED_RESPONSES.labels(label, str(response.status_code)).inc()
+        FEED_RESPONSE_BYTES.labels(label).observe(len(response.content))
+        return response
+    
+    def _get_any_format(self, feed_key, path, suffixes):
+        """GET the first of ``suffixes`` the MTA serves for ``path``; returns (suffix, response).
+        
+        The suffix that worked is remembered per feed and tried first next
+        time, so a format the MTA does not serve costs one request once
+        rather than on every refresh.
+        """
+        preferred = self.feed_formats.get(feed_key)
+        response = None
+        for suffix in sorted(suffixes, key=lambda suffix: suffix != preferred):
+            response = self._get(f"{self.base_url}{path}{suffix}", feed_key)
+            if response.status_code == 200:
+                self.feed_formats[feed_key] = suffix
+                return suffix, response
+        raise Exception(f"API returned status code {response.status_code}")
+    
+    def _cached(self, resource, name, load):
+        """``load()`` through the TTL cache under (resource, name)"""
+        return self.cache.get((resource, name), FETCH_CACHE_TTLS[resource], load)
+    
+    def _derive(self, key, sources, build):
+        """``build()`` once per distinct ``sources`` (compared by identity) under ``key``"""
+        entry = self._derived.get(key)
+        if entry is None or len(entry[0]) != len(sources) or any(a is not b for a, b in zip(entry[0], sources)):
+            entry = (sources, build())
+            self._derived[key] = entry
+        return entry[1]
+    
+    def payload_for(self, key, source, build):
+        """CachedPayload of ``build()``, serialized once per ``source`` object"""
+        return self._derive(('payload', key), (source,), lambda: CachedPayload.from_json(build()))
+    
+    def fetch_subway_feed(self, line, routes=None, types=None):
+        """Fetch subway real-time feed for a specific line.
+        
+        ``routes`` and ``types`` (sets, None for all) filter the entities: from
+        the cached full parse if it is fresh, otherwise while parsing, so
+        unwanted entities are never built.
+        """
+        if routes is None and types is None:
+            return self._cached('subway', line, lambda: self._fetch_subway_state(line).parsed)
+        full = self.cache.peek(('subway', line))
+        if full is not None:
+            return {**full, 'entities': filter_entities(full['entities'], routes, types)}
+        key = (line, tuple(sorted(routes)) if routes else None, tuple(sorted(types)) if types else None)
+        return self.filtered_cache.get(key, FETCH_CACHE_TTLS['subway'],
+                                       lambda: self._fetch_subway_filtered(line, routes, types))
+    
+    def _fetch_subway_filtered(self, line, routes, types):
+        """Fetch and parse only the wanted entities of a subway feed (no change detection)"""
+        if line not in SUBWAY_FEEDS:
+            raise ValueError(f"Invalid subway line: {line}")
+        response = self._get(f"{self.base_url}{SUBWAY_FEEDS[line]}", line)
+        if response.status_code != 200:
+            raise Exception(f"API returned status code {response.status_code}")
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.ParseFromString(response.content)
+        return self._parse_subway_feed(feed, routes=routes, types=types)
+    
+    def _fetch_subway_state(self, line):
+        """Fetch a subway feed and return its FeedState (parsed data plus arrivals index).
+        
+        Unchanged feeds are detected with conditional requests, then by content
+        hash, then by feed header timestamp; in each case the previously parsed
+        entities are reused without running the parser again.
+        """
         if line not in SUBWAY_FEEDS:
             raise ValueError(f"Invalid subway line: {line}")
             
         try:
+            state = self.feed_states.get(line)
             url = f"{self.base_url}{SUBWAY_FEEDS[line]}"
-            response = requests.get(url, headers=self.headers)
+            response = self._get(url, line, headers=state.conditional_headers() if state else None)
+            
+            if response.status_code == 304 and state:
+                return state
             
             if response.status_code != 200:
                 raise Exception(f"API returned status code {response.status_code}")
+            
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            content_hash = hashlib.blake2b(response.content, digest_size=16).digest()
+            
+            if state and content_hash == state.content_hash:
+                state = FeedState(etag, last_modified, content_hash,
+                                  state.header_timestamp, state.parsed, state.arrivals)
+                self.feed_states[line] = state
+                return state
                 
             # Parse the protobuf data
-            feed = gtfs_realtime_pb2.FeedMessage()
-            feed.ParseFromString(response.content)
+            with FEED_PARSE_SECONDS.labels(line).time():
+                feed = gtfs_realtime_pb2.FeedMessage()
+                feed.ParseFromString(response.content)
+                
+                if state and feed.header.timestamp and feed.header.timestamp == state.header_timestamp:
+                    parsed, arrivals = state.parsed, state.arrivals
+                else:
+                    arrival_rows = []
+                    parsed = self._parse_subway_feed(feed, arrival_rows)
+                    arrivals = ArrivalIndex.build(arrival_rows, gtfs.parent_station)
             
-            return self._parse_subway_feed(feed)
+            state = FeedState(etag, last_modified, content_hash,
+                              feed.header.timestamp, parsed, arrivals)
+            self.feed_states[line] = state
+            return state
         except Exception as e:
             print(f"Error fetching subway data for {line}: {str(e)}")
             raise
     
-    def fetch_all_subway_data(self):
-        """Fetch and combine data from all subway feeds"""
+    def feed_health(self, feed_key):
+        """FeedHealth tracker for one upstream feed, created on first use"""
+        health = self.health.get(feed_key)
+        if health is None:
+            with self._health_lock:
+                health = self.health.setdefault(feed_key, FeedHealth(feed_key))
+        return health
+    
+    def feed_status(self):
+        """Freshness and breaker state of every feed fetched so far"""
+        now = time.time()
+        status = {feed_key: health.status(now) for feed_key, health in self.health.items()}
+        for feed_key, feed in status.items():
+            FEED_CIRCUIT_OPEN.labels(feed_key).set(feed['state'] == 'open')
+        return status
+    
+    def _fetch_subway_or_stale(self, line):
+        """Fetch a subway feed through its circuit breaker.
+        
+        If the feed fails or its circuit is open, the last good FeedState is
+        returned instead so its trains stay on the map; only a feed that has
+        never succeeded raises.
+        """
+        try:
+            return self.feed_health(line).guard(self._fetch_subway_state, line)
+        except Exception:
+            state = self.feed_states.get(line)
+            if state is None:
+                raise
+            return state
+    
+    def poll_feed(self, feed_key):
+        """Fetch one upstream feed by its health key, for the per-feed scheduler.
+        
+        Returns (data, feed header timestamp or None). Subway feeds return
+        their FeedState (the last good one while failing); alert and elevator
+        feeds go through their circuit breaker and prime the fetch cache.
+        """
+        resource, _, name = feed_key.partition('/')
+        if resource == 'alerts':
+            data = self.feed_health(feed_key).guard(self._fetch_service_alerts, name)
+            self.cache.put(('alerts', name), data, FETCH_CACHE_TTLS['alerts'])
+            return data, (data.get('header') or {}).get('timestamp')
+        if resource == 'elevator':
+            data = self.feed_health(feed_key).guard(self._fetch_elevator_status, name)
+            self.cache.put(('elevator', name), data, FETCH_CACHE_TTLS['elevator'])
+            return data, None
+        state = self._fetch_subway_or_stale(feed_key)
+        return state, state.header_timestamp
+    
+    def combine_subway_states(self, states):
+        """Merge per-line FeedStates, in SUBWAY_FEEDS order.
+        
+        Returns the combined subway data and the merged per-stop arrivals index.
+        """
         all_entities = []
+        stale_entities = set()
+        feeds = self.feed_status()
+        states = {line: states[line] for line in SUBWAY_FEEDS if line in states}
         
-        for line, feed_url in SUBWAY_FEEDS.items():
-            try:
-                print(f"Fetching data for {line}...")
-                data = self.fetch_subway_feed(line)
-                vehicle_count = len([e for e in data.get('entities', []) if e.get('type') == 'vehicle'])
-                trip_update_count = len([e for e in data.get('entities', []) if e.get('type') == 'trip_update'])
-                
-                print(f"Retrieved {len(data.get('entities', []))} entities from {line}:")
-                print(f"  - {vehicle_count} vehicles (0 with position)")
-                print(f"  - {trip_update_count} trip updates")
-                
-                all_entities.extend(data.get('entities', []))
-            except Exception as e:
-                print(f"Failed to retrieve data for {line}: {str(e)}")
+        for line, state in states.items():
+            data = state.parsed
+            if feeds.get(line, {}).get('stale'):
+                stale_entities.update(entity.id for entity in data.get('entities', []))
+            else:
+                self.cache.put(('subway', line), data, FETCH_CACHE_TTLS['subway'])
+            vehicle_count = len([e for e in data.get('entities', []) if e.type == 'vehicle'])
+            FEED_ENTITIES.labels(line, 'vehicle').set(vehicle_count)
+            FEED_ENTITIES.labels(line, 'trip_update').set(len(data.get('entities', [])) - vehicle_count)
+            
+            all_entities.extend(data.get('entities', []))
         
-        return {
+        subway_data = {
             'header': {
                 'timestamp': int(time.time()),
                 'version': '2.0'
             },
-            'entities': all_entities
+            'entities': all_entities,
+            'feeds': {line: feeds[line] for line in SUBWAY_FEEDS if line in feeds},
+            'stale_entities': stale_entities
         }
+        return subway_data, ArrivalIndex.merge(state.arrivals for state in states.values())
     
-    def _parse_subway_feed(self, feed):
-        """Parse the protobuf feed into a more usable format"""
+    def _parse_subway_feed(self, feed, arrival_rows=None, routes=None, types=None):
+        """Parse the protobuf feed into a more usable format.
+        
+        If ``arrival_rows`` is given, every predicted stop time is appended to
+        it as ``(time, route_id, trip_id, stop_id)`` for the arrivals index.
+        ``routes`` and ``types`` ('vehicle', 'trip_update') restrict the
+        result; other entities are skipped on the protobuf message itself and
+        never materialized.
+        """
         result = {
             'header': {
                 'timestamp': feed.header.timestamp,
@@ -72,82 +320,96 @@ class MTAService:
         
         for entity in feed.entity:
             if entity.HasField('trip_update'):
-                parsed_entity = self._parse_trip_update(entity)
+                if ((types is not None and 'trip_update' not in types) or
+                        (routes is not None and entity.trip_update.trip.route_id not in routes)):
+                    continue
+                parsed_entity = self._parse_trip_update(entity, arrival_rows)
                 result['entities'].append(parsed_entity)
             elif entity.HasField('vehicle'):
+                if ((types is not None and 'vehicle' not in types) or
+                        (routes is not None and entity.vehicle.trip.route_id not in routes)):
+                    continue
                 parsed_entity = self._parse_vehicle_position(entity)
                 result['entities'].append(parsed_entity)
                 
         return result
     
-    def _parse_trip_update(self, entity):
+    def _parse_trip_update(self, entity, arrival_rows=None):
         """Parse trip update information"""
         trip_update = entity.trip_update
-        result = {
-            'id': entity.id,
-            'type': 'trip_update',
-            'trip_id': trip_update.trip.trip_id,
-            'route_id': trip_update.trip.route_id,
-            'start_time': trip_update.trip.start_time,
-            'start_date': trip_update.trip.start_date,
-            'stop_time_updates': []
-        }
+        trip = trip_update.trip
+        trip_id = trip.trip_id
+        route_id = sys.intern(trip.route_id)
+        stop_time_updates = []
         
         for stop_time_update in trip_update.stop_time_update:
-            update = {
-                'stop_id': stop_time_update.stop_id,
-                'arrival': None,
-                'departure': None
-            }
+            stop_id = sys.intern(stop_time_update.stop_id)
+            arrival = stop_time_update.arrival.time if stop_time_update.HasField('arrival') else None
+            departure = stop_time_update.departure.time if stop_time_update.HasField('departure') else None
+            stop_time_updates.append((stop_id, arrival, departure))
             
-            if stop_time_update.HasField('arrival'):
-                update['arrival'] = stop_time_update.arrival.time
-                
-            if stop_time_update.HasField('departure'):
-                update['departure'] = stop_time_update.departure.time
-                
-            result['stop_time_updates'].append(update)
+            arrival_time = arrival or departure
+            if arrival_rows is not None and arrival_time:
+                arrival_rows.append((arrival_time, route_id, trip_id, stop_id))
             
-        return result
+        return TripUpdate(entity.id, trip_id, route_id, trip.start_time, trip.start_date,
+                          tuple(stop_time_updates))
     
     def _parse_vehicle_position(self, entity):
         """Parse vehicle position information"""
         vehicle = entity.vehicle
-        result = {
-            'id': entity.id,
-            'type': 'vehicle',
-            'trip_id': vehicle.trip.trip_id,
-            'route_id': vehicle.trip.route_id,
-            'start_time': vehicle.trip.start_time,
-            'start_date': vehicle.trip.start_date,
-            'current_status': str(vehicle.current_status),
-            'timestamp': vehicle.timestamp,
-            'stop_id': vehicle.stop_id if vehicle.HasField('stop_id') else None
-        }
-        
-        return result
+        trip = vehicle.trip
+        return VehiclePosition(
+            entity.id,
+            trip.trip_id,
+            trip.route_id,
+            trip.start_time,
+            trip.start_date,
+            str(vehicle.current_status),
+            vehicle.timestamp,
+            vehicle.stop_id if vehicle.HasField('stop_id') else None
+        )
+    
+    def position_estimator(self):
+        """Estimator over the GTFS route shapes, built on first use"""
+        if self._position_estimator is None:
+            with self._position_lock:
+                if self._position_estimator is None:
+                    try:
+                        network = ShapeNetwork(gtfs.shape_points, gtfs.shape_to_route)
+                    except Exception as e:
+                        print(f"Route shapes unavailable, snapping trains to stops: {str(e)}")
+                        network = ShapeNetwork(None, {})
+                    self._position_estimator = PositionEstimator(network, gtfs.stops)
+        return self._position_estimator
     
-    def to_geojson(self, subway_data):
-        """Convert subway data to GeoJSON for map display using stop locations"""
+    def to_geojson(self, subway_data, now=None):
+        """Convert subway data to GeoJSON for map display.
+        
+        Trains are placed along their route shape between the stops they are
+        travelling between; trains that cannot be matched to a shape fall back
+        to the coordinates of their stop.
+        """
+        started = time.perf_counter()
         features = []
         
-        # Analyze data first
-        vehicle_count = 0
-        vehicles_with_stop = 0
-        unique_routes = set()
+        entities = subway_data.get('entities', [])
+        trip_updates = {entity.trip_id: entity for entity in entities if entity.type == 'trip_update'}
+        vehicles = [entity for entity in entities if entity.type == 'vehicle']
+        positions = self.position_estimator().estimate(vehicles, trip_updates, now or time.time())
+        stale_entities = subway_data.get('stale_entities', ())
         
-        for entity in subway_data.get('entities', []):
-            if entity.get('type') == 'vehicle':
-                vehicle_count += 1
-                route_id = entity.get('route_id')
-                
-                if route_id:
-                    unique_routes.add(route_id)
+        for entity in entities:
+            if entity.type == 'vehicle':
+                route_id = entity.route_id
                 
-                if entity.get('stop_id'):
-                    vehicles_with_stop += 1
-                    # Get coordinates for this stop
-                    lat, lon = get_stop_coordinates(entity.get('stop_id'))
+                if entity.stop_id:
+                    position = positions.get(entity.id)
+                    if position:
+                        lon, lat = position
+                    else:
+                        # Get coordinates for this stop
+                        lat, lon = gtfs.stop_coordinates(entity.stop_id)
                     
                     # Create GeoJSON feature
                     feature = {
@@ -157,50 +419,42 @@ class MTAService:
                             'coordinates': [lon, lat]  # GeoJSON uses [longitude, latitude]
                         },
                         'properties': {
-                            'id': entity.get('id'),
+                            'id': entity.id,
                             'route_id': route_id,
-                            'trip_id': entity.get('trip_id'),
-                            'status': entity.get('current_status'),
-                            'stop_id': entity.get('stop_id'),
-                            'timestamp': entity.get('timestamp')
+                            'trip_id': entity.trip_id,
+                            'status': entity.current_status,
+                            'stop_id': entity.stop_id,
+                            'timestamp': entity.timestamp,
+                            'estimated': position is not None,
+                            'stale': entity.id in stale_entities
                         }
                     }
                     features.append(feature)
         
-        print(f"Data analysis: {vehicle_count} vehicles, {vehicles_with_stop} with stop IDs")
-        print(f"Found {len(unique_routes)} unique routes: {sorted(list(unique_routes))}")
-        print(f"Created {len(features)} GeoJSON features")
-        
+        GEOJSON_BUILD_SECONDS.observe(time.perf_counter() - started)
         return {
             'type': 'FeatureCollection',
             'features': features
         }
     
-    def fetch_all_subway_geojson(self):
-        """Fetch all subway data and convert directly to GeoJSON"""
-        subway_data = self.fetch_all_subway_data()
-        return self.to_geojson(subway_data)
-    
     def fetch_service_alerts(self, system='subway'):
         """Fetch service alerts for the specified system"""
+        return self._cached('alerts', system, lambda: self._fetch_service_alerts(system))
+    
+    def service_alert_index(self, system='subway'):
+        """AlertIndex over the alerts of ``system``, built once per fetched document"""
+        data = self.fetch_service_alerts(system)
+        return self._derive(('alerts', system), (data,), lambda: AlertIndex(data))
+    
+    def _fetch_service_alerts(self, system):
         if system not in SERVICE_ALERTS:
             raise ValueError(f"Invalid system: {system}")
             
         try:
-            # Try to get JSON format first
-            url = f"{self.base_url}{SERVICE_ALERTS[system]}.json"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
+            suffix, response = self._get_any_format(f"alerts/{system}", SERVICE_ALERTS[system], ('.json', ''))
+            if suffix == '.json':
                 return response.json()
             
-            # Fall back to protobuf format
-            url = f"{self.base_url}{SERVICE_ALERTS[system]}"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code != 200:
-                raise Exception(f"API returned status code {response.status_code}")
-                
             # Parse the protobuf data
             feed = gtfs_realtime_pb2.FeedMessage()
             feed.ParseFromString(response.content)
@@ -264,46 +518,47 @@ class MTAService:
     
     def fetch_elevator_escalator_status(self, status_type='current'):
         """Fetch elevator and escalator status"""
+        return self._cached('elevator', status_type, lambda: self._fetch_elevator_status(status_type))
+    
+    def elevator_index(self, status_type='current', arrivals=None):
+        """ElevatorIndex over one elevator feed, built once per fetched document.
+        
+        Station names shared by several stations are narrowed with the
+        ``arrivals`` current when the document was indexed.
+        """
+        data = self.fetch_elevator_escalator_status(status_type)
+        return self._derive(('elevator', status_type), (data,), lambda: ElevatorIndex(data, arrivals))
+    
+    def _fetch_elevator_status(self, status_type):
         if status_type not in ELEVATOR_FEEDS:
             raise ValueError(f"Invalid status type: {status_type}")
             
         try:
-            # Try to get JSON format first
-            url = f"{self.base_url}{ELEVATOR_FEEDS[status_type]}.json"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
+            suffix, response = self._get_any_format(f"elevator/{status_type}", ELEVATOR_FEEDS[status_type],
+                                                    ('.json', '.xml'))
+            if suffix == '.json':
                 return response.json()
-            
-            # Fall back to XML format
-            url = f"{self.base_url}{ELEVATOR_FEEDS[status_type]}.xml"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code != 200:
-                raise Exception(f"API returned status code {response.status_code}")
-                
-            # Parse XML data
-            return self._parse_elevator_xml(response.text)
+            return self._parse_elevator_xml(response.content)
         except Exception as e:
             print(f"Error fetching elevator/escalator data: {str(e)}")
             raise
     
-    def _parse_elevator_xml(self, xml_string):
-        """Parse elevator/escalator XML data"""
+    def _parse_elevator_xml(self, xml_content):
+        """Parse elevator/escalator XML data incrementally.
+        
+        Each record (an <outage> in the NYCOutages feed, or an <equipment>
+        element with children) is collected as its child tags when it closes
+        and then cleared, so the whole tree is never held in memory.
+        """
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode('utf-8')
+        result = {'equipments': []}
         try:
-            root = ET.fromstring(xml_string)
-            result = {
-                'equipments': []
-            }
-            
-            for equipment in root.findall(".//equipment"):
-                equipment_data = {}
-                for child in equipment:
-                    equipment_data[child.tag] = child.text
-                
-                result['equipments'].append(equipment_data)
-            
+            for _, element in ET.iterparse(io.BytesIO(xml_content), events=('end',)):
+                if element.tag in ('outage', 'equipment') and len(element):
+                    result['equipments'].append({child.tag: child.text for child in element})
+                    element.clear()
             return result
-        except Exception as e:
+        except ET.ParseError as e:
             print(f"Error parsing elevator XML: {str(e)}")
-            return {'raw_xml': xml_string}
\ No newline at end of file
+            return {'raw_xml': xml_content.decode('utf-8', errors='replace')}
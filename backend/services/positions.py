@@ -0,0 +1,202 @@
+# backend/services/positions.py
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Used to place a train before its next stop when the previous stop's
+# departure has already dropped out of the trip update
+AVERAGE_SPEED_MPS = 9.0
+
+# Spacing between shapes on the shared distance axis, so interpolation
+# never blends the end of one shape into the start of the next
+SHAPE_GAP_M = 1000.0
+
+STOPPED_AT = '1'  # VehicleStopStatus.STOPPED_AT
+
+
+class ShapeNetwork:
+    """All route shapes laid end to end on one cumulative-distance axis.
+
+    A position anywhere in the network is a single float, so positions for
+    the whole fleet can be turned into coordinates with one ``np.interp``.
+    ``shape_points`` is ``(shape_ids, bounds, lons, lats)`` as returned by
+    grouped_points, or None for an empty network.
+    """
+
+    def __init__(self, shape_points, shape_to_route):
+        self.bounds = {}
+        lons, lats, distances = [], [], []
+        offset = 0.0
+        start = 0
+        shape_ids, shape_bounds, all_lons, all_lats = shape_points or ([], np.zeros(1, dtype=np.int64), None, None)
+        for shape_id, begin, end in zip(shape_ids, shape_bounds[:-1].tolist(), shape_bounds[1:].tolist()):
+            shape_lons = np.asarray(all_lons[begin:end], dtype=np.float64)
+            shape_lats = np.asarray(all_lats[begin:end], dtype=np.float64)
+            valid = np.isfinite(shape_lons) & np.isfinite(shape_lats)
+            shape_lons, shape_lats = shape_lons[valid], shape_lats[valid]
+            if len(shape_lons) < 2:
+                continue
+            mean_lat = math.radians(float(shape_lats.mean()))
+            dx = np.radians(np.diff(shape_lons)) * math.cos(mean_lat)
+            dy = np.radians(np.diff(shape_lats))
+            cumulative = np.concatenate(([0.0], np.cumsum(np.hypot(dx, dy) * EARTH_RADIUS_M)))
+
+            self.bounds[shape_id] = (start, start + len(shape_lons), offset, offset + cumulative[-1])
+            start += len(shape_lons)
+            lons.append(shape_lons)
+            lats.append(shape_lats)
+            distances.append(cumulative + offset)
+            offset += cumulative[-1] + SHAPE_GAP_M
+
+        self.lons = np.concatenate(lons) if lons else np.empty(0)
+        self.lats = np.concatenate(lats) if lats else np.empty(0)
+        self.distances = np.concatenate(distances) if distances else np.empty(0)
+
+        # Default shape per (route, direction), used when a trip id does not
+        # name a known shape: the longest one wins
+        self.route_shapes = {}
+        for shape_id, route_id in shape_to_route.items():
+            if shape_id not in self.bounds:
+                continue
+            key = (route_id, self._direction(shape_id))
+            current = self.route_shapes.get(key)
+            if current is None or self._length(shape_id) > self._length(current):
+                self.route_shapes[key] = shape_id
+
+
+    def __len__(self):
+        return len(self.bounds)
+
+    @staticmethod
+    def _direction(shape_or_trip_id):
+        # NYC ids end in e.g. '1..S03R': the letter after '..' is the direction
+        _, _, suffix = shape_or_trip_id.partition('..')
+        return suffix[:1]
+
+    def _length(self, shape_id):
+        _, _, start_distance, end_distance = self.bounds[shape_id]
+        return end_distance - start_distance
+
+    def shape_for_trip(self, trip_id, route_id):
+        """Shape a realtime trip runs on, e.g. '051150_1..S03R' -> '1..S03R'"""
+        _, _, shape_id = trip_id.partition('_')
+        if shape_id in self.bounds:
+            return shape_id
+        return self.route_shapes.get((route_id, self._direction(trip_id)))
+
+    def nearest(self, shape_id, lats, lons):
+        """Network distances of the shape vertices nearest to each point"""
+        start, end, _, _ = self.bounds[shape_id]
+        lats = np.asarray(lats, dtype=np.float64)[:, None]
+        lons = np.asarray(lons, dtype=np.float64)[:, None]
+        dx = (self.lons[start:end] - lons) * np.cos(np.radians(lats))
+        dy = self.lats[start:end] - lats
+        return self.distances[start + np.argmin(dx * dx + dy * dy, axis=1)]
+
+
+class PositionEstimator:
+    """Interpolates every train's position along its shape from trip-update times"""
+
+    def __init__(self, network, stops):
+        self.network = network
+        self.stops = stops  # StopTable, or None without stops.txt
+        self.shape_ids = list(network.bounds)
+        self.shape_index = {shape_id: i for i, shape_id in enumerate(self.shape_ids)}
+        self.shape_starts = np.array([network.bounds[shape_id][2] for shape_id in self.shape_ids])
+        # Network distance of every (shape, stop row) pair, NaN until a train needs it
+        self._projections = np.full((len(self.shape_ids), len(stops) if stops is not None else 0), np.nan)
+
+    def _project(self, shapes, stop_rows):
+        """Network distances of stops on the shapes at the same positions"""
+        distances = self._projections[shapes, stop_rows]
+        missing = np.isnan(distances)
+        if missing.any():
+            pairs = np.unique(np.column_stack((shapes[missing], stop_rows[missing])), axis=0)
+            for shape in np.unique(pairs[:, 0]).tolist():
+                rows = pairs[pairs[:, 0] == shape, 1]
+                self._projections[shape, rows] = self.network.nearest(
+                    self.shape_ids[shape], self.stops.lats[rows], self.stops.lons[rows])
+            distances = self._projections[shapes, stop_rows]
+        return distances
+
+    def estimate(self, vehicles, trip_updates, now):
+        """Map vehicle id -> (lon, lat) for every vehicle that can be placed on a shape.
+
+        The stop-time updates of all trains are flattened into one table, in
+        which each train's next stop (the first one still ahead) and previous
+        stop (the last one passed before it) are found with array operations.
+        A train stopped at a station, or with nothing ahead, heads for its own
+        stop. Stops, projections and the interpolation are then resolved for
+        the whole fleet at once.
+        """
+        network = self.network
+        stops = self.stops
+        if not len(network) or stops is None:
+            return {}
+
+        ids, shapes, own_stops = [], [], []
+        owners, updates = [], []  # per stop-time update: train position in ``ids``, the update
+        for vehicle in vehicles:
+            shape_id = network.shape_for_trip(vehicle.trip_id, vehicle.route_id)
+            if shape_id is None:
+                continue
+            if not (vehicle.current_status == STOPPED_AT and vehicle.stop_id):
+                trip = trip_updates.get(vehicle.trip_id)
+                if trip is not None:
+                    owners.extend([len(ids)] * len(trip.stop_time_updates))
+                    updates.extend(trip.stop_time_updates)
+            ids.append(vehicle.id)
+            shapes.append(self.shape_index[shape_id])
+            own_stops.append(vehicle.stop_id or '')
+        if not ids:
+            return {}
+
+        # Every per-update array ends with a sentinel row that index -1 selects
+        update_stops, arrivals, departures = zip(*updates) if updates else ((), (), ())
+        arrivals = np.array(arrivals + (None,), dtype=np.float64)  # None -> NaN
+        departures = np.array(departures + (None,), dtype=np.float64)
+        arrival_times = np.where(arrivals > 0, arrivals, departures)
+        left_times = np.where(departures > 0, departures, arrivals)
+        update_rows = np.append(stops.rows(update_stops), -1)
+        owners = np.array(owners, dtype=np.int64)
+        positions = np.arange(len(owners))
+
+        ahead = np.flatnonzero(arrival_times[:-1] > now)
+        first_ahead = np.full(len(ids), len(owners))
+        np.minimum.at(first_ahead, owners[ahead], ahead)
+        passed = np.flatnonzero((arrival_times[:-1] <= now) & (positions < first_ahead[owners]))
+        previous = np.full(len(ids), -1)
+        np.maximum.at(previous, owners[passed], passed)
+        upcoming = np.where(first_ahead < len(owners), first_ahead, -1)
+
+        has_location = np.append(stops.valid, False)  # stop row -1 has none
+        next_stops = np.where(upcoming >= 0, update_rows[upcoming], stops.rows(own_stops))
+        placed = np.flatnonzero(has_location[next_stops])
+        if not len(placed):
+            return {}
+        shapes = np.array(shapes)[placed]
+        upcoming, previous = upcoming[placed], previous[placed]
+        next_stops = next_stops[placed]
+        prev_stops = update_rows[previous]
+
+        next_d = self._project(shapes, next_stops)
+        next_t = np.where(upcoming >= 0, arrival_times[upcoming], now)
+        known_previous = has_location[prev_stops]
+        prev_d = np.full(len(placed), np.nan)
+        prev_d[known_previous] = self._project(shapes[known_previous], prev_stops[known_previous])
+        prev_t = np.where(known_previous, left_times[previous], np.nan)
+        min_d = self.shape_starts[shapes]
+
+        # Between two known stops: linear in time. Otherwise back off from the
+        # next stop at average speed, never past the start of the shape
+        known = ~np.isnan(prev_t) & (next_t > prev_t) & (next_d >= prev_d)
+        span = np.where(known, next_t - prev_t, 1.0)
+        fraction = np.clip((now - prev_t) / span, 0.0, 1.0)
+        between = prev_d + fraction * (next_d - prev_d)
+        approaching = np.maximum(next_d - np.maximum(next_t - now, 0.0) * AVERAGE_SPEED_MPS, min_d)
+        distance = np.where(known, between, approaching)
+
+        lons = np.interp(distance, network.distances, network.lons)
+        lats = np.interp(distance, network.distances, network.lats)
+        return dict(zip([ids[i] for i in placed.tolist()], zip(lons.tolist(), lats.tolist())))
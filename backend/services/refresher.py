@@ -0,0 +1,123 @@
+# backend/services/refresher.py
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from services.metrics import FEED_POLL_INTERVAL, REFRESH_SECONDS, VEHICLES
+from services.scheduler import FeedSchedule, FeedScheduler
+from config.config import (
+    SUBWAY_FEEDS, POSITION_UPDATE_INTERVAL, FEED_SCHEDULES, SCHEDULE_DELAY, SCHEDULE_JITTER, PUBLISH_SETTLE
+)
+
+
+def build_scheduler(alert_systems, elevator_types, now):
+    """A FeedScheduler over every subway feed plus the given alert and elevator feeds"""
+    feed_keys = (list(SUBWAY_FEEDS) + [f"alerts/{system}" for system in alert_systems] +
+                 [f"elevator/{status_type}" for status_type in elevator_types])
+    schedules = []
+    for feed_key in feed_keys:
+        resource = feed_key.partition('/')[0] if '/' in feed_key else 'subway'
+        schedules.append(FeedSchedule(feed_key, *FEED_SCHEDULES[resource], delay=SCHEDULE_DELAY, jitter=SCHEDULE_JITTER))
+    return FeedScheduler(schedules, now)
+
+
+def collect_update(mta_service, scheduler, finished, states, now):
+    """Fold finished polls (feed key -> future) into the keyword arguments for ``publish``.
+
+    Each poll reschedules its feed. Subway FeedStates replace their line's
+    entry in ``states``, and subway data, arrivals and vehicle GeoJSON are
+    only rebuilt when one of them brought new entities.
+    """
+    update = {}
+    subway_changed = False
+    for feed_key, future in finished.items():
+        try:
+            data, header_timestamp = future.result()
+        except Exception as e:
+            print(f"Failed to poll {feed_key}: {str(e)}")
+            scheduler.failed(feed_key, now)
+            continue
+        scheduler.observe(feed_key, header_timestamp, now)
+        FEED_POLL_INTERVAL.labels(feed_key).set(scheduler.schedules[feed_key].interval)
+
+        resource, _, name = feed_key.partition('/')
+        if resource == 'alerts':
+            update.setdefault('service_alerts', {})[name] = data
+        elif resource == 'elevator':
+            update.setdefault('elevator_data', {})[name] = data
+        else:
+            previous = states.get(feed_key)
+            if previous is None or previous.parsed is not data.parsed:
+                subway_changed = True
+            states[feed_key] = data
+
+    if subway_changed:
+        subway_data, arrivals = mta_service.combine_subway_states(states)
+        update.update(subway_data=subway_data, arrivals=arrivals,
+                      subway_geojson=mta_service.to_geojson(subway_data))
+
+        # Count vehicles by line
+        line_counts = {}
+        for entity in subway_data.get('entities', []):
+            if entity.type == 'vehicle' and entity.route_id:
+                route_id = entity.route_id
+                line_counts[route_id] = line_counts.get(route_id, 0) + 1
+
+        VEHICLES.clear()
+        for line, count in line_counts.items():
+            VEHICLES.labels(line).set(count)
+    return update
+
+
+def refresh_forever(mta_service, publish, alert_systems=('subway',), elevator_types=('current',)):
+    """Poll every feed on its own schedule and hand each update to ``publish``.
+
+    ``publish`` is TransitData.publish, either of the web process polling
+    for itself or of the fetcher process, which hands each snapshot on to
+    the workers (see services/shared_snapshot.py). A slow feed only delays
+    itself: whatever finishes is published (feeds finishing within
+    PUBLISH_SETTLE of each other together), and subway data is only
+    recombined when a feed actually brought new entities.
+    """
+    scheduler = build_scheduler(alert_systems, elevator_types, time.time())
+    inflight = {}  # future -> feed key
+    states = {}  # subway line -> latest FeedState
+    subway_data = None
+    next_position_update = time.time() + POSITION_UPDATE_INTERVAL
+
+    while True:
+        try:
+            for feed_key in scheduler.pop_due(time.time()):
+                inflight[mta_service.executor.submit(mta_service.poll_feed, feed_key)] = feed_key
+
+            timeout = max(0, min(scheduler.next_poll(), next_position_update) - time.time())
+            done = []
+            if inflight:
+                finished, _ = wait(inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if finished:
+                    time.sleep(PUBLISH_SETTLE)
+                    done = [future for future in inflight if future.done()]
+            else:
+                time.sleep(timeout)
+
+            started = time.time()
+            update = collect_update(mta_service, scheduler, {inflight.pop(future): future for future in done},
+                                    states, started)
+            subway_data = update.get('subway_data', subway_data)
+
+            if update:
+                update['feed_status'] = mta_service.feed_status()
+            now = time.time()
+            if 'subway_geojson' in update or now >= next_position_update:
+                if subway_data is not None and 'subway_geojson' not in update:
+                    # Between feed updates, keep moving trains along their shapes
+                    # using the trip-update times we already have
+                    update['subway_geojson'] = mta_service.to_geojson(subway_data)
+                # Move the deadline on even with nothing to estimate yet, or
+                # the wait above drops to zero while every feed is failing
+                next_position_update = now + POSITION_UPDATE_INTERVAL
+            if update:
+                publish(**update)
+                if 'feed_status' in update:
+                    REFRESH_SECONDS.observe(time.time() - started)
+        except Exception as e:
+            print(f"Error in background refresh thread: {str(e)}")
+            time.sleep(5)
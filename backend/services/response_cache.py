@@ -0,0 +1,93 @@
+# backend/services/response_cache.py
+import gzip
+import hashlib
+import json
+import threading
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; falls back to the stdlib encoder
+    orjson = None
+
+
+def serialize_json(data):
+    """Compact JSON encoding used for every cached response body"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+class CachedPayload:
+    """A response body serialized once, with compressed variants built on demand.
+
+    Each variant gets its own strong ETag so caches never mix encodings.
+    Bodies and variants may be any bytes-like object, e.g. memoryviews into
+    a file shared with other processes (see services/shared_snapshot.py).
+    """
+
+    def __init__(self, body, mimetype='application/json', etag=None, variants=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag or hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._variants = {**(variants or {}), 'identity': body}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(serialize_json(data))
+
+    def encodings(self):
+        return ['br', 'gzip'] if brotli else ['gzip']
+
+    def variant(self, encoding):
+        """Body bytes for ``encoding``, compressing at most once per payload"""
+        body = self._variants.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._variants.get(encoding)
+                if body is None:
+                    if encoding == 'br':
+                        body = brotli.compress(self.body, quality=5)
+                    else:
+                        body = gzip.compress(self.body, compresslevel=6)
+                    self._variants[encoding] = body
+        return body
+
+    def variant_etag(self, encoding):
+        return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+    def precompress(self):
+        for encoding in self.encodings():
+            self.variant(encoding)
+        return self
+
+    def variants(self):
+        """Encoding -> body bytes for every variant built so far"""
+        return dict(self._variants)
+
+
+def cached_response(payload, max_age=0):
+    """Serve a CachedPayload with content negotiation and If-None-Match support"""
+    encoding = request.accept_encodings.best_match(payload.encodings()) or 'identity'
+    etag = payload.variant_etag(encoding)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = payload.variant(encoding)
+        # WSGI servers only write bytes: views into a shared mapping are
+        # copied per response, the mapped copy stays the only resident one
+        response = Response(body if isinstance(body, bytes) else bytes(body), mimetype=payload.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f"public, max-age={max_age}" if max_age else 'no-cache'
+    return response
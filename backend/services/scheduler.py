@@ -0,0 +1,107 @@
+# backend/services/scheduler.py
+import heapq
+import random
+
+
+class FeedSchedule:
+    """When to poll one feed next, learned from how often its header timestamp advances.
+
+    The next poll is set for just after the expected next update (plus
+    jitter, so feeds with the same cadence do not fire together). A poll
+    that finds the feed unchanged retries after min_interval, doubling
+    while it stays unchanged.
+
+    Only the gap between two header timestamps with an unchanged poll in
+    between is an exact cadence sample and moves the average; a poll that
+    finds a change straight away may have missed updates, so its gap only
+    caps the estimate. Every few straight hits the estimate is shortened a
+    little to probe whether the feed got faster. Feeds without a header
+    timestamp, and failed polls, wait one interval.
+    """
+
+    SMOOTHING = 0.3  # weight of the newest sample in the cadence average
+    PROBE_AFTER = 5  # straight hits before probing a shorter cadence
+    PROBE_FACTOR = 0.9
+
+    def __init__(self, feed_key, interval, min_interval, max_interval, delay=2, jitter=3):
+        self.feed_key = feed_key
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.delay = delay
+        self.jitter = jitter
+        self.header_timestamp = None
+        self.unchanged = 0
+        self.hits = 0
+        self.next_poll = 0.0
+
+    def _clamp(self, seconds):
+        return min(max(seconds, self.min_interval), self.max_interval)
+
+    def observe(self, header_timestamp, now):
+        """Record a successful poll at ``now`` and schedule the next one"""
+        if not header_timestamp:
+            self.next_poll = now + self.interval + random.uniform(0, self.jitter)
+            return self.next_poll
+
+        if self.header_timestamp is None or header_timestamp > self.header_timestamp:
+            if self.header_timestamp is not None:
+                gap = header_timestamp - self.header_timestamp
+                if self.unchanged:
+                    self.interval = (1 - self.SMOOTHING) * self.interval + self.SMOOTHING * gap
+                    self.hits = 0
+                else:
+                    self.interval = min(self.interval, gap)
+                    self.hits += 1
+                    if self.hits >= self.PROBE_AFTER:
+                        self.interval *= self.PROBE_FACTOR
+                        self.hits = 0
+                self.interval = self._clamp(self.interval)
+            self.header_timestamp = header_timestamp
+            self.unchanged = 0
+            # Poll just after the expected update, but never sooner than
+            # min_interval or later than max_interval from now (this also
+            # absorbs clock skew between us and the feed)
+            wait = self._clamp(header_timestamp + self.interval + self.delay - now)
+        else:
+            self.unchanged += 1
+            wait = self._clamp(self.min_interval * 2 ** (self.unchanged - 1))
+        self.next_poll = now + wait + random.uniform(0, self.jitter)
+        return self.next_poll
+
+    def failed(self, now):
+        """Record a failed poll; the circuit breaker decides whether the next one goes upstream"""
+        self.next_poll = now + self.interval + random.uniform(0, self.jitter)
+        return self.next_poll
+
+
+class FeedScheduler:
+    """Per-feed timers: a heap of (next poll, feed key) over FeedSchedules"""
+
+    def __init__(self, schedules, now):
+        self.schedules = {schedule.feed_key: schedule for schedule in schedules}
+        # Spread the first polls over the jitter window
+        self._heap = []
+        for schedule in self.schedules.values():
+            schedule.next_poll = now + random.uniform(0, schedule.jitter)
+            heapq.heappush(self._heap, (schedule.next_poll, schedule.feed_key))
+
+    def next_poll(self):
+        return self._heap[0][0] if self._heap else float('inf')
+
+    def pop_due(self, now):
+        """Feed keys whose poll time has come; they are rescheduled by observe/failed"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def observe(self, feed_key, header_timestamp, now):
+        heapq.heappush(self._heap, (self.schedules[feed_key].observe(header_timestamp, now), feed_key))
+
+    def failed(self, feed_key, now):
+        heapq.heappush(self._heap, (self.schedules[feed_key].failed(now), feed_key))
+
+    def cadences(self):
+        """Learned poll interval per feed"""
+        return {feed_key: schedule.interval for feed_key, schedule in self.schedules.items()}
@@ -0,0 +1,270 @@
+# backend/services/shared_snapshot.py
+"""Hand-off of published snapshots from the fetcher process to web workers.
+
+The fetcher (``fetcher.py``) is the only process that polls the MTA. It
+publishes into its own TransitData, so the indexes are built there, and
+renders the unfiltered response bodies of every new snapshot (``/api/subway/
+all``, the vehicle GeoJSON, alerts and elevator status) with their
+compressed variants. Those bytes go into one file per version that every
+worker maps read-only and serves straight from the mapping: serialization
+and compression happen once, and the bodies sit in the page cache once, for
+all workers.
+
+The parsed parts of each update (subway data, GeoJSON, arrivals, ...) are
+pickled next to them. Workers load those into their own TransitData as
+well, because filtered queries, ?since= deltas and the event stream work on
+the objects; that part of the data is still one copy per worker. Sharing it
+would take NumPy arrays in the mapped files (as data/gtfs_cache.py does for
+the static tables) in place of the parsed snapshot and its indexes; the
+``workers`` benchmark in benchmarks/run.py measures what each copy costs.
+
+    <path>                         control: magic, seq, version, timestamp, part versions
+    <path>.<part>.<version>        one pickled part ('payloads' is the index of the bodies)
+    <path>.bodies.<version>        response bodies rendered for that version
+
+Workers poll the control file; when the version moves they load only the
+parts that changed and publish them under the fetcher's version number, so
+version-based requests (?since=, Last-Event-ID) work whichever worker
+answers them.
+"""
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from services.response_cache import CachedPayload
+
+MAGIC = b'MTASNAP2'
+
+# Parts of a TransitData.publish() update, then the payload index, in control-file order
+PARTS = ('subway_data', 'subway_geojson', 'arrivals', 'service_alerts', 'elevator_data', 'feed_status', 'payloads')
+
+# magic, seq, version, timestamp, then one version per part
+CONTROL = struct.Struct(f"<8sQQd{len(PARTS)}Q")
+
+# Superseded part files are kept this long for workers still reading them
+PART_GRACE_SECONDS = 30
+
+
+def part_path(path, part, version):
+    return f"{path}.{part}.{version}"
+
+
+def changed_parts(previous, snapshot):
+    """The parts of ``snapshot`` that are new since ``previous``, as a TransitData.publish() update"""
+    update = {}
+    for part in ('subway_data', 'subway_geojson', 'arrivals', 'feed_status'):
+        value = getattr(snapshot, part)
+        if value is not None and value is not getattr(previous, part):
+            update[part] = value
+    for part in ('service_alerts', 'elevator_data'):
+        current = getattr(previous, part)
+        changed = {name: data for name, data in getattr(snapshot, part).items() if current.get(name) is not data}
+        if changed:
+            update[part] = changed
+    return update
+
+
+def changed_payload_keys(update, snapshot):
+    """Payload keys of ``snapshot`` whose bodies ``update`` changed"""
+    keys = []
+    if 'subway_data' in update:
+        keys.append('all')
+    if snapshot.subway_geojson is not None:
+        keys.append('geojson')  # the body carries the version
+    keys.extend(('alerts', system) for system in update.get('service_alerts', ()))
+    keys.extend(('elevator', status_type) for status_type in update.get('elevator_data', ()))
+    return keys
+
+
+class SharedSnapshotWriter:
+    """Fetcher side: a TransitData listener that writes each snapshot for the workers"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        # Carry on from the last version a previous run published, so workers
+        # that outlived it keep accepting new snapshots
+        self.version = 0
+        try:
+            with open(path, 'rb') as f:
+                magic, _, self.version, *_ = CONTROL.unpack(f.read(CONTROL.size))
+            if magic != MAGIC:
+                self.version = 0
+        except (FileNotFoundError, struct.error):
+            pass
+        for name in os.listdir(directory):  # parts left by a previous run
+            if name.startswith(f"{os.path.basename(path)}."):
+                os.remove(os.path.join(directory, name))
+
+        # A fresh control file (new inode) rather than truncating the one
+        # workers have mapped
+        self.part_versions = [0] * len(PARTS)
+        self.payload_index = {}  # key -> (bodies version, mimetype, etag, {encoding: (offset, length)})
+        self._superseded = []  # (time superseded, path)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(CONTROL.pack(MAGIC, 0, self.version, 0.0, *self.part_versions))
+        os.replace(f"{path}.tmp", path)
+        self._file = open(path, 'r+b')
+        self._control = mmap.mmap(self._file.fileno(), CONTROL.size)
+
+    def on_publish(self, previous, snapshot, vehicle_delta):
+        """TransitData listener: write what changed in ``snapshot`` and its rendered bodies"""
+        update = changed_parts(previous, snapshot)
+        payloads = {key: snapshot.get_payload(key).precompress() for key in changed_payload_keys(update, snapshot)}
+        self.write(snapshot.version, snapshot.timestamp, update, payloads)
+
+    def write(self, version, timestamp, update, payloads=None):
+        """Publish ``update`` (parts as for TransitData.publish) and CachedPayloads as ``version``"""
+        if payloads:
+            self._write_bodies(version, payloads)
+            update = {**update, 'payloads': dict(self.payload_index)}
+        for part, value in update.items():
+            if value is None:
+                continue
+            index = PARTS.index(part)
+            target = part_path(self.path, part, version)
+            with open(f"{target}.tmp", 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{target}.tmp", target)
+            if self.part_versions[index]:
+                self._supersede(part_path(self.path, part, self.part_versions[index]))
+            self.part_versions[index] = version
+
+        # Seqlock: readers retry while seq is odd or changes under them
+        seq = struct.unpack_from('<Q', self._control, 8)[0]
+        struct.pack_into('<Q', self._control, 8, seq + 1)
+        CONTROL.pack_into(self._control, 0, MAGIC, seq + 1, version, timestamp, *self.part_versions)
+        struct.pack_into('<Q', self._control, 8, seq + 2)
+        self.version = version
+        self._remove_superseded()
+        return version
+
+    def _write_bodies(self, version, payloads):
+        """Append every variant of ``payloads`` to the bodies file of ``version`` and index them"""
+        previous = {entry[0] for entry in self.payload_index.values()}
+        target = part_path(self.path, 'bodies', version)
+        with open(f"{target}.tmp", 'wb') as f:
+            for key, payload in payloads.items():
+                variants = {}
+                for encoding, body in payload.variants().items():
+                    variants[encoding] = (f.tell(), len(body))
+                    f.write(body)
+                self.payload_index[key] = (version, payload.mimetype, payload.etag, variants)
+        os.replace(f"{target}.tmp", target)
+        live = {entry[0] for entry in self.payload_index.values()}
+        for superseded in sorted(previous - live):
+            self._supersede(part_path(self.path, 'bodies', superseded))
+
+    def _supersede(self, path):
+        self._superseded.append((time.time(), path))
+
+    def _remove_superseded(self):
+        cutoff = time.time() - PART_GRACE_SECONDS
+        while self._superseded and self._superseded[0][0] < cutoff:
+            try:
+                os.remove(self._superseded.pop(0)[1])
+            except FileNotFoundError:
+                pass
+
+
+class SharedSnapshotReader:
+    """Worker side: mirrors the fetcher's snapshots into a TransitData store"""
+
+    def __init__(self, path):
+        self.path = path
+        self.part_versions = [0] * len(PARTS)
+        self.payloads = {}  # key -> CachedPayload over a mapped bodies file
+        self._payload_entries = {}  # key -> its payload index entry
+        self._bodies = {}  # bodies version -> mmap
+        self._control = None
+        self._inode = None
+
+    def _read_control(self):
+        """(version, timestamp, part versions) or None before the fetcher has started"""
+        try:
+            inode = os.stat(self.path).st_ino
+            if inode != self._inode:  # first poll, or the fetcher restarted
+                with open(self.path, 'rb') as f:
+                    self._control = mmap.mmap(f.fileno(), CONTROL.size, access=mmap.ACCESS_READ)
+                self._inode = inode
+                self.part_versions = [0] * len(PARTS)
+                self.payloads, self._payload_entries, self._bodies = {}, {}, {}
+        except (FileNotFoundError, ValueError):
+            return None
+        for _ in range(100):
+            magic, seq, version, timestamp, *part_versions = CONTROL.unpack_from(self._control)
+            if magic != MAGIC:
+                return None
+            if seq % 2 == 0 and struct.unpack_from('<Q', self._control, 8)[0] == seq:
+                return version, timestamp, part_versions
+            time.sleep(0.001)
+        return None
+
+    @staticmethod
+    def _load(path):
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return pickle.loads(mapped)
+
+    def _map_payloads(self, index):
+        """CachedPayloads for a payload index, as views into the mapped bodies files"""
+        payloads, entries, bodies = {}, {}, {}
+        for key, entry in index.items():
+            version, mimetype, etag, variants = entry
+            if version not in bodies:
+                mapped = self._bodies.get(version)
+                if mapped is None:
+                    with open(part_path(self.path, 'bodies', version), 'rb') as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                bodies[version] = mapped
+            if self._payload_entries.get(key) == entry:
+                payloads[key] = self.payloads[key]
+            else:
+                view = memoryview(bodies[version])
+                views = {encoding: view[offset:offset + length] for encoding, (offset, length) in variants.items()}
+                payloads[key] = CachedPayload(views.pop('identity'), mimetype, etag, views)
+            entries[key] = entry
+        # Mappings no payload refers to any more close once the last response using them is done
+        self.payloads, self._payload_entries, self._bodies = payloads, entries, bodies
+        return payloads
+
+    def poll(self, store):
+        """Publish the fetcher's latest snapshot into ``store`` if it is newer; returns True if it was"""
+        control = self._read_control()
+        if control is None:
+            return False
+        version, timestamp, part_versions = control
+        if version <= store.get_version():
+            return False
+
+        update = {}
+        try:
+            for index, part in enumerate(PARTS):
+                if part_versions[index] and part_versions[index] != self.part_versions[index]:
+                    update[part] = self._load(part_path(self.path, part, part_versions[index]))
+            payload_index = update.pop('payloads', None)
+            payloads = self._map_payloads(payload_index) if payload_index is not None else self.payloads
+        except FileNotFoundError:  # already superseded; the next poll picks up the newer one
+            return False
+        store.publish(version=version, timestamp=timestamp, payloads=payloads, **update)
+        self.part_versions = part_versions
+        return True
+
+    def follow(self, store, interval):
+        """Poll from a daemon thread every ``interval`` seconds; the first poll runs inline"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll(store)
+                except Exception as e:
+                    print(f"Error reading shared snapshot: {str(e)}")
+
+        self.poll(store)
+        thread = threading.Thread(target=run, daemon=True, name='snapshot-reader')
+        thread.start()
+        return thread
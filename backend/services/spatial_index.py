@@ -0,0 +1,146 @@
+# backend/services/spatial_index.py
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def haversine_m(lat, lon, lats, lons):
+    """Great-circle distance in meters from one point to arrays of points"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndex:
+    """Uniform lat/lon grid over a set of points.
+
+    Radius queries only compute distances for points in the grid cells that
+    overlap the search circle; the distance math itself is vectorized.
+    """
+
+    def __init__(self, ids, lats, lons, cell_size=0.01):
+        self.ids = ids
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_size = cell_size
+
+        # Sort points by cell so each cell is one contiguous slice of ``order``
+        rows = np.floor(self.lats / cell_size).astype(np.int64)
+        cols = np.floor(self.lons / cell_size).astype(np.int64)
+        self.order = np.lexsort((cols, rows))
+        self.cells = {}
+        if len(self.order):
+            keys = np.column_stack((rows[self.order], cols[self.order]))
+            starts = np.concatenate(([0], np.flatnonzero(np.any(np.diff(keys, axis=0), axis=1)) + 1))
+            ends = np.concatenate((starts[1:], [len(self.order)]))
+            for (row, col), start, end in zip(keys[starts].tolist(), starts.tolist(), ends.tolist()):
+                self.cells[(row, col)] = (start, end)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _candidates(self, lat, lon, radius_m):
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+        row0, row1 = math.floor((lat - dlat) / self.cell_size), math.floor((lat + dlat) / self.cell_size)
+        col0, col1 = math.floor((lon - dlon) / self.cell_size), math.floor((lon + dlon) / self.cell_size)
+
+        # A search area covering more cells than exist is cheaper as a full scan
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.cells):
+            return np.arange(len(self.lats))
+
+        slices = [self.order[start:end]
+                  for row in range(row0, row1 + 1)
+                  for col in range(col0, col1 + 1)
+                  for start, end in [self.cells.get((row, col), (0, 0))]
+                  if end > start]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def nearby(self, lat, lon, radius_m, limit=None):
+        """(index, distance_m) pairs within ``radius_m``, nearest first"""
+        candidates = self._candidates(lat, lon, radius_m)
+        if not len(candidates):
+            return []
+        distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= radius_m
+        candidates, distances = candidates[inside], distances[inside]
+        nearest = np.argsort(distances, kind='stable')[:limit]
+        return list(zip(candidates[nearest].tolist(), distances[nearest].tolist()))
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Indexes of points inside a bounding box"""
+        mask = ((self.lons >= min_lon) & (self.lons <= max_lon) &
+                (self.lats >= min_lat) & (self.lats <= max_lat))
+        return np.flatnonzero(mask).tolist()
+
+
+def parse_bbox(value):
+    """Parse 'min_lon,min_lat,max_lon,max_lat' into floats, raising ValueError if malformed"""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+        raise ValueError(f"Invalid bbox: {value}")
+    return parts
+
+
+def build_vehicle_index(vehicle_features):
+    """Index a snapshot's vehicle features (id -> GeoJSON Point feature)"""
+    ids, lats, lons = [], [], []
+    for feature_id, feature in vehicle_features.items():
+        lon, lat = feature['geometry']['coordinates']
+        ids.append(feature_id)
+        lats.append(lat)
+        lons.append(lon)
+    return SpatialIndex(ids, lats, lons)
+
+
+class StopIndex:
+    """Spatial index over the GTFS stops with coordinates (a StopTable, or None)"""
+
+    def __init__(self, stops):
+        self.stops = stops
+        self.rows = np.flatnonzero(stops.valid) if stops is not None else np.empty(0, dtype=np.int64)
+        lats = stops.lats[self.rows] if stops is not None else np.empty(0)
+        lons = stops.lons[self.rows] if stops is not None else np.empty(0)
+        self.index = SpatialIndex(self.rows, lats, lons)
+        self.is_station = stops.parents[self.rows] < 0 if stops is not None else np.empty(0, dtype=bool)
+
+    def record(self, i, distance=None):
+        """Client record of the i-th indexed stop; names and ids are decoded here"""
+        stops = self.stops
+        row = int(self.rows[i])
+        parent = int(stops.parents[row])
+        record = {
+            'stop_id': stops.stop_id(row),
+            'stop_name': stops.name(row),
+            'parent_station': stops.stop_id(parent) if parent >= 0 else None,
+            'lat': float(self.index.lats[i]),
+            'lon': float(self.index.lons[i])
+        }
+        if distance is not None:
+            record['distance_m'] = round(distance, 1)
+        return record
+
+    def feature(self, i):
+        record = self.record(i)
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [record['lon'], record['lat']]},
+            'properties': {'stop_id': record['stop_id'], 'stop_name': record['stop_name']}
+        }
+
+    def nearby(self, lat, lon, radius_m, limit=10, stations_only=True):
+        """Stops within ``radius_m``, nearest first; platforms are skipped unless requested"""
+        matches = self.index.nearby(lat, lon, radius_m)
+        if stations_only:
+            matches = [(i, distance) for i, distance in matches if self.is_station[i]]
+        return [self.record(i, distance) for i, distance in matches[:limit]]
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat, stations_only=False):
+        indexes = self.index.within_bbox(min_lon, min_lat, max_lon, max_lat)
+        if stations_only:
+            indexes = [i for i in indexes if self.is_station[i]]
+        return indexes
@@ -0,0 +1,35 @@
+# backend/services/static_layers.py
+import threading
+from services.response_cache import CachedPayload
+
+
+class StaticLayerCache:
+    """Builds each static map layer once and keeps it as pre-compressed bytes.
+
+    The layers only change with a new GTFS release, so after the first build
+    every request is served straight from memory.
+    """
+
+    def __init__(self, builders):
+        self.builders = builders
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """CachedPayload for a layer, building it on first use"""
+        payload = self._payloads.get(name)
+        if payload is None:
+            with self._lock:
+                payload = self._payloads.get(name)
+                if payload is None:
+                    payload = CachedPayload.from_json(self.builders[name]()).precompress()
+                    self._payloads[name] = payload
+        return payload
+
+    def warm(self):
+        """Build every layer up front, e.g. at startup"""
+        for name in self.builders:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error building static layer {name}: {str(e)}")
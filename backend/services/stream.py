@@ -0,0 +1,208 @@
+# backend/services/stream.py
+import bisect
+import queue
+import threading
+from collections import deque
+from config.config import GEOJSON_DELTA_HISTORY, STREAM_QUEUE_SIZE, STREAM_KEEPALIVE, STREAM_MAX_CLIENTS
+from services.response_cache import serialize_json
+
+# Queued in place of events when a client fell behind and must start over
+RESYNC = object()
+
+
+def format_event(event, data, event_id=None):
+    """Encode one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {serialize_json(data).decode('utf-8')}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def alerts_by_id(alert_data):
+    """Map alert id -> alert for either the protobuf-derived or the JSON alert format"""
+    if not alert_data:
+        return {}
+    items = alert_data.get('alerts') or alert_data.get('entity') or []
+    return {item.get('id'): item for item in items}
+
+
+def diff_alerts(previous, current):
+    """Alert changes per system between two snapshots' service_alerts dicts"""
+    changes = {}
+    for system, data in current.items():
+        if previous.get(system) is data:
+            continue
+        old, new = alerts_by_id(previous.get(system)), alerts_by_id(data)
+        added = [alert for alert_id, alert in new.items() if alert_id not in old]
+        changed = [alert for alert_id, alert in new.items() if alert_id in old and old[alert_id] != alert]
+        removed = [alert_id for alert_id in old if alert_id not in new]
+        if added or changed or removed:
+            changes[system] = {'added': added, 'changed': changed, 'removed': removed}
+    return changes
+
+
+class StreamClient:
+    """One connected stream consumer with a bounded queue of encoded events"""
+
+    def __init__(self, maxsize=STREAM_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+
+    def push(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            # Slow consumer: drop everything pending and make it resync from
+            # the latest snapshot instead of replaying a stale backlog
+            self.resync()
+
+    def resync(self):
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.queue.put_nowait(RESYNC)
+
+
+class SnapshotBroadcaster:
+    """Fans each published snapshot out to all stream clients.
+
+    Change events are encoded once per publish and the same bytes are queued
+    for every client, so the number of listeners does not add serialization
+    or upstream work. The alerts as of each recent alert change are kept so
+    a reconnecting client can be sent what changed while it was away.
+
+    Every open stream occupies a server thread, so at most ``max_clients``
+    are connected at once; ``connect`` returns None past that.
+    """
+
+    def __init__(self, store, queue_size=STREAM_QUEUE_SIZE, alert_history=GEOJSON_DELTA_HISTORY,
+                 max_clients=STREAM_MAX_CLIENTS):
+        self.store = store
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._full_event = (None, None)  # (version, encoded snapshot event)
+        snapshot = store.get_snapshot()
+        # (version, service_alerts) from which those alerts held, oldest first
+        self._alert_states = deque([(snapshot.version, snapshot.service_alerts)], maxlen=alert_history)
+        store.add_listener(self.on_publish)
+
+    def client_count(self):
+        return len(self._clients)
+
+    def on_publish(self, previous, snapshot, vehicle_delta):
+        """Encode the changes in ``snapshot`` once and queue them for every client"""
+        alert_changes = diff_alerts(previous.service_alerts, snapshot.service_alerts)
+        with self._lock:
+            if alert_changes:
+                self._alert_states.append((snapshot.version, snapshot.service_alerts))
+            clients = list(self._clients)
+        if not clients:
+            return
+
+        payload = b''
+        if vehicle_delta is not None and (vehicle_delta.added or vehicle_delta.changed or vehicle_delta.removed):
+            payload += format_event('vehicles', {
+                'version': snapshot.version,
+                'since': previous.version,
+                'added': vehicle_delta.added,
+                'changed': vehicle_delta.changed,
+                'removed': vehicle_delta.removed
+            }, snapshot.version)
+
+        if alert_changes:
+            payload += format_event('alerts', {
+                'version': snapshot.version,
+                'systems': alert_changes
+            }, snapshot.version)
+
+        if payload:
+            for client in clients:
+                client.push(payload)
+
+    def snapshot_event(self):
+        """Full-state event for new or resyncing clients, encoded once per version"""
+        snapshot = self.store.get_snapshot()
+        version, payload = self._full_event
+        if version != snapshot.version:
+            payload = format_event('snapshot', {
+                'version': snapshot.version,
+                'vehicles': snapshot.subway_geojson,
+                'alerts': snapshot.service_alerts
+            }, snapshot.version)
+            self._full_event = (snapshot.version, payload)
+        return payload
+
+    def alerts_at(self, version):
+        """The service alerts as of ``version``, or None if older than the kept history"""
+        with self._lock:
+            states = list(self._alert_states)
+        position = bisect.bisect_right([state_version for state_version, _ in states], version)
+        return states[position - 1][1] if position else None
+
+    def catch_up_event(self, last_event_id):
+        """Vehicle and alert changes since a reconnecting client's Last-Event-ID, or the full snapshot"""
+        try:
+            since = int(last_event_id)
+        except (TypeError, ValueError):
+            return self.snapshot_event()
+
+        snapshot = self.store.get_snapshot()
+        delta = self.store.get_geojson_delta(since)
+        alerts = self.alerts_at(since)
+        if delta is None or alerts is None:
+            return self.snapshot_event()
+
+        payload = b''
+        if delta['added'] or delta['changed'] or delta['removed']:
+            payload += format_event('vehicles', {
+                'version': delta['version'],
+                'since': since,
+                'added': delta['added'],
+                'changed': delta['changed'],
+                'removed': delta['removed']
+            }, delta['version'])
+        alert_changes = diff_alerts(alerts, snapshot.service_alerts)
+        if alert_changes:
+            payload += format_event('alerts', {
+                'version': snapshot.version,
+                'systems': alert_changes
+            }, snapshot.version)
+        return payload
+
+    def connect(self):
+        """Register a new client, or return None if ``max_clients`` are already connected"""
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return None
+            client = StreamClient(self.queue_size)
+            self._clients.add(client)
+        return client
+
+    def disconnect(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def stream(self, client, last_event_id=None):
+        """Generator of encoded events for a connected client until it disconnects"""
+        try:
+            if not self.store.get_snapshot().is_empty():
+                yield self.catch_up_event(last_event_id)
+
+            while True:
+                try:
+                    payload = client.queue.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield b': keepalive\n\n'
+                    continue
+
+                if payload is RESYNC:
+                    yield self.snapshot_event()
+                else:
+                    yield payload
+        finally:
+            self.disconnect(client)
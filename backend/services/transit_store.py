@@ -0,0 +1,30 @@
+# backend/services/transit_store.py
+"""The realtime store wired to the service-layer indexes.
+
+models/transit.py defines the versioned store without depending on the
+services; this module supplies the index builders it applies to each
+publish and holds the store shared by the refresher and the blueprints.
+"""
+from models.transit import SnapshotIndexing, TransitData
+from services.alerts import AlertIndex
+from services.arrivals import ArrivalIndex
+from services.elevators import ElevatorIndex
+from services.response_cache import CachedPayload
+from services.spatial_index import build_vehicle_index
+
+INDEXING = SnapshotIndexing(
+    vehicles=build_vehicle_index,
+    alerts=AlertIndex,
+    elevators=ElevatorIndex,
+    arrivals=ArrivalIndex,
+    payload=CachedPayload.from_json
+)
+
+
+def new_store(version=0):
+    """An empty TransitData using the service indexes"""
+    return TransitData(INDEXING, version=version)
+
+
+# Shared store: the refresher started by create_app publishes, the blueprints read
+transit_data = new_store()
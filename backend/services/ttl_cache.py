@@ -0,0 +1,107 @@
+# backend/services/ttl_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """A load in progress that concurrent callers for the same key wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry and single-flight loading.
+
+    ``get(key, ttl, load)`` returns the cached value while it is fresh and
+    otherwise calls ``load()``. Concurrent misses for the same key wait for
+    the one call in flight and share its result or exception, so a burst of
+    identical requests costs one upstream fetch. Failed loads are not cached.
+    ``record(key, result)`` is called with 'hit', 'miss' or 'coalesced' for
+    every lookup.
+    """
+
+    def __init__(self, maxsize, record=None):
+        self.maxsize = maxsize
+        self.record = record
+        self._entries = OrderedDict()  # key -> (expires at, value), least recently used first
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, ttl, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result = 'hit'
+            else:
+                flight = self._inflight.get(key)
+                if flight is None:
+                    flight = self._inflight[key] = _Flight()
+                    self.misses += 1
+                    result = 'miss'
+                else:
+                    self.coalesced += 1
+                    result = 'coalesced'
+        if self.record:
+            self.record(key, result)
+
+        if result == 'hit':
+            return entry[1]
+        if result == 'coalesced':
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = load()
+            self.put(key, flight.value, ttl)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def peek(self, key):
+        """The cached value if it is still fresh, else None; not counted as a lookup"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def put(self, key, value, ttl):
+        """Store ``value`` for ``ttl`` seconds, evicting the least recently used entries past maxsize"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,281 @@
+# backend/services/vector_tiles.py
+"""Mapbox Vector Tile encoding for the map layers.
+
+The MVT schema is small enough to write directly in protobuf wire format,
+so tiles are encoded here without an extra dependency. A tile message is just
+a sequence of layer messages, which lets the static layers (lines, stops)
+and the per-snapshot vehicle layer be encoded and cached separately and
+concatenated per request.
+"""
+import math
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+from services.response_cache import CachedPayload
+
+EXTENT = 4096
+BUFFER = 64  # tile units drawn outside the tile edge so features join cleanly
+
+POINT = 1
+LINESTRING = 2
+
+MAX_LATITUDE = 85.0511287798
+
+
+def _varint(value):
+    value &= 0xFFFFFFFFFFFFFFFF
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _bytes_field(field, b''.join(_varint(value) for value in values))
+
+
+def _value(value):
+    """Encode a Layer.Value message"""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(4, 0) + _varint(value)
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode('utf-8'))
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def mercator(lons, lats):
+    """Project lon/lat arrays to Web Mercator coordinates normalized to [0, 1]"""
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    x = (np.asarray(lons, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lats)) + 1.0 / np.cos(np.radians(lats))) / math.pi) / 2.0
+    return x, y
+
+
+def _clip_segment(x0, y0, x1, y1, low, high):
+    """Liang-Barsky clip of one segment to the square [low, high]; None if outside"""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x1 - x0, y1 - y0
+    for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+    return (x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy)
+
+
+def clip_line(xs, ys, low, high):
+    """Split a line in tile coordinates into the runs that fall inside the clip square"""
+    runs, current = [], []
+    for x0, y0, x1, y1 in zip(xs[:-1], ys[:-1], xs[1:], ys[1:]):
+        clipped = _clip_segment(x0, y0, x1, y1, low, high)
+        if clipped is None:
+            if current:
+                runs.append(current)
+                current = []
+            continue
+        cx0, cy0, cx1, cy1 = clipped
+        if not current:
+            current = [(cx0, cy0)]
+        current.append((cx1, cy1))
+        if (cx1, cy1) != (x1, y1):  # left the square mid-segment
+            runs.append(current)
+            current = []
+    if current:
+        runs.append(current)
+    return runs
+
+
+def _line_geometry(runs):
+    geometry, cursor_x, cursor_y = [], 0, 0
+    for run in runs:
+        points = []
+        for x, y in run:
+            point = (int(round(x)), int(round(y)))
+            if not points or point != points[-1]:
+                points.append(point)
+        if len(points) < 2:
+            continue
+        for index, (x, y) in enumerate(points):
+            if index == 0:
+                geometry.append(_command(1, 1))
+            elif index == 1:
+                geometry.append(_command(2, len(points) - 1))
+            geometry.extend((_zigzag(x - cursor_x), _zigzag(y - cursor_y)))
+            cursor_x, cursor_y = x, y
+    return geometry
+
+
+class TileLayerSource:
+    """GeoJSON features of one layer, pre-projected for repeated tile encoding"""
+
+    def __init__(self, name, features):
+        self.name = name
+        self.features = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            coords = geometry.get('coordinates')
+            if geometry.get('type') == 'Point' and coords:
+                coords = [coords]
+                kind = POINT
+            elif geometry.get('type') == 'LineString' and coords and len(coords) >= 2:
+                kind = LINESTRING
+            else:
+                continue
+            points = np.asarray(coords, dtype=np.float64)
+            x, y = mercator(points[:, 0], points[:, 1])
+            properties = {key: value for key, value in (feature.get('properties') or {}).items()
+                          if value is not None}
+            self.features.append((kind, x, y, (x.min(), y.min(), x.max(), y.max()), properties))
+
+    def encode(self, z, tile_x, tile_y, extent=EXTENT, buffer=BUFFER):
+        """Encoded Layer message for one tile, or b'' if nothing falls inside it"""
+        scale = (2 ** z) * extent
+        margin = buffer / scale
+        min_x, min_y = tile_x / 2 ** z - margin, tile_y / 2 ** z - margin
+        max_x, max_y = (tile_x + 1) / 2 ** z + margin, (tile_y + 1) / 2 ** z + margin
+
+        keys, values = {}, {}
+        encoded = []
+        for kind, x, y, (fx0, fy0, fx1, fy1), properties in self.features:
+            if fx1 < min_x or fx0 > max_x or fy1 < min_y or fy0 > max_y:
+                continue
+            xs = (x * scale - tile_x * extent).tolist()
+            ys = (y * scale - tile_y * extent).tolist()
+            if kind == POINT:
+                geometry = [_command(1, 1), _zigzag(int(round(xs[0]))), _zigzag(int(round(ys[0])))]
+            else:
+                geometry = _line_geometry(clip_line(xs, ys, -buffer, extent + buffer))
+                if not geometry:
+                    continue
+
+            tags = []
+            for key, value in properties.items():
+                tags.append(keys.setdefault(key, len(keys)))
+                tags.append(values.setdefault((type(value), value), len(values)))
+            encoded.append(_bytes_field(2, _packed(2, tags) + _key(3, 0) + _varint(kind) + _packed(4, geometry)))
+
+        if not encoded:
+            return b''
+        layer = (_key(15, 0) + _varint(2) +
+                 _bytes_field(1, self.name.encode('utf-8')) +
+                 b''.join(encoded) +
+                 b''.join(_bytes_field(3, key.encode('utf-8')) for key in keys) +
+                 b''.join(_bytes_field(4, _value(value)) for _, value in values) +
+                 _key(5, 0) + _varint(extent))
+        return _bytes_field(3, layer)
+
+
+class LRUCache:
+    """Small thread-safe LRU used for encoded tiles"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+class VectorTileService:
+    """Builds /tiles/{z}/{x}/{y} responses from the static layers and the current snapshot.
+
+    Static layer tiles are cached in a bounded LRU keyed by (z, x, y); the
+    vehicle layer is re-encoded per snapshot version, and finished tiles are
+    cached per (version, z, x, y) as CachedPayloads so ETag and compression
+    are handled once.
+    """
+
+    def __init__(self, store, static_layers, level_for_zoom, min_zoom, static_cache_size, tile_cache_size):
+        # static_layers: name -> (builder(level) -> GeoJSON, min zoom)
+        self.store = store
+        self.static_layers = static_layers
+        self.level_for_zoom = level_for_zoom
+        self.min_zoom = min_zoom
+        self.static_tiles = LRUCache(static_cache_size)
+        self.tiles = LRUCache(tile_cache_size)
+        self._sources = {}
+        self._vehicles = (None, None)  # (snapshot version, TileLayerSource)
+        self._lock = threading.Lock()
+
+    def _source(self, name, level):
+        key = (name, level)
+        source = self._sources.get(key)
+        if source is None:
+            with self._lock:
+                source = self._sources.get(key)
+                if source is None:
+                    builder, _ = self.static_layers[name]
+                    source = TileLayerSource(name, builder(level).get('features', []))
+                    self._sources[key] = source
+        return source
+
+    def _static_tile(self, z, x, y):
+        encoded = self.static_tiles.get((z, x, y))
+        if encoded is None:
+            level = self.level_for_zoom(z)
+            encoded = b''.join(self._source(name, level).encode(z, x, y)
+                               for name, (_, min_zoom) in self.static_layers.items() if z >= min_zoom)
+            self.static_tiles.put((z, x, y), encoded)
+        return encoded
+
+    def _vehicle_source(self, snapshot):
+        version, source = self._vehicles
+        if version != snapshot.version:
+            source = TileLayerSource('vehicles', (snapshot.subway_geojson or {}).get('features', []))
+            self._vehicles = (snapshot.version, source)
+        return source
+
+    def tile(self, z, x, y):
+        """CachedPayload for one tile at the current snapshot version"""
+        snapshot = self.store.get_snapshot()
+        key = (snapshot.version, z, x, y)
+        payload = self.tiles.get(key)
+        if payload is None:
+            encoded = self._static_tile(z, x, y)
+            if z >= self.min_zoom and not snapshot.is_empty():
+                encoded += self._vehicle_source(snapshot).encode(z, x, y)
+            payload = CachedPayload(encoded, mimetype='application/vnd.mapbox-vector-tile')
+            self.tiles.put(key, payload)
+        return payload
@@ -0,0 +1,32 @@
+# backend/tests/conftest.py
+import pytest
+import app as app_module
+from routes import transit_routes
+from services.transit_store import new_store
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """One app for the session (warming the static layers takes a while) that polls nothing.
+
+    Its stream broadcaster and archive follow a store of their own, and the
+    archive is kept under a temporary directory.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(app_module, 'transit_data', new_store())
+        patch.setattr(transit_routes, 'transit_data', app_module.transit_data)
+        patch.setattr(transit_routes, 'ARCHIVE_DIR', str(tmp_path_factory.mktemp('archive')))
+        return app_module.create_app(refresh_mode='off')
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """A fresh snapshot store behind the read endpoints"""
+    store = new_store()
+    monkeypatch.setattr(transit_routes, 'transit_data', store)
+    return store
+
+
+@pytest.fixture
+def client(app, store):
+    return app.test_client()
@@ -0,0 +1,79 @@
+# backend/tests/fakes.py
+"""Test doubles and sample data shared by the test modules"""
+from google.transit import gtfs_realtime_pb2
+
+
+class StopLoop(BaseException):
+    """Ends a ``while True`` service loop from a test; not caught by its ``except Exception``"""
+
+
+class FakeClock:
+    """Stands in for the ``time`` module: ``sleep`` advances ``time()`` instantly.
+
+    Raises StopLoop once the clock passes ``until`` or after ``max_calls``
+    sleeps, so a loop that stops sleeping still ends.
+    """
+
+    def __init__(self, start=1_000_000.0, until=float('inf'), max_calls=10_000):
+        self.now = start
+        self.until = until
+        self.max_calls = max_calls
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if len(self.sleeps) >= self.max_calls:
+            raise StopLoop(f"{len(self.sleeps)} sleeps by t={self.now}")
+        self.now += seconds
+        if self.now >= self.until:
+            raise StopLoop()
+
+
+def feature(vehicle_id, lon=-73.99, lat=40.73):
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'id': vehicle_id}}
+
+
+def collection(*features):
+    return {'type': 'FeatureCollection', 'features': list(features)}
+
+
+def trip_feed(rnd, routes, stops, trips=20, timestamp=1_700_000_000):
+    """A GTFS-RT FeedMessage of random trips on ``routes`` calling at ``stops``.
+
+    Each trip has a trip update whose stop times carry an arrival, a
+    departure or both; most also have a vehicle position.
+    """
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = '2.0'
+    feed.header.timestamp = timestamp
+    for i in range(trips):
+        route_id = rnd.choice(routes)
+        trip_id = f"{route_id}-{i:03d}"
+        entity = feed.entity.add()
+        entity.id = f"{trip_id}-tu"
+        trip_update = entity.trip_update
+        trip_update.trip.trip_id = trip_id
+        trip_update.trip.route_id = route_id
+        trip_update.trip.start_date = '20231114'
+        time = timestamp + rnd.randint(-300, 600)
+        for stop_id in rnd.sample(stops, rnd.randint(1, len(stops))):
+            stop_time_update = trip_update.stop_time_update.add()
+            stop_time_update.stop_id = stop_id
+            time += rnd.randint(30, 180)
+            kind = rnd.choice(('arrival', 'departure', 'both'))
+            if kind != 'departure':
+                stop_time_update.arrival.time = time
+            if kind != 'arrival':
+                stop_time_update.departure.time = time + 20
+        if rnd.random() < 0.8:
+            entity = feed.entity.add()
+            entity.id = f"{trip_id}-vp"
+            entity.vehicle.trip.trip_id = trip_id
+            entity.vehicle.trip.route_id = route_id
+            entity.vehicle.stop_id = trip_update.stop_time_update[0].stop_id
+            entity.vehicle.timestamp = timestamp
+    return feed
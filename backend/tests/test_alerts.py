@@ -0,0 +1,91 @@
+# backend/tests/test_alerts.py
+import random
+from data.gtfs_registry import gtfs
+from services import mta_service as mta_service_module
+from services.alerts import AlertIndex
+from services.mta_service import MTAService
+
+T = 1_700_000_000
+ROUTES = ['A', 'C', 'E', 'F', 'G', 'L']
+STOPS = ['127', '127N', '127S', 'A27', 'A27N', 'L06S']
+
+
+def random_alert(i, rnd):
+    entities = [{'route_id': rnd.choice(ROUTES)} if rnd.random() < 0.5 else {'stop_id': rnd.choice(STOPS)}
+                for _ in range(rnd.randint(1, 3))]
+    periods = []
+    for _ in range(rnd.choice((0, 1, 1, 2, 3))):
+        # Open ends, zero bounds and inverted periods all come up in the feed
+        start = rnd.choice((None, 0, T + rnd.randrange(0, 3600, 300)))
+        end = rnd.choice((None, '', T + rnd.randrange(0, 3600, 300)))
+        periods.append({'start': start, 'end': end})
+    return {'id': f"alert-{i}", 'alert': {'informed_entity': entities, 'active_period': periods}}
+
+
+def brute_force(alerts, routes, stops, active_at):
+    def active(alert):
+        periods = alert['alert']['active_period']
+        if not periods:
+            return True
+        return any((not period['start'] or period['start'] <= active_at) and
+                   (not period['end'] or active_at < period['end'])
+                   for period in periods)
+
+    def informs(alert, keys, field):
+        values = [entity[field] for entity in alert['alert']['informed_entity'] if field in entity]
+        if field == 'stop_id':
+            values += [gtfs.parent_station(value) for value in values]
+        return any(value in keys for value in values)
+
+    return [alert for alert in alerts
+            if (not routes or informs(alert, routes, 'route_id')) and
+            (not stops or informs(alert, stops, 'stop_id')) and
+            (active_at is None or active(alert))]
+
+
+def test_sweep_matches_checking_every_period():
+    rnd = random.Random(19)
+    for _ in range(20):
+        alerts = [random_alert(i, rnd) for i in range(rnd.randint(0, 40))]
+        index = AlertIndex({'entity': alerts})
+        # Probe every boundary, just either side of it and outside the range
+        probes = {T - 1, T + 4000, None}
+        for boundary in index.boundaries:
+            probes.update((boundary - 1, boundary, boundary + 1))
+        for active_at in probes:
+            routes = set(rnd.sample(ROUTES, rnd.randint(0, 2)))
+            stops = set(rnd.sample(STOPS, rnd.randint(0, 2)))
+            assert index.query(routes, stops, active_at) == brute_force(alerts, routes, stops, active_at)
+            assert index.query(active_at=active_at) == brute_force(alerts, None, None, active_at)
+
+
+def test_on_demand_alerts_are_indexed_once_per_fetched_document(app, client, monkeypatch):
+    mta_service = MTAService()
+    monkeypatch.setattr(app.extensions['transit'], 'mta_service', mta_service)
+    fetches, builds = [], []
+
+    def fetch(system):
+        fetches.append(system)
+        return {'entity': [{'id': 'b1', 'alert': {'informed_entity': [{'route_id': 'M15'}]}},
+                           {'id': 'b2', 'alert': {'informed_entity': [{'route_id': 'B44'}]}}]}
+
+    def build(data):
+        builds.append(data)
+        return AlertIndex(data)
+
+    monkeypatch.setattr(mta_service, '_fetch_service_alerts', fetch)
+    monkeypatch.setattr(mta_service_module, 'AlertIndex', build)
+
+    unfiltered = [client.get('/api/alerts/bus') for _ in range(3)]
+    filtered = client.get('/api/alerts/bus?route=M15').get_json()
+    assert client.get('/api/alerts/bus?route=B44&active_at=now').get_json()['entity'][0]['id'] == 'b2'
+    assert [alert['id'] for alert in filtered['entity']] == ['b1']
+    assert len({response.headers['ETag'] for response in unfiltered}) == 1
+    assert (len(fetches), len(builds)) == (1, 1)
+
+    # A newly fetched document is indexed and serialized again, once
+    mta_service.cache.put(('alerts', 'bus'), {'entity': []}, 60)
+    refetched = [client.get('/api/alerts/bus') for _ in range(2)]
+    assert refetched[0].get_json() == {'entity': []}
+    assert refetched[0].headers['ETag'] == refetched[1].headers['ETag'] != unfiltered[0].headers['ETag']
+    assert (len(fetches), len(builds)) == (1, 2)
@@ -0,0 +1,52 @@
+# backend/tests/test_archive.py
+import random
+from services.archive import FIELDS, SnapshotArchive, decode_record
+
+T = 1_700_000_000
+
+
+def vehicle(vehicle_id, rnd):
+    properties = {'id': vehicle_id, 'route_id': vehicle_id[0], 'trip_id': f"{vehicle_id}-trip",
+                  'status': rnd.choice(('0', '1', '2')), 'stop_id': rnd.choice(('101N', '127S', None)),
+                  'timestamp': T + rnd.randint(0, 600), 'estimated': rnd.random() < 0.5, 'stale': False}
+    assert set(properties) == {'id', *FIELDS}
+    # Coordinates on the archive's 1e-5 degree grid survive the round trip exactly
+    coordinates = [rnd.randint(-7405000, -7390000) / 100000, rnd.randint(4060000, 4090000) / 100000]
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': coordinates}, 'properties': properties}
+
+
+def test_every_frame_reads_back_across_sealed_segments(tmp_path):
+    rnd = random.Random(18)
+    archive = SnapshotArchive(str(tmp_path), interval=30, segment_seconds=300, retention_seconds=10 ** 10)
+    fleet, frames = {}, []
+    for step in range(40):
+        for vehicle_id in rnd.sample(sorted(fleet), min(len(fleet), 3)):
+            del fleet[vehicle_id]
+        for vehicle_id in rnd.sample(['A1', 'A2', 'C1', 'E1', 'F1', 'F2', 'G1', 'L1', 'Q1', 'R1'], 4):
+            if vehicle_id not in fleet or rnd.random() < 0.5:
+                fleet[vehicle_id] = vehicle(vehicle_id, rnd)
+        archive.append(T + step * 30, step + 1, list(fleet.values()))
+        frames.append((T + step * 30, step + 1, dict(fleet)))
+
+    sealed = [segment for segment in archive.segments() if segment[1] is not None]
+    assert len(sealed) == 3 and len(archive.segments()) == 4
+    assert archive.bounds() == (T, T + 39 * 30)
+
+    for timestamp, version, expected in frames:
+        at, at_version, records = archive.state_at(timestamp + 10)
+        assert (at, at_version) == (timestamp, version)
+        assert {vehicle_id: decode_record(record) for vehicle_id, record in records.items()} == expected
+    assert archive.state_at(T - 1) is None
+
+    # Changes over a range that spans segment boundaries replay to each frame
+    start, end = frames[5][0], frames[33][0]
+    initial, changes = archive.changes(start, end)
+    state = dict(initial[2])
+    for (timestamp, version, changed, removed), (expected_time, expected_version, expected) in \
+            zip(changes, frames[6:34]):
+        for vehicle_id in removed:
+            del state[vehicle_id]
+        state.update((record[0], record) for record in changed)
+        assert (timestamp, version) == (expected_time, expected_version)
+        assert {vehicle_id: decode_record(record) for vehicle_id, record in state.items()} == expected
+    assert len(changes) == 28
@@ -0,0 +1,44 @@
+# backend/tests/test_arrivals.py
+import random
+import pytest
+from data.gtfs_registry import gtfs
+from services.arrivals import ArrivalIndex
+from services.mta_service import MTAService
+from fakes import trip_feed
+
+T = 1_700_000_000
+STOPS = ['127N', '127S', 'A27N', 'A27S', 'L06N', 'R16S', '902N']
+
+
+def test_upcoming_matches_a_sorted_scan_of_the_trip_updates():
+    rnd = random.Random(9)
+    service = MTAService()
+    feeds = [trip_feed(rnd, ['1', '2', '3'], STOPS, timestamp=T),
+             trip_feed(rnd, ['A', 'C', 'E'], STOPS, timestamp=T)]
+    indexes, entities = [], []
+    for feed in feeds:
+        rows = []
+        entities += service._parse_subway_feed(feed, rows)['entities']
+        indexes.append(ArrivalIndex.build(rows, gtfs.parent_station))
+    index = ArrivalIndex.merge(indexes)
+
+    def scan(stop_id, now, limit):
+        matches = [(arrival or departure, entity.route_id, entity.trip_id, platform_id)
+                   for entity in entities if entity.type == 'trip_update'
+                   for platform_id, arrival, departure in entity.stop_time_updates
+                   if stop_id in (platform_id, gtfs.parent_station(platform_id))]
+        return sorted(match for match in matches if match[0] >= now)[:limit]
+
+    for stop_id in STOPS + ['127', 'A27', 'L06', '999N']:
+        for now in range(T - 100, T + 3000, 97):
+            limit = rnd.randint(1, 12)
+            assert index.upcoming(stop_id, now, limit) == scan(stop_id, now, limit)
+    assert index.upcoming('127', T) and len(index.upcoming('127', T - 1000, 3)) == 3
+
+
+@pytest.mark.parametrize('limit', ['0', '-2', 'x'])
+def test_arrivals_limit_must_be_positive(client, store, limit):
+    store.publish(subway_data={'header': {}, 'entities': []})
+    response = client.get(f"/api/stops/127/arrivals?limit={limit}")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
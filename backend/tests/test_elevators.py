@@ -0,0 +1,100 @@
+# backend/tests/test_elevators.py
+import xml.etree.ElementTree as ET
+from services import mta_service as mta_service_module
+from services.arrivals import ArrivalIndex
+from services.elevators import ElevatorIndex
+from services.mta_service import MTAService
+
+# The NYCOutages feed: each <outage> has an <equipment> id child of its own
+OUTAGES = '''<?xml version="1.0" encoding="utf-8"?>
+<NYCOutages>
+  <outage>
+    <station>Times Sq-42 St</station><borough>MN</borough><trainno>N/Q/R/W/S/1/2/3/7</trainno>
+    <equipment>EL236</equipment><equipmenttype>EL</equipmenttype>
+    <serving>Mezzanine to 1/2/3 platform</serving><ADA>Y</ADA>
+    <outagedate>10/18/2026 08:00:00 AM</outagedate><reason>Repair</reason>
+  </outage>
+  <outage>
+    <station>14 St</station><trainno>A/C/E</trainno><equipment>ES101</equipment>
+    <equipmenttype>ES</equipmenttype><serving>Street to mezzanine &amp; platform</serving>
+  </outage>
+  <outage>
+    <station>Grand Central-42 St / Times Sq-42 St</station><trainno>S</trainno>
+    <equipment>EL300</equipment><serving>Café entrance</serving>
+  </outage>
+  <outage><station>Nowhere Av</station><equipment>EL999</equipment></outage>
+</NYCOutages>
+'''.encode('utf-8')
+
+# The equipment list format: one <equipment> record per element
+EQUIPMENT = b'''<equipments>
+  <equipment><station>23 St</station><equipmentno>EL118</equipmentno><isactive>Y</isactive></equipment>
+  <equipment><station>Rector St</station><equipmentno>ES077</equipmentno><isactive>N</isactive></equipment>
+</equipments>'''
+
+
+def tree_parse(document):
+    """Reference: every record as its child tags, from the fully built tree"""
+    root = ET.fromstring(document)
+    return [{child.tag: child.text for child in record} for record in root if len(record)]
+
+
+def test_streaming_parse_matches_the_full_tree():
+    service = MTAService()
+    for document in (OUTAGES, EQUIPMENT):
+        parsed = service._parse_elevator_xml(document)
+        assert parsed == {'equipments': tree_parse(document)}
+        assert parsed == service._parse_elevator_xml(document.decode('utf-8'))
+
+    outages = service._parse_elevator_xml(OUTAGES)['equipments']
+    assert [outage['equipment'] for outage in outages] == ['EL236', 'ES101', 'EL300', 'EL999']
+    assert outages[1]['serving'] == 'Street to mezzanine & platform'
+    assert outages[2]['serving'] == 'Café entrance'
+    assert service._parse_elevator_xml(b'<NYCOutages><outage><station>')['raw_xml'].startswith('<NYCOutages>')
+
+
+def test_outages_are_joined_to_stations():
+    arrivals = ArrivalIndex.build([(1, '1', 't1', '132N'), (2, 'A', 't2', 'A31S'), (3, 'L', 't3', 'L06N')],
+                                  lambda stop_id: stop_id[:-1])
+    index = ElevatorIndex(MTAService()._parse_elevator_xml(OUTAGES), arrivals)
+    times_sq, fourteenth, complex_, nowhere = index.outages
+
+    assert sorted(times_sq['stop_ids']) == ['127', '725', '902', 'R16']
+    assert fourteenth['stop_ids'] == ['A31']  # the 14 St served by the A/C/E
+    assert sorted(complex_['stop_ids']) == ['127', '631', '723', '725', '901', '902', 'R16']
+    assert nowhere['stop_ids'] == []
+
+    assert index.query('127N') == [times_sq, complex_]
+    assert index.query('A31') == [fourteenth]
+    assert index.query('nowhere av') == [nowhere]
+    assert index.filtered('631')['equipments'] == [complex_]
+    assert index.query('L06') == []
+
+
+def test_on_demand_feeds_are_indexed_once_per_fetched_document(app, client, monkeypatch):
+    mta_service = MTAService()
+    monkeypatch.setattr(app.extensions['transit'], 'mta_service', mta_service)
+    fetches, builds = [], []
+
+    def fetch(status_type):
+        fetches.append(status_type)
+        return mta_service._parse_elevator_xml(OUTAGES)
+
+    def build(data, arrivals):
+        builds.append(data)
+        return ElevatorIndex(data, arrivals)
+
+    monkeypatch.setattr(mta_service, '_fetch_elevator_status', fetch)
+    monkeypatch.setattr(mta_service_module, 'ElevatorIndex', build)
+
+    unfiltered = [client.get('/api/elevator/upcoming') for _ in range(3)]
+    assert len(unfiltered[0].get_json()['equipments']) == 4
+    assert len({response.headers['ETag'] for response in unfiltered}) == 1
+    station = client.get('/api/elevator/upcoming?station=127').get_json()
+    assert [outage['equipment'] for outage in station['equipments']] == ['EL236', 'EL300']
+    assert (len(fetches), len(builds)) == (1, 1)
+
+    mta_service.cache.put(('elevator', 'upcoming'), {'equipments': []}, 300)
+    assert client.get('/api/elevator/upcoming?station=127').get_json() == {'equipments': []}
+    assert client.get('/api/elevator/upcoming').get_json() == {'equipments': []}
+    assert (len(fetches), len(builds)) == (1, 2)
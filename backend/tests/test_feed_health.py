@@ -0,0 +1,71 @@
+# backend/tests/test_feed_health.py
+import pytest
+from services import feed_health
+from services.feed_health import CircuitOpenError, FeedHealth, aged_status
+from fakes import FakeClock
+
+T = 1_000_000.0
+
+
+def test_published_status_reads_correctly_later():
+    health = FeedHealth('ace', threshold=1, base_backoff=30)
+    health.record_success(now=T)
+    health.record_failure(OSError('timeout'), now=T + 10)
+    published = health.status(now=T + 12)
+    assert (published['state'], published['age'], published['retry_in']) == ('open', 12.0, 28.0)
+
+    later = aged_status(published, 20)
+    assert later == health.status(now=T + 32)
+    assert (later['age'], later['retry_in']) == (32.0, 8.0)
+    assert aged_status(published, 40) == health.status(now=T + 52)
+    assert aged_status(published, 40)['state'] == 'failing'
+    assert published['age'] == 12.0  # not modified in place
+
+
+def test_breaker_opens_at_the_threshold_and_backs_off():
+    health = FeedHealth('ace', threshold=3, base_backoff=10, max_backoff=60)
+    now = T
+    for _ in range(2):
+        health.record_failure(OSError('timeout'), now=now)
+        health.check(now=now)  # below the threshold: still polled
+
+    backoffs = []
+    for _ in range(5):
+        health.record_failure(OSError('timeout'), now=now)
+        with pytest.raises(CircuitOpenError) as opened:
+            health.check(now=now)
+        assert opened.value.feed_key == 'ace'
+        backoffs.append(opened.value.retry_in)
+        now = health.open_until
+        health.check(now=now)  # half-open: the next poll goes upstream
+    assert backoffs == [10, 20, 40, 60, 60]
+
+    health.record_success(now=now)
+    health.record_failure(OSError('timeout'), now=now)
+    health.check(now=now)  # the success reset the count
+    assert health.status(now=now)['state'] == 'failing'
+
+
+def test_guard_skips_the_fetch_while_open(monkeypatch):
+    clock = FakeClock(start=T)
+    monkeypatch.setattr(feed_health.time, 'time', clock.time)
+    health = FeedHealth('ace', threshold=1, base_backoff=30)
+    calls = []
+
+    def fetch(fail):
+        calls.append(clock.now)
+        if fail:
+            raise OSError('timeout')
+        return 'feed'
+
+    with pytest.raises(OSError):
+        health.guard(fetch, True)
+    clock.sleep(29)
+    with pytest.raises(CircuitOpenError):
+        health.guard(fetch, False)
+    assert calls == [T]
+
+    clock.sleep(1)
+    assert health.guard(fetch, False) == 'feed'
+    assert calls == [T, T + 30]
+    assert health.status()['state'] == 'ok'
@@ -0,0 +1,67 @@
+# backend/tests/test_geometry.py
+import math
+import random
+import pytest
+from data.geometry import simplify_line
+from data.gtfs_registry import gtfs
+
+
+def segment_distance_m(point, a, b, scale):
+    """Meters from ``point`` to segment ab, all [lon, lat], on a local plane"""
+    def xy(p):
+        return math.radians(p[0]) * scale * 6371008.8, math.radians(p[1]) * 6371008.8
+    (px, py), (ax, ay), (bx, by) = xy(point), xy(a), xy(b)
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = min(max(((px - ax) * dx + (py - ay) * dy) / length_sq, 0), 1) if length_sq else 0
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def assert_within_tolerance(coords, tolerance):
+    simplified = simplify_line(coords, tolerance)
+    assert simplified[0] == coords[0] and simplified[-1] == coords[-1]
+
+    # The kept points are a subsequence; each dropped one lies within the
+    # tolerance of the simplified segment that replaced it
+    kept, j = [], 0
+    for i, point in enumerate(coords):
+        if j < len(simplified) and point == simplified[j]:
+            kept.append(i)
+            j += 1
+    assert j == len(simplified)
+    scale = math.cos(math.radians(sum(lat for _, lat in coords) / len(coords)))
+    for start, end in zip(kept, kept[1:]):
+        for i in range(start + 1, end):
+            assert segment_distance_m(coords[i], coords[start], coords[end], scale) <= tolerance + 1e-6
+    return simplified
+
+
+@pytest.mark.parametrize('tolerance', [1, 10, 50, 300])
+def test_dropped_points_stay_within_tolerance_of_random_walks(tolerance):
+    rnd = random.Random(tolerance)
+    for _ in range(100):
+        lon, lat, coords = -73.95, 40.7, []
+        for _ in range(rnd.randint(3, 80)):
+            # Sharp turns and switchbacks, where a point can lie past the ends of its segment
+            lon += rnd.uniform(-0.002, 0.002)
+            lat += rnd.uniform(-0.002, 0.002)
+            coords.append([round(lon, 6), round(lat, 6)])
+        assert_within_tolerance(coords, tolerance)
+
+
+def test_route_shapes_simplify_within_tolerance():
+    shapes = dict(gtfs.iter_shapes())
+    assert shapes
+    for tolerance in (2, 10, 50, 200):
+        points = kept = 0
+        for coords in shapes.values():
+            coords = [list(point) for point in coords]
+            points += len(coords)
+            kept += len(assert_within_tolerance(coords, tolerance))
+        assert kept < points
+
+
+def test_zero_tolerance_and_short_lines_are_unchanged():
+    coords = [[-73.99, 40.73], [-73.98, 40.74], [-73.99, 40.75]]
+    assert simplify_line(coords, 0) == coords
+    assert simplify_line(coords[:2], 100) == coords[:2]
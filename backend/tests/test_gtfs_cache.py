@@ -0,0 +1,43 @@
+# backend/tests/test_gtfs_cache.py
+from data.gtfs_cache import grouped_points, load_table
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_key_lookup_and_single_value_decoding(tmp_path):
+    source = write(tmp_path / 'stops.txt', 'stop_id,stop_name,stop_lat,stop_lon,parent_station\n'
+                                           'A02,Inwood,40.86,-73.92,\n'
+                                           '101N,Van Cortlandt Park - 242 St,40.88,x,101\n'
+                                           '101,Van Cortlandt Park - 242 St,40.88,-73.89,\n')
+    table = load_table(source, str(tmp_path / 'cache'))
+
+    assert table.lookup('stop_id', ['101', '101N', 'A02', 'A0', 'nope']).tolist() == [0, 1, 2, -1, -1]
+    assert [table.string('stop_id', code) for code in table.codes('stop_id').tolist()] == ['A02', '101N', '101']
+    assert table.numeric('stop_lon')[1] != table.numeric('stop_lon')[1]  # unparseable -> NaN
+    # Parent ids resolve against the stop ids without decoding either column
+    parents = table.lookup('stop_id', table.keys('parent_station'))[table.codes('parent_station')]
+    assert parents.tolist() == [-1, 0, -1]
+
+
+def test_rebuilt_when_the_source_changes(tmp_path):
+    source = tmp_path / 'routes.txt'
+    write(source, 'route_id,route_color\nA,0039A6\n')
+    assert load_table(str(source), str(tmp_path / 'cache')).strings('route_color') == ['0039A6']
+    write(source, 'route_id,route_color\nA,0039A6\nG,6CBE45\n')
+    assert len(load_table(str(source), str(tmp_path / 'cache'))) == 2
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_shape_points_grouped_in_sequence(tmp_path):
+    source = write(tmp_path / 'shapes.txt', 'shape_id,shape_pt_sequence,shape_pt_lat,shape_pt_lon\n'
+                                            'B..N,2,40.2,-73.2\n'
+                                            'A..S,1,40.0,-74.0\n'
+                                            'B..N,1,40.1,-73.1\n')
+    shape_ids, bounds, lons, lats = grouped_points(source, str(tmp_path / 'cache'))
+
+    assert shape_ids == ['A..S', 'B..N']
+    assert bounds.tolist() == [0, 1, 3]
+    assert lats[1:3].tolist() == [40.1, 40.2]
@@ -0,0 +1,42 @@
+# backend/tests/test_metrics.py
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FETCHER = """
+from services.metrics import FEED_FETCH_SECONDS, FEED_ENTITIES
+FEED_FETCH_SECONDS.labels('ace').observe(0.25)
+FEED_ENTITIES.labels('ace', 'vehicle').set(42)
+"""
+
+WORKER = """
+import sys
+from app import create_app
+client = create_app(refresh_mode='off').test_client()
+for _ in range({requests}):
+    client.get('/health')
+sys.stdout.write(client.get('/metrics').get_data(as_text=True))
+"""
+
+
+def run(code, metrics_dir, tmp_path):
+    env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(metrics_dir), 'ARCHIVE_DIR': str(tmp_path / 'archive')}
+    return subprocess.run([sys.executable, '-c', code], cwd=BACKEND, env=env, capture_output=True, text=True,
+                          check=True, timeout=60).stdout
+
+
+def test_every_worker_serves_the_fetcher_and_other_workers_metrics(tmp_path):
+    metrics_dir = tmp_path / 'metrics'
+    metrics_dir.mkdir()
+    run(FETCHER, metrics_dir, tmp_path)
+    run(WORKER.format(requests=3), metrics_dir, tmp_path)
+    scraped = run(WORKER.format(requests=2), metrics_dir, tmp_path)
+
+    assert 'mta_feed_fetch_seconds_count{feed="ace"} 1.0' in scraped
+    assert 'mta_feed_fetch_seconds_sum{feed="ace"} 0.25' in scraped
+    assert 'mta_feed_entities{feed="ace",type="vehicle"} 42.0' in scraped
+    # Requests answered by both workers, summed
+    assert 'http_requests_total{method="GET",route="/health",status="200"} 5.0' in scraped
+    assert 'transit_snapshot_version 0.0' in scraped
@@ -0,0 +1,47 @@
+# backend/tests/test_mta_service.py
+import itertools
+import random
+from config.config import FETCH_CACHE_SIZE, FILTERED_FETCH_CACHE_SIZE
+from models.transit import ENTITY_TYPES, filter_entities
+from services.mta_service import MTAService
+from fakes import trip_feed
+
+ROUTES = ['A', 'C', 'E', 'H', 'FS']
+
+
+def as_dicts(parsed):
+    return {**parsed, 'entities': [entity.to_dict() for entity in parsed['entities']]}
+
+
+def test_filtered_parse_equals_the_full_parse_filtered_afterwards():
+    rnd = random.Random(24)
+    service = MTAService()
+    feed = trip_feed(rnd, ROUTES, ['A27N', 'A28S', 'A31N', 'A32S'], trips=60)
+    full = service._parse_subway_feed(feed)
+
+    route_choices = [None, set(), {'A'}, {'C', 'E'}, {'H', 'FS', 'Z'}, set(ROUTES)]
+    type_choices = [None, {'vehicle'}, {'trip_update'}, set(ENTITY_TYPES)]
+    for routes, types in itertools.product(route_choices, type_choices):
+        filtered = service._parse_subway_feed(feed, routes=routes, types=types)
+        expected = {**full, 'entities': filter_entities(full['entities'], routes, types)}
+        assert as_dicts(filtered) == as_dicts(expected), (routes, types)
+
+    # Pushed-down filters also leave the arrivals rows of skipped trips out
+    rows = []
+    service._parse_subway_feed(feed, rows, routes={'A'})
+    assert rows and {route_id for _, route_id, _, _ in rows} == {'A'}
+
+
+def test_filtered_reads_do_not_evict_whole_feeds(monkeypatch):
+    service = MTAService()
+    monkeypatch.setattr(service, '_fetch_subway_filtered',
+                        lambda line, routes, types: {'header': {}, 'entities': [], 'routes': routes})
+    service.cache.put(('alerts', 'bus'), {'entity': []}, 60)
+    service.cache.put(('elevator', 'current'), {'equipments': []}, 300)
+
+    for size in range(1, 4):
+        for routes in itertools.combinations('ABCDEFGJLMNQRWZ', size):
+            assert service.fetch_subway_feed('ace', set(routes))['routes'] == set(routes)
+    assert len(service.filtered_cache) == FILTERED_FETCH_CACHE_SIZE < FETCH_CACHE_SIZE
+    assert service.cache.peek(('alerts', 'bus')) == {'entity': []}
+    assert service.cache.peek(('elevator', 'current')) == {'equipments': []}
@@ -0,0 +1,52 @@
+# backend/tests/test_positions.py
+import pytest
+from data.gtfs_cache import grouped_points, load_table
+from data.gtfs_registry import StopTable
+from models.transit import TripUpdate, VehiclePosition
+from services.positions import PositionEstimator, ShapeNetwork
+
+NOW = 1_000_000
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    # One northbound shape along a meridian with stops A, B, C on it
+    (tmp_path / 'shapes.txt').write_text('shape_id,shape_pt_sequence,shape_pt_lat,shape_pt_lon\n'
+                                         '1..N01R,1,40.70,-74.0\n'
+                                         '1..N01R,2,40.71,-74.0\n'
+                                         '1..N01R,3,40.72,-74.0\n')
+    (tmp_path / 'stops.txt').write_text('stop_id,stop_name,stop_lat,stop_lon,parent_station\n'
+                                        'AN,A,40.70,-74.0,\nBN,B,40.71,-74.0,\nCN,C,40.72,-74.0,\n')
+    cache = str(tmp_path / 'cache')
+    network = ShapeNetwork(grouped_points(str(tmp_path / 'shapes.txt'), cache), {'1..N01R': '1'})
+    return PositionEstimator(network, StopTable(load_table(str(tmp_path / 'stops.txt'), cache)))
+
+
+def vehicle(trip_id, stop_id, status='2'):
+    return VehiclePosition(f"{trip_id}-vp", trip_id, '1', '', '', status, NOW, stop_id)
+
+
+def trip(trip_id, *stop_time_updates):
+    return TripUpdate(f"{trip_id}-tu", trip_id, '1', '', '', stop_time_updates)
+
+
+def test_trains_placed_between_and_at_their_stops(estimator):
+    trips = {t.trip_id: t for t in (
+        trip('1_1..N01R', ('AN', NOW - 70, NOW - 60), ('BN', NOW + 60, None), ('CN', NOW + 200, NOW + 230)),
+        trip('2_1..N01R', ('AN', None, NOW - 10), ('BN', NOW - 5, NOW), ('CN', NOW + 120, None)),
+    )}
+    vehicles = [
+        vehicle('1_1..N01R', 'BN'),
+        vehicle('2_1..N01R', 'BN', status='1'),  # stopped at B, whatever the trip update says
+        vehicle('3_1..N01R', 'CN'),  # no trip update: heads for its own stop
+        vehicle('4_9..N01R', 'CN'),  # route 1 has a default northbound shape
+        vehicle('5_7..S01R', 'CN'),  # no shape at all
+        vehicle('6_1..N01R', 'XN'),  # unknown stop
+    ]
+    positions = estimator.estimate(vehicles, trips, NOW)
+
+    assert sorted(positions) == ['1_1..N01R-vp', '2_1..N01R-vp', '3_1..N01R-vp', '4_9..N01R-vp']
+    assert positions['1_1..N01R-vp'] == pytest.approx((-74.0, 40.705))
+    assert positions['2_1..N01R-vp'] == pytest.approx((-74.0, 40.71))
+    assert positions['3_1..N01R-vp'] == pytest.approx((-74.0, 40.72))
+    assert estimator.estimate([], trips, NOW) == {}
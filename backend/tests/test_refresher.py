@@ -0,0 +1,75 @@
+# backend/tests/test_refresher.py
+from concurrent.futures import Future
+import pytest
+from config.config import POSITION_UPDATE_INTERVAL, SUBWAY_FEEDS
+from services import refresher
+from fakes import FakeClock, StopLoop
+
+
+class InlineExecutor:
+    """Runs submitted calls straight away, so futures are done before ``wait``"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class FakeService:
+    def __init__(self, clock, fail=True):
+        self.clock = clock
+        self.fail = fail
+        self.executor = InlineExecutor()
+        self.polls = []
+        self.geojson_builds = []
+
+    def poll_feed(self, feed_key):
+        self.polls.append((self.clock.now, feed_key))
+        if self.fail:
+            raise ConnectionError('feed down')
+        state = type('State', (), {'parsed': object()})()
+        return (state if feed_key in SUBWAY_FEEDS else {}), None
+
+    def combine_subway_states(self, states):
+        return {'entities': []}, None
+
+    def to_geojson(self, subway_data):
+        self.geojson_builds.append(self.clock.now)
+        return {'type': 'FeatureCollection', 'features': []}
+
+    def feed_status(self):
+        return {}
+
+
+def run(monkeypatch, service, clock):
+    monkeypatch.setattr(refresher, 'time', clock)
+    published = []
+    with pytest.raises(StopLoop):
+        refresher.refresh_forever(service, lambda **update: published.append((clock.now, update)))
+    return published
+
+
+def test_failing_feeds_do_not_spin(monkeypatch):
+    clock = FakeClock(until=1_000_000.0 + 60, max_calls=1000)
+    service = FakeService(clock)
+    published = run(monkeypatch, service, clock)
+
+    # The loop reached the end of the minute by sleeping, not by hitting max_calls
+    assert clock.now >= clock.until
+    assert len(clock.sleeps) < 100
+    assert published == []
+    # Failed feeds are retried on their schedule, not on every pass
+    assert len(service.polls) < 4 * (len(SUBWAY_FEEDS) + 2)
+
+
+def test_positions_reestimated_between_feed_updates(monkeypatch):
+    clock = FakeClock(until=1_000_000.0 + 60)
+    service = FakeService(clock, fail=False)
+    run(monkeypatch, service, clock)
+
+    gaps = [later - earlier for earlier, later in zip(service.geojson_builds, service.geojson_builds[1:])]
+    assert len(service.geojson_builds) >= 60 / POSITION_UPDATE_INTERVAL - 2
+    assert max(gaps) <= POSITION_UPDATE_INTERVAL + 1
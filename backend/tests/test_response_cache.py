@@ -0,0 +1,57 @@
+# backend/tests/test_response_cache.py
+import gzip
+import json
+import pytest
+from services import response_cache
+from fakes import collection, feature
+
+
+@pytest.fixture
+def published(store):
+    store.publish(subway_data={'header': {}, 'entities': []},
+                  subway_geojson=collection(*(feature(f"T{i}", lat=40.7 + i / 1000) for i in range(50))))
+    return store
+
+
+def test_gzip_is_negotiated_and_revalidated(client, published):
+    response = client.get('/api/subway/geojson', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    body = json.loads(gzip.decompress(response.data))
+    assert body['version'] == 1 and len(body['features']) == 50
+
+    etag = response.headers['ETag']
+    revalidated = client.get('/api/subway/geojson',
+                             headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+    # The plain body is a different representation with its own ETag
+    plain = client.get('/api/subway/geojson', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert json.loads(plain.data) == body
+    assert plain.headers['ETag'] != etag
+    assert client.get('/api/subway/geojson', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_refused_encodings_and_new_snapshots(client, published, monkeypatch):
+    monkeypatch.setattr(response_cache, 'brotli', None)
+    response = client.get('/api/subway/geojson', headers={'Accept-Encoding': 'br, gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+    etag = response.headers['ETag']
+
+    # Every request for one snapshot gets the same bytes; a publish changes them
+    assert client.get('/api/subway/geojson').headers['ETag'] == etag
+    published.publish(subway_geojson=collection(feature('T0', lat=40.8)))
+    changed = client.get('/api/subway/geojson', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert json.loads(changed.data)['version'] == 2
+
+
+@pytest.mark.skipif(response_cache.brotli is None, reason='brotli not installed')
+def test_brotli_is_preferred_when_accepted(client, published):
+    response = client.get('/api/subway/geojson', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(response_cache.brotli.decompress(response.data))['version'] == 1
+    assert response.headers['ETag'].strip('"').endswith('-br')
@@ -0,0 +1,80 @@
+# backend/tests/test_scheduler.py
+import random
+import pytest
+from services import scheduler
+from services.scheduler import FeedSchedule, FeedScheduler
+
+
+@pytest.fixture(autouse=True)
+def seeded_jitter(monkeypatch):
+    monkeypatch.setattr(scheduler, 'random', random.Random(23))
+
+
+def poll(feeds, until, start=0.0):
+    """Run a FeedScheduler against feeds updating every ``feeds[key]`` seconds.
+
+    Returns the schedules, the number of polls per feed, and how long
+    after each update (past the first quarter, once learning settled) the
+    first poll that saw it came.
+    """
+    schedules = [FeedSchedule(feed_key, 15, 5, 120, delay=2, jitter=3) for feed_key in feeds]
+    timers = FeedScheduler(schedules, start)
+    polls = {feed_key: 0 for feed_key in feeds}
+    seen, lags = {}, {feed_key: [] for feed_key in feeds}
+    while timers.next_poll() <= until:
+        now = timers.next_poll()
+        for feed_key in timers.pop_due(now):
+            period = feeds[feed_key]
+            header_timestamp = now // period * period
+            polls[feed_key] += 1
+            if seen.get(feed_key) != header_timestamp and now > start + (until - start) / 4:
+                lags[feed_key].append(now - header_timestamp)
+            seen[feed_key] = header_timestamp
+            timers.observe(feed_key, header_timestamp, now)
+    return {schedule.feed_key: schedule for schedule in schedules}, polls, lags
+
+
+def test_learns_each_feed_cadence_from_a_wrong_guess():
+    feeds = {'ace': 30, 'bdfm': 60, 'g': 20, 'si': 90}
+    schedules, polls, lags = poll(feeds, until=7200)
+    for feed_key, period in feeds.items():
+        # Hits cap the estimate at the true gap and probing keeps it a little under
+        assert 0.8 * period <= schedules[feed_key].interval <= period
+        # Updates are picked up a couple of seconds after they land ...
+        assert sum(lags[feed_key]) / len(lags[feed_key]) < 5
+        # ... without polling much more often than the feed changes
+        assert polls[feed_key] < 2 * 7200 / period
+
+
+def test_follows_a_feed_that_slows_down():
+    schedule = FeedSchedule('ace', 30, 5, 120, delay=2, jitter=0)
+    now = 0.0
+    for header_timestamp in range(0, 1800, 30):
+        now = schedule.observe(header_timestamp, max(now, header_timestamp + 1))
+    assert schedule.interval <= 30
+
+    # Now every 60s: the unchanged poll in between makes each gap an exact sample
+    for header_timestamp in range(1800, 3600, 60):
+        while now < header_timestamp:
+            now = schedule.observe(header_timestamp - 60, now)
+        now = schedule.observe(header_timestamp, now)
+    assert 54 <= schedule.interval <= 60
+
+
+def test_next_poll_is_just_after_the_expected_update():
+    schedule = FeedSchedule('ace', 90, 5, 120, delay=2, jitter=0)
+    schedule.observe(1000, 1001)
+    # A change found straight away caps the too-long guess at the gap seen
+    assert schedule.observe(1030, 1050) == 1030 + 30 + 2
+    assert schedule.interval == 30
+    # Late polls still aim at the next update, but not sooner than min_interval
+    assert schedule.observe(1060, 1088) == 1093
+
+
+def test_unchanged_polls_back_off_and_failures_wait_an_interval():
+    schedule = FeedSchedule('ace', 30, 5, 120, delay=2, jitter=0)
+    schedule.observe(1000, 1001)
+    waits = [schedule.observe(1000, now) - now for now in (1010, 1020, 1030, 1040, 1050, 1060)]
+    assert waits == [5, 10, 20, 40, 80, 120]
+    assert schedule.failed(2000) == 2030
+    assert schedule.observe(None, 3000) == 3030
@@ -0,0 +1,89 @@
+# backend/tests/test_shared_snapshot.py
+import gzip
+import struct
+from services.shared_snapshot import SharedSnapshotReader, SharedSnapshotWriter
+from services.transit_store import new_store
+from fakes import collection, feature
+
+ALERTS = {'entity': [{'id': 'a1', 'alert': {'informed_entity': [{'route_id': 'A'}]}}]}
+
+
+def fetcher(path):
+    writer = SharedSnapshotWriter(path)
+    store = new_store(writer.version)
+    store.add_listener(writer.on_publish)
+    return writer, store
+
+
+def test_worker_serves_the_bodies_the_fetcher_rendered(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    _, upstream = fetcher(path)
+    reader, worker = SharedSnapshotReader(path), new_store()
+    assert not reader.poll(worker)
+
+    upstream.publish(subway_geojson=collection(feature('X')), service_alerts={'subway': ALERTS})
+    assert reader.poll(worker)
+    assert not reader.poll(worker)
+
+    snapshot = worker.get_snapshot()
+    assert snapshot.version == upstream.get_version()
+    payload = snapshot.get_payload('geojson')
+    assert isinstance(payload.body, memoryview)  # mapped, not re-serialized
+    assert bytes(payload.body) == upstream.get_snapshot().get_payload('geojson').body
+    assert gzip.decompress(payload.variant('gzip')) == bytes(payload.body)
+    assert bytes(snapshot.get_payload(('alerts', 'subway')).body) == \
+        upstream.get_snapshot().get_payload(('alerts', 'subway')).body
+    assert list(snapshot.alert_indexes['subway'].by_route) == ['A']
+
+
+def test_unchanged_bodies_are_reused_and_skipped_versions_catch_up(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    _, upstream = fetcher(path)
+    reader, worker = SharedSnapshotReader(path), new_store()
+    upstream.publish(subway_geojson=collection(feature('X')), service_alerts={'subway': ALERTS})
+    reader.poll(worker)
+    alerts = worker.get_snapshot().get_payload(('alerts', 'subway'))
+
+    for lat in (40.74, 40.75, 40.76):
+        upstream.publish(subway_geojson=collection(feature('X', lat=lat)))
+    assert reader.poll(worker)
+
+    snapshot = worker.get_snapshot()
+    assert snapshot.version == 4
+    assert snapshot.vehicle_features['X']['geometry']['coordinates'][1] == 40.76
+    assert snapshot.get_payload(('alerts', 'subway')) is alerts
+    assert worker.get_geojson_delta(2) is None  # never seen by this worker
+    assert worker.get_geojson_delta(1)['changed'][0]['geometry']['coordinates'][1] == 40.76
+
+
+def test_restarted_fetcher_continues_the_version_sequence(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    _, upstream = fetcher(path)
+    reader, worker = SharedSnapshotReader(path), new_store()
+    upstream.publish(subway_geojson=collection(feature('X')))
+    upstream.publish(subway_geojson=collection(feature('X'), feature('Y')))
+    reader.poll(worker)
+
+    _, restarted = fetcher(path)
+    restarted.publish(subway_geojson=collection(feature('Y')))
+    assert reader.poll(worker)
+    assert worker.get_version() == 3
+    assert worker.get_geojson_delta(2)['removed'] == ['X']
+
+
+def test_reader_waits_out_a_write_in_progress(tmp_path, monkeypatch):
+    path = str(tmp_path / 'snapshot')
+    writer, upstream = fetcher(path)
+    reader, worker = SharedSnapshotReader(path), new_store()
+    upstream.publish(subway_geojson=collection(feature('X')))
+
+    # An odd sequence number means the writer is between its two updates
+    seq = struct.unpack_from('<Q', writer._control, 8)[0]
+    struct.pack_into('<Q', writer._control, 8, seq + 1)
+    monkeypatch.setattr('services.shared_snapshot.time.sleep', lambda seconds: None)
+    assert not reader.poll(worker)
+    assert worker.get_version() == 0
+
+    struct.pack_into('<Q', writer._control, 8, seq + 2)
+    assert reader.poll(worker)
+    assert worker.get_version() == 1
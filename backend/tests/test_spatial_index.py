@@ -0,0 +1,52 @@
+# backend/tests/test_spatial_index.py
+import math
+import random
+import pytest
+from services.spatial_index import SpatialIndex
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * 6371008.8 * math.asin(math.sqrt(a))
+
+
+def test_radius_and_bbox_queries_match_a_full_scan():
+    rnd = random.Random(8)
+    lats = [rnd.uniform(40.5, 40.9) for _ in range(2000)]
+    lons = [rnd.uniform(-74.25, -73.7) for _ in range(2000)]
+    index = SpatialIndex(list(range(2000)), lats, lons)
+
+    for _ in range(200):
+        lat, lon = rnd.uniform(40.45, 40.95), rnd.uniform(-74.3, -73.65)
+        radius = rnd.choice((50, 300, 1000, 5000, 40000))
+        distances = sorted((haversine(lat, lon, lats[i], lons[i]), i) for i in range(2000))
+        expected = [(i, distance) for distance, i in distances if distance <= radius]
+        found = index.nearby(lat, lon, radius)
+        assert [i for i, _ in found] == [i for i, _ in expected]
+        assert [distance for _, distance in found] == pytest.approx([distance for _, distance in expected])
+        assert index.nearby(lat, lon, radius, limit=5) == found[:5]
+
+        min_lon, max_lon = sorted((lon, lon + rnd.uniform(-0.1, 0.1)))
+        min_lat, max_lat = sorted((lat, lat + rnd.uniform(-0.1, 0.1)))
+        assert index.within_bbox(min_lon, min_lat, max_lon, max_lat) == [
+            i for i in range(2000) if min_lon <= lons[i] <= max_lon and min_lat <= lats[i] <= max_lat]
+
+
+@pytest.mark.parametrize('query', [
+    'lat=nan&lon=-73.98', 'lat=40.75&lon=inf', 'lat=40.75&lon=-73.98&radius=nan',
+    'lat=40.75&lon=-73.98&radius=-5', 'lat=40.75&lon=-73.98&radius=0',
+    'lat=40.75&lon=-73.98&limit=-2', 'lat=40.75&lon=-73.98&limit=0', 'lon=-73.98'
+])
+def test_nearby_rejects_invalid_parameters(client, query):
+    response = client.get(f"/api/stops/nearby?{query}")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_nearby_stations_nearest_first(client):
+    stops = client.get('/api/stops/nearby?lat=40.7527&lon=-73.9772&radius=400&limit=2').get_json()['stops']
+    assert len(stops) == 2
+    assert all(stop['parent_station'] is None for stop in stops)
+    assert stops[0]['distance_m'] <= stops[1]['distance_m'] <= 400
@@ -0,0 +1,173 @@
+# backend/tests/test_stream.py
+import json
+import runpy
+import socket
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from config.config import STREAM_MAX_CLIENTS
+from services import stream as stream_module
+from services.stream import SnapshotBroadcaster
+from services.transit_store import new_store
+from fakes import collection, feature
+
+
+def events(payload):
+    """Decode a run of Server-Sent Events into (event, data) pairs"""
+    decoded = []
+    for block in payload.decode('utf-8').split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields:
+            decoded.append((fields['event'], json.loads(fields['data'])))
+    return decoded
+
+
+def alert(alert_id, text='Delays'):
+    return {'id': alert_id, 'alert': {'header_text': text}}
+
+
+def store_with_stream():
+    store = new_store()
+    broadcaster = SnapshotBroadcaster(store)
+    store.publish(subway_data={'header': {}, 'entities': []}, subway_geojson=collection(feature('X')),
+                  service_alerts={'subway': {'entity': [alert('a1')]}})
+    return store, broadcaster
+
+
+def test_reconnect_gets_the_alert_changes_it_missed():
+    store, broadcaster = store_with_stream()
+    store.publish(service_alerts={'subway': {'entity': [alert('a1', 'Suspended'), alert('a2')]}})
+    store.publish(subway_geojson=collection(feature('X'), feature('Y')))
+
+    (vehicles, vehicle_data), (alerts, alert_data) = events(broadcaster.catch_up_event('1'))
+    assert (vehicles, [f['properties']['id'] for f in vehicle_data['added']]) == ('vehicles', ['Y'])
+    assert alerts == 'alerts' and alert_data['version'] == 3
+    assert alert_data['systems']['subway'] == {'added': [alert('a2')], 'changed': [alert('a1', 'Suspended')],
+                                               'removed': []}
+
+    # Reconnecting after the alert change only brings the vehicles
+    assert [event for event, _ in events(broadcaster.catch_up_event('2'))] == ['vehicles']
+    assert broadcaster.catch_up_event('3') == b''
+
+
+def test_unknown_or_evicted_ids_get_the_full_snapshot():
+    store = new_store()
+    store.publish(subway_data={'header': {}, 'entities': []}, subway_geojson=collection(feature('X')))
+    broadcaster = SnapshotBroadcaster(store, alert_history=2)
+    for text in ('Delays', 'Suspended', 'Resumed'):
+        store.publish(service_alerts={'subway': {'entity': [alert('a1', text)]}})
+
+    for last_event_id in (None, 'garbage', '1', '2', '99'):
+        [(event, data)] = events(broadcaster.catch_up_event(last_event_id))
+        assert (event, data['version']) == ('snapshot', 4)
+        assert data['alerts']['subway'] == {'entity': [alert('a1', 'Resumed')]}
+    assert [event for event, _ in events(broadcaster.catch_up_event('3'))] == ['alerts']
+
+
+def test_a_slow_client_is_resynced_from_the_latest_snapshot():
+    store = new_store()
+    broadcaster = SnapshotBroadcaster(store, queue_size=2)
+    store.publish(subway_data={'header': {}, 'entities': []}, subway_geojson=collection(feature('X')))
+    stream = broadcaster.stream(broadcaster.connect(), '1')
+    assert next(stream) == b''  # up to date
+    assert broadcaster.client_count() == 1
+
+    # Connected but not reading: the third change overflows its queue of two
+    for lat in (40.70, 40.71, 40.72):
+        store.publish(subway_geojson=collection(feature('X', lat=lat)))
+    [(event, data)] = events(next(stream))
+    assert (event, data['version']) == ('snapshot', 4)
+    assert data['vehicles']['features'][0]['geometry']['coordinates'] == [-73.99, 40.72]
+
+    store.publish(subway_geojson=collection(feature('Y')))
+    [(event, data)] = events(next(stream))
+    assert (event, data['since'], data['removed']) == ('vehicles', 4, ['X'])
+    stream.close()
+    assert broadcaster.client_count() == 0
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledServer(WSGIServer):
+    """Serves each connection on one of a fixed number of threads, like a gunicorn gthread worker"""
+
+    threads = 4
+
+    def server_activate(self):
+        super().server_activate()
+        self.pool = ThreadPoolExecutor(self.threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.serve_connection, request, client_address)
+
+    def serve_connection(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def open_stream(port):
+    connection = socket.create_connection(('127.0.0.1', port), timeout=5)
+    connection.sendall(b'GET /api/stream HTTP/1.0\r\nHost: localhost\r\n\r\n')
+    return connection
+
+
+def test_default_stream_cap_leaves_gunicorn_threads_free():
+    threads = runpy.run_path('gunicorn.conf.py')['threads']
+    assert 1 <= STREAM_MAX_CLIENTS < threads
+
+
+def test_ordinary_requests_are_served_while_stream_slots_are_full(app, store, monkeypatch):
+    store.publish(subway_data={'header': {}, 'entities': []}, subway_geojson=collection(feature('X')))
+    broadcaster = SnapshotBroadcaster(store, max_clients=PooledServer.threads - 1)
+    monkeypatch.setattr(app.extensions['transit'], 'snapshot_stream', broadcaster)
+    monkeypatch.setattr(stream_module, 'STREAM_KEEPALIVE', 0.05)  # notice closed streams quickly
+    server = make_server('127.0.0.1', 0, app, server_class=PooledServer, handler_class=QuietHandler)
+    port = server.server_address[1]
+    serving = ThreadPoolExecutor(1)
+    serving.submit(server.serve_forever)
+    streams, refused = [], None
+    try:
+        # Each stream holds a server thread; all but one are taken
+        streams = [open_stream(port) for _ in range(broadcaster.max_clients)]
+        deadline = time.monotonic() + 5
+        while broadcaster.client_count() < broadcaster.max_clients and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert broadcaster.client_count() == broadcaster.max_clients
+
+        # One more stream client is turned away instead of taking the last thread...
+        refused = open_stream(port)
+        reply = b''
+        while b'\r\n\r\n' not in reply:
+            reply += refused.recv(4096)
+        head, _, body = reply.partition(b'\r\n\r\n')
+        assert head.startswith(b'HTTP/1.0 503')
+        assert b'Retry-After: 30' in head.split(b'\r\n')
+        assert b'Too many stream clients' in body + b''.join(iter(lambda: refused.recv(4096), b''))
+
+        # ...so ordinary requests are still answered
+        for path in ('/health', '/api/subway/geojson'):
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+                assert response.status == 200
+
+        # A disconnected stream frees its slot
+        streams.pop().close()
+        deadline = time.monotonic() + 5
+        while broadcaster.client_count() == broadcaster.max_clients and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert broadcaster.connect() is not None
+    finally:
+        for connection in streams + [refused]:
+            if connection is not None:
+                connection.close()
+        server.shutdown()
+        server.server_close()
+        serving.shutdown()
+        server.pool.shutdown()
@@ -0,0 +1,82 @@
+# backend/tests/test_transit.py
+import random
+from config.config import GEOJSON_DELTA_HISTORY
+from models.transit import DeltaLog, GeoJSONDelta
+from services.transit_store import new_store
+from fakes import collection, feature
+
+
+def test_delta_from_a_version_never_published_here_needs_a_resync():
+    # A worker mirroring the fetcher saw v3, v4 and v7; v5 removed X upstream
+    store = new_store()
+    store.publish(subway_geojson=collection(feature('X'), feature('Y')), version=3)
+    store.publish(subway_geojson=collection(feature('X'), feature('Y', lat=40.74)), version=4)
+    store.publish(subway_geojson=collection(feature('X'), feature('Y', lat=40.75)), version=7)
+
+    assert store.get_geojson_delta(5) is None
+    assert store.get_geojson_delta(6) is None
+    delta = store.get_geojson_delta(4)
+    assert delta['version'] == 7
+    assert [f['properties']['id'] for f in delta['changed']] == ['Y']
+
+
+def test_versions_without_vehicle_changes_stay_usable():
+    store = new_store()
+    store.publish(subway_geojson=collection(feature('X')))
+    store.publish(service_alerts={'subway': []})
+    store.publish(subway_geojson=collection(feature('X'), feature('Y')))
+
+    delta = store.get_geojson_delta(2)
+    assert delta['version'] == 3
+    assert [f['properties']['id'] for f in delta['added']] == ['Y']
+    assert store.get_geojson_delta(3) == {'type': 'FeatureCollectionDelta', 'version': 3, 'since': 3,
+                                          'added': [], 'changed': [], 'removed': []}
+
+
+def test_evicted_versions_need_a_resync():
+    log = DeltaLog(maxlen=2)
+    for version in range(1, 6):
+        log.append(GeoJSONDelta(version, [], [feature('X', lat=40 + version)], []))
+
+    assert log.since(2) is None
+    assert [f['geometry']['coordinates'][1] for f in log.since(3)['changed']] == [45]
+
+
+def test_versions_without_vehicle_changes_are_bounded():
+    log = DeltaLog(maxlen=3)
+    log.append(GeoJSONDelta(1, [feature('X')], [], []))
+    for version in range(2, 1000):
+        log.mark(version)
+
+    assert len(log.versions) == 4
+    assert log.since(995) is None
+    assert log.since(996) == {'added': [], 'changed': [], 'removed': []}
+
+
+def test_composed_deltas_rebuild_the_current_fleet_from_any_version():
+    rnd = random.Random(4)
+    store = new_store()
+    fleets = {}  # version -> id -> feature
+    for _ in range(60):
+        if rnd.random() < 0.2:
+            store.publish(service_alerts={'subway': []})
+        else:
+            ids = rnd.sample('ABCDEFGH', rnd.randint(0, 8))
+            store.publish(subway_geojson=collection(*(feature(i, lat=40 + rnd.randint(0, 2) / 100) for i in ids)))
+        fleets[store.get_version()] = dict(store.get_snapshot().vehicle_features)
+
+    # Only the oldest versions, whose deltas were evicted, need a resync
+    resyncs = [version for version in fleets if store.get_geojson_delta(version) is None]
+    assert resyncs == sorted(fleets)[:len(resyncs)]
+    assert len(fleets) - len(resyncs) >= GEOJSON_DELTA_HISTORY
+
+    current = fleets[store.get_version()]
+    for version, fleet in fleets.items():
+        delta = store.get_geojson_delta(version)
+        if delta is None:
+            continue
+        assert not {f['properties']['id'] for f in delta['added']} & set(fleet)
+        assert {f['properties']['id'] for f in delta['changed']} <= set(fleet)
+        rebuilt = {feature_id: f for feature_id, f in fleet.items() if feature_id not in delta['removed']}
+        rebuilt.update((f['properties']['id'], f) for f in delta['added'] + delta['changed'])
+        assert rebuilt == current, version
@@ -0,0 +1,61 @@
+# backend/tests/test_ttl_cache.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.ttl_cache import TTLCache
+
+CALLERS = 8
+
+
+class BlockingLoad:
+    """A load that blocks until released, counting how often it runs"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def burst(cache, load):
+    """Call get from CALLERS threads, releasing the load once every lookup is registered"""
+    registered = threading.Semaphore(0)
+    cache.record = lambda key, result: registered.release()
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(cache.get, 'feed', 30, load) for _ in range(CALLERS)]
+        for _ in range(CALLERS):
+            assert registered.acquire(timeout=5)
+        load.release.set()
+        return [future.exception(5) or future.result() for future in futures]
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(4)
+    value = {'entity': []}
+    load = BlockingLoad(value)
+
+    assert all(result is value for result in burst(cache, load))
+    assert load.calls == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, CALLERS - 1, 0)
+    assert cache.get('feed', 30, BlockingLoad(None)) is value
+    assert cache.hits == 1
+
+
+def test_a_failed_load_is_shared_and_not_cached():
+    cache = TTLCache(4)
+    error = OSError('upstream timeout')
+    load = BlockingLoad(error)
+
+    assert all(result is error for result in burst(cache, load))
+    assert load.calls == 1
+    assert len(cache) == 0
+
+    retry = BlockingLoad('fresh')
+    retry.release.set()
+    assert cache.get('feed', 30, retry) == 'fresh'
+    assert retry.calls == 1
@@ -0,0 +1,156 @@
+# backend/tests/test_vector_tiles.py
+import struct
+from services.vector_tiles import BUFFER, EXTENT, TileLayerSource, mercator
+
+
+def varints(data, position=0):
+    """Decode consecutive base-128 varints, yielding (value, next position)"""
+    while position < len(data):
+        value = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        yield value, position
+
+
+def fields(data):
+    """(field number, value) pairs of a protobuf message; length-delimited values are bytes"""
+    decoded, position = [], 0
+    while position < len(data):
+        key, position = next(varints(data, position))
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, position = next(varints(data, position))
+        elif wire_type == 1:
+            value, position = data[position:position + 8], position + 8
+        else:
+            assert wire_type == 2, wire_type
+            length, position = next(varints(data, position))
+            value, position = data[position:position + length], position + length
+        decoded.append((field, value))
+    return decoded
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    [(field, value)] = fields(data)
+    if field == 1:
+        return value.decode('utf-8')
+    if field == 3:
+        return struct.unpack('<d', value)[0]
+    if field == 4:
+        return value - (1 << 64) if value >= 1 << 63 else value
+    assert field == 7
+    return bool(value)
+
+
+def decode_geometry(commands):
+    """Paths of absolute tile coordinates, checking every command integer"""
+    paths, x, y, i = [], 0, 0, 0
+    while i < len(commands):
+        command_id, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        assert command_id in (1, 2) and count >= 1
+        if command_id == 1:
+            assert count == 1  # one MoveTo per path
+            paths.append([])
+        else:
+            assert paths and len(paths[-1]) == 1  # LineTo follows a MoveTo
+        for _ in range(count):
+            x += unzigzag(commands[i])
+            y += unzigzag(commands[i + 1])
+            paths[-1].append((x, y))
+            i += 2
+    return paths
+
+
+def decode_layer(tile):
+    [(field, layer)] = fields(tile)
+    assert field == 3
+    layer = fields(layer)
+    assert (15, 2) in layer and (5, EXTENT) in layer
+    keys = [value.decode('utf-8') for field, value in layer if field == 3]
+    values = [decode_value(value) for field, value in layer if field == 4]
+    features = []
+    for field, value in layer:
+        if field != 2:
+            continue
+        feature = dict(fields(value))
+        tags = [tag for tag, _ in varints(feature[2])]
+        properties = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+        commands = [command for command, _ in varints(feature[4])]
+        features.append((feature[3], decode_geometry(commands), properties))
+    name = dict(layer)[1].decode('utf-8')
+    return name, features
+
+
+def tile_coordinates(lon, lat, z, x, y):
+    mx, my = mercator([lon], [lat])
+    return float(mx[0]) * 2 ** z * EXTENT - x * EXTENT, float(my[0]) * 2 ** z * EXTENT - y * EXTENT
+
+
+Z, X, Y = 14, 4824, 6157  # Midtown Manhattan
+
+
+def test_points_and_properties_decode_back():
+    stops = [
+        ('127', -73.987495, 40.75529, {'name': 'Times Sq-42 St', 'parent': True, 'lines': 7, 'rank': 0.5}),
+        ('A27', -73.993391, 40.757308, {'name': '42 St-Port Authority', 'parent': False, 'lines': -3,
+                                        'rank': 2.25}),
+    ]
+    features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                 'properties': {'stop_id': stop_id, 'skipped': None, **properties}}
+                for stop_id, lon, lat, properties in stops]
+    name, decoded = decode_layer(TileLayerSource('stops', features).encode(Z, X, Y))
+
+    assert name == 'stops' and len(decoded) == 2
+    for (stop_id, lon, lat, properties), (kind, paths, decoded_properties) in zip(stops, decoded):
+        assert kind == 1
+        assert decoded_properties == {'stop_id': stop_id, **properties}
+        [[(px, py)]] = paths
+        tx, ty = tile_coordinates(lon, lat, Z, X, Y)
+        assert 0 <= px < EXTENT and 0 <= py < EXTENT
+        assert abs(px - tx) <= 0.5 and abs(py - ty) <= 0.5
+
+
+def test_lines_are_delta_encoded_and_clipped_to_the_buffer():
+    # Runs north through the tile and well past both edges
+    coords = [[-73.9855 + 0.0001 * i, 40.735 + 0.002 * i] for i in range(20)]
+    feature = {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': coords},
+               'properties': {'route_id': 'N'}}
+    name, [(kind, paths, properties)] = decode_layer(TileLayerSource('lines', [feature]).encode(Z, X, Y))
+
+    assert (name, kind, properties) == ('lines', 2, {'route_id': 'N'})
+    [path] = paths
+    assert len(path) >= 2
+    assert all(-BUFFER <= px <= EXTENT + BUFFER and -BUFFER <= py <= EXTENT + BUFFER for px, py in path)
+    assert min(py for _, py in path) == -BUFFER and max(py for _, py in path) == EXTENT + BUFFER
+
+    # Interior vertices land on their own projections
+    inside = [tile_coordinates(lon, lat, Z, X, Y) for lon, lat in coords]
+    inside = [(tx, ty) for tx, ty in inside if -BUFFER < tx < EXTENT + BUFFER and -BUFFER < ty < EXTENT + BUFFER]
+    assert inside
+    for tx, ty in inside:
+        assert any(abs(px - tx) <= 0.5 and abs(py - ty) <= 0.5 for px, py in path)
+
+
+def test_a_line_leaving_and_reentering_the_tile_is_split():
+    # North out of the top of the tile, then back down further east
+    coords = [[-73.99, 40.75], [-73.99, 40.80], [-73.985, 40.80], [-73.985, 40.75]]
+    feature = {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': coords}, 'properties': {}}
+    [(_, paths, _)] = decode_layer(TileLayerSource('lines', [feature]).encode(Z, X, Y))[1]
+    assert len(paths) == 2
+    assert paths[0][-1][1] == paths[1][0][1] == -BUFFER
+    assert paths[0][0][0] < paths[1][0][0]
+
+
+def test_features_outside_the_tile_encode_nothing():
+    feature = {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-73.75, 40.6]}, 'properties': {}}
+    assert TileLayerSource('stops', [feature]).encode(Z, X, Y) == b''